@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║            ALMACÉN DE SERIES — Buffers de precios de memoria acotada        ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  BufferPrecios  : Ring buffer ordenado por tiempo (último precio/segundo)  ║
+║                   sobre arrays paralelos array('q') / array('d').          ║
+║  HistorialVelas : Velas OHLC cerradas en columnas NumPy con retención      ║
+║                   acotada y vistas sin copia para análisis.                ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Agregar O(1) amortizado · último O(1) · rango O(log n) · memoria acotada  ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    buf = BufferPrecios(capacidad=50_000)
+    buf.agregar(1718900000, 189.50)
+    buf.agregar(1718900000, 189.52)      # mismo segundo → sobrescribe
+    buf.ultimo()                         # → (1718900000, 189.52)
+    buf.rango(1718899000, 1718900000)    # → [(ts, precio), ...]
+    buf.extender(barras["t"], barras["c"])   # serie ascendente en bloque
+
+    hist = HistorialVelas(max_velas=10_000)
+    hist.agregar(1718899940, 189.4, 189.6, 189.3, 189.5, 12_000, 85)
+    hist.columna("close")                # → vista np.ndarray (sin copia)
+    hist.dataframe()                     # → DataFrame indexado por datetime_utc
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  RING BUFFER DE PRECIOS POR SEGUNDO
+# ══════════════════════════════════════════════════════════════════════════════
+
+class BufferPrecios:
+    """Serie ``segundo → último precio`` de capacidad fija y orden temporal.
+
+    Los arrays empiezan con ``TAM_INICIAL`` posiciones y se duplican hasta
+    ``capacidad`` (16 bytes × capacidad como máximo): un símbolo con pocos
+    ticks no reserva el tope entero. Mientras crece no hay vuelta de anillo;
+    una vez lleno, cada segundo nuevo pisa el más antiguo sin reordenar ni
+    borrar en bloque.
+
+    Un tick del mismo segundo que el último sobrescribe su precio. Un tick
+    más antiguo solo se acepta si su segundo ya existe (se corrige el
+    precio); si no, se descarta y se cuenta en ``tardios``, porque insertar
+    en medio del anillo rompería el coste O(1).
+
+    Parámetros:
+        capacidad : int → Segundos máximos retenidos (default: 50 000)
+    """
+
+    TAM_INICIAL = 1024
+
+    __slots__ = ("_ts", "_precios", "_capacidad", "_tam", "_inicio", "_n", "tardios")
+
+    def __init__(self, capacidad: int = 50_000):
+        if capacidad <= 0:
+            raise ValueError("capacidad debe ser > 0")
+        self._capacidad = capacidad
+        self._tam = min(capacidad, self.TAM_INICIAL)   # posiciones reservadas
+        self._ts = array("q", bytes(8 * self._tam))
+        self._precios = array("d", bytes(8 * self._tam))
+        self._inicio = 0   # posición física del elemento más antiguo
+        self._n = 0        # elementos válidos
+        self.tardios = 0
+
+    # ── Escritura ──
+
+    def agregar(self, ts_seg: int, precio: float) -> bool:
+        """Registra el precio de un segundo.
+
+        Returns:
+            False si el tick llegó tarde y se descartó.
+        """
+        n = self._n
+        if n:
+            fin = (self._inicio + n - 1) % self._tam
+            ultimo_ts = self._ts[fin]
+            if ts_seg == ultimo_ts:
+                self._precios[fin] = precio
+                return True
+            if ts_seg < ultimo_ts:
+                i = self._buscar(ts_seg)
+                if i < n and self._ts[self._fisico(i)] == ts_seg:
+                    self._precios[self._fisico(i)] = precio
+                    return True
+                self.tardios += 1
+                return False
+
+        if n < self._capacidad:
+            if n == self._tam:
+                self._reservar(n + 1)
+            pos = (self._inicio + n) % self._tam
+            self._n = n + 1
+        else:
+            pos = self._inicio
+            self._inicio = (self._inicio + 1) % self._tam
+        self._ts[pos] = ts_seg
+        self._precios[pos] = precio
+        return True
+
+    def extender(self, ts_seg: np.ndarray, precios: np.ndarray) -> None:
+        """Añade una serie ascendente de golpe (p. ej. el historial REST).
+
+        Con el buffer vacío y ``ts_seg`` estrictamente creciente se copian
+        los últimos ``capacidad`` elementos en bloque; en cualquier otro
+        caso cada par pasa por ``agregar``.
+        """
+        ts_seg = np.asarray(ts_seg, dtype=np.int64)
+        precios = np.asarray(precios, dtype=np.float64)
+        if self._n or (len(ts_seg) > 1 and not np.all(ts_seg[1:] > ts_seg[:-1])):
+            for ts, precio in zip(ts_seg.tolist(), precios.tolist()):
+                self.agregar(ts, precio)
+            return
+        ts_seg, precios = ts_seg[-self._capacidad:], precios[-self._capacidad:]
+        n = len(ts_seg)
+        self._reservar(n)
+        self._ts[:n] = array("q", ts_seg.tobytes())
+        self._precios[:n] = array("d", precios.tobytes())
+        self._inicio = 0
+        self._n = n
+
+    def limpiar(self) -> None:
+        self._inicio = 0
+        self._n = 0
+
+    # ── Lectura ──
+
+    def ultimo(self) -> tuple[int, float] | None:
+        """(ts_seg, precio) más reciente, o None si está vacío."""
+        if not self._n:
+            return None
+        fin = self._fisico(self._n - 1)
+        return self._ts[fin], self._precios[fin]
+
+    def rango(self, desde: int | None = None, hasta: int | None = None) -> list[tuple[int, float]]:
+        """Pares (ts_seg, precio) con ``desde <= ts <= hasta``, en orden."""
+        i = 0 if desde is None else self._buscar(desde)
+        j = self._n if hasta is None else self._buscar(hasta + 1)
+        return [self._par(k) for k in range(i, j)]
+
+    def items(self) -> Iterator[tuple[int, float]]:
+        """Todos los pares (ts_seg, precio) del más antiguo al más reciente."""
+        for k in range(self._n):
+            yield self._par(k)
+
+    @property
+    def capacidad(self) -> int:
+        return self._capacidad
+
+    def __len__(self) -> int:
+        return self._n
+
+    # ── Internos ──
+
+    def _fisico(self, i: int) -> int:
+        """Posición física del i-ésimo elemento lógico (0 = más antiguo)."""
+        return (self._inicio + i) % self._tam
+
+    def _par(self, i: int) -> tuple[int, float]:
+        p = self._fisico(i)
+        return self._ts[p], self._precios[p]
+
+    def _reservar(self, minimo: int) -> None:
+        """Duplica los arrays (hasta ``capacidad``) hasta que quepan ``minimo``.
+
+        Solo se llama sin vuelta de anillo (``_inicio == 0``): los datos
+        siguen contiguos al inicio y basta con alargar los arrays.
+        """
+        if minimo <= self._tam:
+            return
+        tam = self._tam
+        while tam < minimo:
+            tam *= 2
+        tam = min(tam, self._capacidad)
+        extra = tam - self._tam
+        self._ts.frombytes(bytes(8 * extra))
+        self._precios.frombytes(bytes(8 * extra))
+        self._tam = tam
+
+    def _buscar(self, ts_seg: int) -> int:
+        """Primer índice lógico con ts >= ts_seg (bisect_left sobre el anillo)."""
+        ts, inicio, cap = self._ts, self._inicio, self._tam
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ts[(inicio + mid) % cap] < ts_seg:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  HISTORIAL COLUMNAR DE VELAS OHLC
+# ══════════════════════════════════════════════════════════════════════════════
+
+class HistorialVelas:
+    """Velas cerradas de un símbolo guardadas por columnas NumPy.
+
+    Las columnas se reservan con el doble de ``max_velas``. Cuando la zona
+    escrita llega al final, las últimas ``max_velas`` se copian al inicio
+    (una copia cada ``max_velas`` velas → O(1) amortizado), así las velas
+    retenidas siempre forman un bloque contiguo y ``columna``/``arrays``
+    devuelven vistas sin copia. Una vista es válida hasta la siguiente
+    escritura; quien necesite conservarla debe copiarla.
+
+    Columnas:
+        bucket (int64, epoch seg) · open · high · low · close · volume
+        (float64) · num_trades (int64)
+
+    Parámetros:
+        max_velas : int → Velas retenidas; las más antiguas se descartan
+    """
+
+    COLUMNAS = ("bucket", "open", "high", "low", "close", "volume", "num_trades")
+    _TIPOS = {"bucket": np.int64, "num_trades": np.int64}
+
+    __slots__ = ("max_velas", "_cols", "_inicio", "_fin")
+
+    def __init__(self, max_velas: int = 10_000):
+        if max_velas <= 0:
+            raise ValueError("max_velas debe ser > 0")
+        self.max_velas = max_velas
+        self._cols = {
+            nombre: np.zeros(2 * max_velas, dtype=self._TIPOS.get(nombre, np.float64))
+            for nombre in self.COLUMNAS
+        }
+        self._inicio = 0
+        self._fin = 0
+
+    def agregar(self, bucket: int, open_: float, high: float, low: float,
+                close: float, volume: float, num_trades: int) -> None:
+        """Añade una vela cerrada al final del historial."""
+        if self._fin == len(self._cols["bucket"]):
+            self._compactar()
+        i = self._fin
+        c = self._cols
+        c["bucket"][i] = bucket
+        c["open"][i] = open_
+        c["high"][i] = high
+        c["low"][i] = low
+        c["close"][i] = close
+        c["volume"][i] = volume
+        c["num_trades"][i] = num_trades
+        self._fin = i + 1
+        if self._fin - self._inicio > self.max_velas:
+            self._inicio += 1
+
+    def _compactar(self) -> None:
+        """Mueve las velas retenidas al inicio de las columnas."""
+        n = self._fin - self._inicio
+        for col in self._cols.values():
+            col[:n] = col[self._inicio:self._fin]
+        self._inicio = 0
+        self._fin = n
+
+    # ── Lectura ──
+
+    def __len__(self) -> int:
+        return self._fin - self._inicio
+
+    def columna(self, nombre: str) -> np.ndarray:
+        """Vista de solo lectura (sin copia) de una columna."""
+        vista = self._cols[nombre][self._inicio:self._fin]
+        vista.flags.writeable = False
+        return vista
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """Todas las columnas como vistas sin copia."""
+        return {nombre: self.columna(nombre) for nombre in self.COLUMNAS}
+
+    def ultima(self) -> dict | None:
+        """Última vela cerrada como dict, o None si está vacío."""
+        if not len(self):
+            return None
+        i = self._fin - 1
+        return {nombre: self._cols[nombre][i].item() for nombre in self.COLUMNAS}
+
+    def dataframe(self) -> pd.DataFrame:
+        """DataFrame indexado por ``datetime_utc`` sobre las columnas.
+
+        El índice se construye desde el epoch entero (sin parsear strings);
+        las columnas numéricas se pasan sin copia cuando pandas lo permite.
+        Las vistas son de solo lectura: copia el DataFrame antes de mutarlo.
+        """
+        cols = self.arrays()
+        indice = pd.DatetimeIndex(
+            pd.to_datetime(cols.pop("bucket"), unit="s", utc=True), name="datetime_utc"
+        )
+        return pd.DataFrame(cols, index=indice, copy=False)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║       BENCH DECODIFICADOR — Mensajes/seg del camino frame → registro        ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  antes   : json.loads → dict por evento → Mapeador → dataclass por kwargs   ║
+║            → await de una corrutina por evento (camino original).          ║
+║  después : DecodificadorPolygon con cada motor disponible                  ║
+║            (msgspec / orjson / json), por registros y por lotes.           ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso (desde la raíz del repo):
+    python benchmarks/bench_decodificador.py
+    python benchmarks/bench_decodificador.py --frames 20000 --eventos 40
+    python benchmarks/bench_decodificador.py --archivo frames.jsonl
+
+``--archivo`` acepta frames grabados, uno por línea (el texto tal cual llegó
+por el WebSocket). Sin archivo se generan frames con la forma y los campos
+de los mensajes reales de Polygon (T/Q de acciones, XT/XQ de cripto).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chart import TradeNormalizado                      # noqa: E402
+from decodificador_polygon import MOTORES, DecodificadorPolygon, msgspec, orjson  # noqa: E402
+from mapeador_simbolos import Mapeador                  # noqa: E402
+from orderbook import QuoteNormalizado                  # noqa: E402
+
+ACCIONES = ["AAPL", "TSLA", "NVDA", "MSFT", "AMZN", "META", "SPY", "QQQ", "AMD", "GOOGL"]
+PARES = ["X:BTC-USD", "X:ETH-USD", "X:SOL-USD"]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  FRAMES
+# ══════════════════════════════════════════════════════════════════════════════
+
+def generar_frames(n_frames: int, eventos_por_frame: int, semilla: int = 7) -> list[str]:
+    """Frames sintéticos con la forma de los de Polygon (~60% quotes)."""
+    rnd = random.Random(semilla)
+    t = 1_718_900_000_000
+    frames = []
+    for _ in range(n_frames):
+        eventos = []
+        for _ in range(rnd.randint(1, 2 * eventos_por_frame - 1)):
+            t += rnd.randint(0, 3)
+            precio = round(rnd.uniform(50, 500), 2)
+            r = rnd.random()
+            if r < 0.35:
+                eventos.append({"ev": "T", "sym": rnd.choice(ACCIONES), "i": str(rnd.getrandbits(40)),
+                                "x": rnd.randint(1, 20), "p": precio, "s": rnd.choice((1, 10, 100, 250)),
+                                "c": rnd.sample((12, 14, 37, 41), rnd.randint(0, 2)),
+                                "t": t, "q": rnd.getrandbits(24), "z": rnd.randint(1, 3)})
+            elif r < 0.95:
+                eventos.append({"ev": "Q", "sym": rnd.choice(ACCIONES), "bx": rnd.randint(1, 20),
+                                "bp": precio, "bs": rnd.randint(1, 50), "ax": rnd.randint(1, 20),
+                                "ap": round(precio + 0.01, 2), "as": rnd.randint(1, 50), "c": 1,
+                                "i": [604], "t": t, "q": rnd.getrandbits(24), "z": rnd.randint(1, 3)})
+            elif r < 0.98:
+                eventos.append({"ev": "XQ", "pair": rnd.choice(PARES)[2:], "lp": 0, "ls": 0,
+                                "bp": precio * 100, "bs": round(rnd.random(), 6),
+                                "ap": precio * 100 + 1, "as": round(rnd.random(), 6),
+                                "t": t, "x": 1, "r": t})
+            else:
+                eventos.append({"ev": "XT", "pair": rnd.choice(PARES)[2:], "p": precio * 100,
+                                "t": t, "s": round(rnd.random(), 6), "c": [2], "i": "abc",
+                                "x": 1, "r": t})
+        frames.append(json.dumps(eventos, separators=(",", ":")))
+    return frames
+
+
+def leer_frames(ruta: str) -> list[str]:
+    with open(ruta, encoding="utf-8") as f:
+        return [linea.rstrip("\n") for linea in f if linea.strip()]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CAMINOS A COMPARAR
+# ══════════════════════════════════════════════════════════════════════════════
+
+async def camino_original(frames: list[str]) -> int:
+    """Reproduce el _on_message/_procesar_* previo a DecodificadorPolygon."""
+    n = 0
+
+    async def procesar_trade(raw: dict) -> None:
+        nonlocal n
+        TradeNormalizado(
+            simbolo=Mapeador.normalizar(raw.get("sym", "???")),
+            precio=raw.get("p", 0.0), tamano=raw.get("s", 0),
+            timestamp_ms=raw.get("t", 0), exchange_id=raw.get("x", 0),
+            condiciones=raw.get("c", []),
+        )
+        n += 1
+
+    async def procesar_quote(raw: dict) -> None:
+        nonlocal n
+        QuoteNormalizado(
+            simbolo=Mapeador.normalizar(raw.get("sym", "???")),
+            bid_precio=raw.get("bp", 0.0), bid_tamano=raw.get("bs", 0),
+            ask_precio=raw.get("ap", 0.0), ask_tamano=raw.get("as", 0),
+            timestamp_ms=raw.get("t", 0), bid_exchange=raw.get("bx", 0),
+            ask_exchange=raw.get("ax", 0),
+        )
+        n += 1
+
+    for crudo in frames:
+        mensajes = json.loads(crudo)
+        if not isinstance(mensajes, list):
+            mensajes = [mensajes]
+        for msg in mensajes:
+            ev = msg.get("ev")
+            if ev in ("T", "XT"):
+                await procesar_trade(msg)
+            elif ev in ("Q", "XQ"):
+                await procesar_quote(msg)
+    return n
+
+
+def camino_decodificador(frames: list[str], motor: str) -> int:
+    dec = DecodificadorPolygon(TradeNormalizado, QuoteNormalizado, motor=motor)
+    n = 0
+    for crudo in frames:
+        frame = dec.decodificar(crudo)
+        n += len(frame.trades) + len(frame.quotes)
+    return n
+
+
+def camino_lotes(frames: list[str], motor: str) -> int:
+    dec = DecodificadorPolygon(TradeNormalizado, QuoteNormalizado, motor=motor)
+    n = 0
+    for crudo in frames:
+        lotes = dec.decodificar_lotes(crudo)
+        n += len(lotes.trades) + len(lotes.quotes)
+    return n
+
+
+def medir(caminos: list[tuple[str, Callable[[], int]]],
+          repeticiones: int) -> list[tuple[str, int, float]]:
+    """Mejor pasada de cada camino, alternándolos en cada ronda.
+
+    Así el ruido de la máquina (turbo, otros procesos) reparte igual entre
+    todos en lugar de caer sobre los que se miden en ese momento.
+    """
+    mejor = {nombre: float("inf") for nombre, _ in caminos}
+    n = {}
+    for _ in range(repeticiones):
+        for nombre, fn in caminos:
+            t0 = time.perf_counter()
+            n[nombre] = fn()
+            mejor[nombre] = min(mejor[nombre], time.perf_counter() - t0)
+    return [(nombre, n[nombre], mejor[nombre]) for nombre, _ in caminos]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  MAIN
+# ══════════════════════════════════════════════════════════════════════════════
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--archivo", help="Frames grabados, uno por línea")
+    parser.add_argument("--frames", type=int, default=10_000, help="Frames sintéticos a generar")
+    parser.add_argument("--eventos", type=int, default=20, help="Eventos medios por frame sintético")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Se reporta la mejor pasada")
+    args = parser.parse_args()
+
+    frames = leer_frames(args.archivo) if args.archivo else generar_frames(args.frames, args.eventos)
+    disponibles = [m for m, mod in zip(MOTORES, (msgspec, orjson, json)) if mod is not None]
+
+    caminos = [("antes (json + dict + await)", lambda: asyncio.run(camino_original(frames)))]
+    for motor in disponibles:
+        caminos.append((f"después ({motor})", lambda m=motor: camino_decodificador(frames, m)))
+        caminos.append((f"después ({motor}, lotes)", lambda m=motor: camino_lotes(frames, m)))
+    resultados = medir(caminos, args.repeticiones)
+
+    base = resultados[0][2]
+    print(f"{len(frames):,} frames · {resultados[0][1]:,} trades+quotes · mejor de {args.repeticiones}")
+    print(f"{'camino':<30} {'msgs/s':>14} {'seg':>9} {'x':>7}")
+    for nombre, n, seg in resultados:
+        print(f"{nombre:<30} {n / seg:>14,.0f} {seg:>9.3f} {base / seg:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║        SUITE DE BENCHMARKS — Camino caliente ingesta → agregado → difusión  ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  decodificador.*        : frame crudo → LoteTrades/LoteQuotes (por motor)  ║
+║  orderbook.*            : procesar_quote / actualizar_quote / snapshot     ║
+║                           con 15 exchanges por símbolo                     ║
+║  agregador.*            : AgregadorOHLC.procesar_trade / procesar_lote     ║
+║  chart.registrar_tick.* : ChartServer con N navegadores y M símbolos       ║
+║  mapeador.*             : Mapeador.clasificar (memoizado y en frío)        ║
+║  calendario.*           : ¿en horario? por tick y por array de barras      ║
+║  historial.*            : 50k barras REST → array → filtro/remuestreo/JSON ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Por caso: ops/s · p50/p99 (µs por op) · bytes asignados por op (pico y    ║
+║  retenidos, tracemalloc). Resultado en JSON para comparar versiones.       ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso (desde la raíz del repo):
+    python benchmarks/suite.py                              # todos los casos
+    python benchmarks/suite.py --filtro orderbook --rapido  # subconjunto
+    python benchmarks/suite.py --captura sesion.pgrb        # datos grabados
+    python benchmarks/suite.py --salida base.json
+    python benchmarks/suite.py --comparar base.json         # falla si hay regresión
+
+Con ``--captura`` los casos de decodificador, orderbook y agregador usan los
+frames de una grabación de grabador_polygon.py en lugar de datos sintéticos.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from bench_decodificador import generar_frames               # noqa: E402
+from cache_barras import barras_a_json, barras_desde_rest, remuestrear_barras  # noqa: E402
+from calendario_mercado import CalendarioMercado              # noqa: E402
+from chart import AgregadorMultiTF, AgregadorOHLC, ChartServer  # noqa: E402
+from decodificador_polygon import MOTORES, DecodificadorPolygon, msgspec, orjson  # noqa: E402
+from grabador_polygon import leer_grabacion                   # noqa: E402
+import mapeador_simbolos                                      # noqa: E402
+from mapeador_simbolos import Mapeador                        # noqa: E402
+from orderbook import OrderBookManager                        # noqa: E402
+from registros_mercado import QuoteNormalizado, TradeNormalizado  # noqa: E402
+
+# Exchanges que publican NBBO para un valor típico de NASDAQ/NYSE
+EXCHANGES_REALES = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 15, 16, 19)
+SIMBOLOS = ("AAPL", "TSLA", "NVDA", "MSFT", "AMZN", "META", "SPY", "QQQ", "AMD", "GOOGL")
+TS_BASE_MS = 1_718_900_000_000      # jueves 20-jun-2024 12:13 ET (horario de mercado)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  DATOS
+# ══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class Datos:
+    """Entradas compartidas por los casos (sintéticas o de una captura)."""
+    frames: list[str]
+    trades: list[TradeNormalizado]
+    quotes: list[QuoteNormalizado]
+    origen: str
+
+
+def datos_sinteticos(n_frames: int, semilla: int = 11) -> Datos:
+    rnd = random.Random(semilla)
+    quotes = []
+    t = TS_BASE_MS
+    for _ in range(n_frames * 20):
+        t += rnd.randint(0, 2)
+        sym = rnd.choice(SIMBOLOS)
+        medio = 100 + SIMBOLOS.index(sym) * 37 + rnd.uniform(-0.5, 0.5)
+        quotes.append(QuoteNormalizado(
+            sym, round(medio - rnd.choice((0.01, 0.02, 0.03)), 2), rnd.randint(1, 30),
+            round(medio + rnd.choice((0.01, 0.02, 0.03)), 2), rnd.randint(1, 30), t,
+            rnd.choice(EXCHANGES_REALES), rnd.choice(EXCHANGES_REALES),
+        ))
+    trades = []
+    t = TS_BASE_MS
+    for _ in range(n_frames * 10):
+        t += rnd.randint(0, 40)
+        sym = rnd.choice(SIMBOLOS)
+        trades.append(TradeNormalizado(sym, round(100 + rnd.uniform(-1, 1), 2),
+                                       rnd.choice((1, 10, 100)), t, rnd.choice(EXCHANGES_REALES)))
+    return Datos(generar_frames(n_frames, 20, semilla), trades, quotes, "sintético")
+
+
+def datos_captura(ruta: str) -> Datos:
+    frames = [frame.decode("utf-8") for _, _, frame in leer_grabacion(ruta)]
+    dec = DecodificadorPolygon(TradeNormalizado, QuoteNormalizado)
+    trades, quotes = [], []
+    for f in frames:
+        frame = dec.decodificar(f)
+        trades.extend(frame.trades)
+        quotes.extend(frame.quotes)
+    return Datos(frames, trades, quotes, f"captura {Path(ruta).name}")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CASOS
+# ══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class Caso:
+    """Un benchmark: ``preparar()`` devuelve ``op(i)``, que ejecuta la op i-ésima.
+
+    ``lote`` agrupa varias ops por muestra de latencia cuando una sola es
+    demasiado corta para medirla con perf_counter_ns.
+    """
+    nombre: str
+    preparar: Callable[[], Callable[[int], None]]
+    n: int
+    lote: int = 1
+    eventos_por_op: float = 0.0   # si > 0 se reporta también eventos/s
+
+
+def construir_casos(datos: Datos, rapido: bool) -> list[Caso]:
+    escala = 0.2 if rapido else 1.0
+    casos: list[Caso] = []
+    frames, trades, quotes = datos.frames, datos.trades, datos.quotes
+
+    # ── Decodificador ──
+    eventos_por_frame = (len(trades) + len(quotes)) / max(1, len(frames)) if datos.origen != "sintético" else 0.0
+    for motor, mod in zip(MOTORES, (msgspec, orjson, json)):
+        if mod is None:
+            continue
+
+        def preparar(motor=motor):
+            dec = DecodificadorPolygon(TradeNormalizado, QuoteNormalizado, motor=motor)
+            return lambda i: dec.decodificar_lotes(frames[i % len(frames)])
+        casos.append(Caso(f"decodificador.{motor}", preparar, int(len(frames) * escala) or 1,
+                          eventos_por_op=eventos_por_frame or 20.0))
+
+    # ── Order book ──
+    def preparar_ob_procesar():
+        ob = OrderBookManager()
+        return lambda i: ob.procesar_quote(quotes[i % len(quotes)])
+
+    def preparar_ob_actualizar():
+        ob = OrderBookManager()
+        return lambda i: ob.actualizar_quote(quotes[i % len(quotes)])
+
+    def preparar_ob_snapshot():
+        ob = OrderBookManager()
+        for q in quotes[:5000]:
+            ob.actualizar_quote(q)
+        simbolos = sorted({q.simbolo for q in quotes[:5000]})
+        return lambda i: ob.obtener_snapshot(simbolos[i % len(simbolos)])
+
+    n_quotes = int(min(len(quotes), 100_000) * escala) or 1
+    casos += [
+        Caso("orderbook.procesar_quote", preparar_ob_procesar, n_quotes // 4 or 1),
+        Caso("orderbook.actualizar_quote", preparar_ob_actualizar, n_quotes, lote=10),
+        Caso("orderbook.obtener_snapshot", preparar_ob_snapshot, int(5000 * escala) or 1),
+    ]
+
+    # ── Agregador OHLC ──
+    def preparar_agregador():
+        ag = AgregadorOHLC()
+        return lambda i: ag.procesar_trade(trades[i % len(trades)])
+
+    dec_lotes = DecodificadorPolygon(TradeNormalizado, QuoteNormalizado)
+    lotes_trades = [l for l in (dec_lotes.decodificar_lotes(f).trades for f in frames) if len(l)]
+
+    def preparar_agregador_lote():
+        ag = AgregadorOHLC()
+        return lambda i: ag.procesar_lote(lotes_trades[i % len(lotes_trades)])
+
+    casos.append(Caso("agregador.procesar_trade", preparar_agregador,
+                      int(min(len(trades), 200_000) * escala) or 1, lote=10))
+    if lotes_trades:
+        casos.append(Caso("agregador.procesar_lote", preparar_agregador_lote,
+                          int(len(lotes_trades) * escala) or 1,
+                          eventos_por_op=sum(map(len, lotes_trades)) / len(lotes_trades)))
+
+    # ── ChartServer.registrar_tick (N navegadores × M símbolos) ──
+    for n_clientes, m_simbolos in ((10, 10), (100, 10), (1000, 50)):
+        casos.append(Caso(f"chart.registrar_tick.N{n_clientes}.M{m_simbolos}",
+                          lambda n=n_clientes, m=m_simbolos: _preparar_chart(n, m),
+                          int(50_000 * escala), lote=10))
+
+    # ── Mapeador ──
+    universo = [s for s in (
+        list(SIMBOLOS) + ["BTCUSD", "X:ETH-USD", "SOL-USD", "EURUSD", "C:GBPUSD", "BRK.B", "aapl"]
+    )]
+
+    def preparar_mapeador_memo():
+        for s in universo:
+            Mapeador.clasificar(s)
+        return lambda i: Mapeador.clasificar(universo[i % len(universo)])
+
+    def preparar_mapeador_frio():
+        nombres = [f"S{i:05d}" if i % 3 else f"X:C{i:04d}-USD" for i in range(200_000)]
+
+        def op(i):
+            if i % 5000 == 0:
+                mapeador_simbolos._CLASIFICACIONES.clear()
+            Mapeador.clasificar(nombres[i])
+        return op
+
+    casos += [
+        Caso("mapeador.clasificar.memo", preparar_mapeador_memo, int(500_000 * escala), lote=100),
+        Caso("mapeador.clasificar.frio", preparar_mapeador_frio, int(100_000 * escala), lote=10),
+    ]
+
+    # ── Calendario de sesiones ──
+    ts_ticks = [TS_BASE_MS // 1000 + i // 7 for i in range(200_000)]
+    # 30 días de barras de 1 minuto, 24 h (lo que devuelve /v2/aggs con extended hours)
+    ts_barras = np.arange(TS_BASE_MS // 1000 - 30 * 86_400, TS_BASE_MS // 1000, 60, dtype=np.int64)
+
+    def preparar_calendario_tick():
+        cal = CalendarioMercado()
+        return lambda i: cal.en_horario(ts_ticks[i % len(ts_ticks)])
+
+    def preparar_calendario_array():
+        cal = CalendarioMercado()
+        return lambda i: cal.mascara_horario(ts_barras)
+
+    casos += [
+        Caso("calendario.en_horario", preparar_calendario_tick, int(500_000 * escala), lote=100),
+        Caso("calendario.mascara_horario", preparar_calendario_array, int(2_000 * escala) or 1,
+             eventos_por_op=len(ts_barras)),
+    ]
+
+    # ── Historial REST (columnar) ──
+    azar = random.Random(5)
+    resultados = [
+        {"v": float(azar.randint(100, 90_000)), "vw": 100.0, "o": 100 + azar.random(),
+         "c": 100 + azar.random(), "h": 101 + azar.random(), "l": 99 + azar.random(),
+         "t": TS_BASE_MS - (50_000 - i) * 60_000, "n": azar.randint(1, 900)}
+        for i in range(50_000)
+    ]
+
+    def preparar_historial_decodificar():
+        return lambda i: barras_desde_rest(resultados)
+
+    def preparar_historial_transformar():
+        barras = barras_desde_rest(resultados)
+        cal = CalendarioMercado()
+
+        def op(i):
+            en_horario = barras[cal.mascara_horario(barras["t"])]
+            barras_a_json(remuestrear_barras(en_horario, 300)[-500:])
+        return op
+
+    def preparar_historial_sembrar():
+        barras = barras_desde_rest(resultados)
+        ag = AgregadorMultiTF()
+
+        def op(i):
+            ag.sembrar("AAPL", 60, barras[-500:])
+            ag.velas_json("AAPL", 60, limite=500)
+        return op
+
+    casos += [
+        Caso("historial.barras_desde_rest", preparar_historial_decodificar, int(50 * escala) or 1,
+             eventos_por_op=len(resultados)),
+        Caso("historial.filtrar_remuestrear_json", preparar_historial_transformar,
+             int(200 * escala) or 1, eventos_por_op=len(resultados)),
+        Caso("historial.sembrar_velas_json", preparar_historial_sembrar, int(500 * escala) or 1),
+    ]
+    return casos
+
+
+class _WsNulo:
+    """Conexión falsa: acepta y descarta lo enviado."""
+
+    async def send(self, mensaje: str) -> None:
+        pass
+
+
+def _preparar_chart(n_clientes: int, m_simbolos: int) -> Callable[[int], None]:
+    servidor = ChartServer(simbolos=[], max_cola_cliente=256)
+    simbolos = [f"S{i:03d}" for i in range(m_simbolos)]
+    for k in range(n_clientes):
+        ws = _WsNulo()
+        servidor._difusor.registrar(ws)
+        servidor._difusor.suscribir(ws, simbolos[k % m_simbolos])
+    ts0 = TS_BASE_MS
+
+    def op(i: int) -> None:
+        servidor.registrar_tick(simbolos[i % m_simbolos], 100.0 + (i % 97) * 0.01,
+                                ts0 + i * 7, 100)
+    return op
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  MEDICIÓN
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _percentil(ordenadas: list[float], p: float) -> float:
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))]
+
+
+def medir(caso: Caso) -> dict:
+    # Calentamiento (memos, cachés de atributos, primeros libros)
+    op = caso.preparar()
+    for i in range(min(caso.n, 1000)):
+        op(i)
+
+    # Tiempo: una muestra por cada ``lote`` ops
+    op = caso.preparar()
+    muestras = []
+    reloj = time.perf_counter_ns
+    lote = caso.lote
+    inicio = reloj()
+    for base in range(0, caso.n, lote):
+        t0 = reloj()
+        for i in range(base, min(base + lote, caso.n)):
+            op(i)
+        muestras.append((reloj() - t0) / lote)
+    total_ns = reloj() - inicio
+    muestras.sort()
+
+    # Memoria: pasada aparte bajo tracemalloc (lo ralentiza)
+    op = caso.preparar()
+    n_mem = min(caso.n, 20_000)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    antes = tracemalloc.get_traced_memory()[0]
+    for i in range(n_mem):
+        op(i)
+    actual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    resultado = {
+        "n": caso.n,
+        "ops_s": round(caso.n / (total_ns / 1e9), 1),
+        "p50_us": round(_percentil(muestras, 50) / 1000, 3),
+        "p99_us": round(_percentil(muestras, 99) / 1000, 3),
+        "bytes_retenidos_op": round((actual - antes) / n_mem, 1),
+        "bytes_pico_op": round((pico - antes) / n_mem, 1),
+    }
+    if caso.eventos_por_op:
+        resultado["eventos_s"] = round(resultado["ops_s"] * caso.eventos_por_op, 1)
+    return resultado
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  INFORME Y COMPARACIÓN
+# ══════════════════════════════════════════════════════════════════════════════
+
+def imprimir(resultados: dict[str, dict]) -> None:
+    print(f"{'caso':<36} {'ops/s':>12} {'p50 µs':>9} {'p99 µs':>9} {'B pico/op':>10} {'B ret/op':>9}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<36} {r['ops_s']:>12,.0f} {r['p50_us']:>9.2f} {r['p99_us']:>9.2f} "
+              f"{r['bytes_pico_op']:>10,.0f} {r['bytes_retenidos_op']:>9,.0f}")
+
+
+def comparar(actual: dict[str, dict], base: dict[str, dict], umbral: float) -> int:
+    """Imprime la variación contra ``base``; devuelve cuántos casos regresaron."""
+    print(f"\n{'caso':<36} {'base ops/s':>12} {'actual':>12} {'Δ':>8}")
+    regresiones = 0
+    for nombre, r in actual.items():
+        b = base.get(nombre)
+        if b is None:
+            print(f"{nombre:<36} {'—':>12} {r['ops_s']:>12,.0f}")
+            continue
+        delta = (r["ops_s"] - b["ops_s"]) / b["ops_s"] if b["ops_s"] else 0.0
+        marca = ""
+        if delta < -umbral:
+            regresiones += 1
+            marca = "  ← REGRESIÓN"
+        print(f"{nombre:<36} {b['ops_s']:>12,.0f} {r['ops_s']:>12,.0f} {delta:>+7.1%}{marca}")
+    return regresiones
+
+
+async def _ejecutar(casos: list[Caso]) -> dict[str, dict]:
+    # Dentro de un loop: ChartServer crea tareas escritoras por conexión
+    resultados = {}
+    for caso in casos:
+        resultados[caso.nombre] = medir(caso)
+        print(f"  · {caso.nombre}: {resultados[caso.nombre]['ops_s']:,.0f} ops/s", file=sys.stderr)
+    return resultados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks del camino caliente")
+    parser.add_argument("--filtro", default="", help="Solo casos cuyo nombre contenga este texto")
+    parser.add_argument("--rapido", action="store_true", help="20%% de las ops (humo)")
+    parser.add_argument("--captura", help="Captura .pgrb de grabador_polygon.py")
+    parser.add_argument("--frames", type=int, default=5000, help="Frames sintéticos")
+    parser.add_argument("--salida", help="Escribe los resultados en este JSON")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    parser.add_argument("--umbral", type=float, default=0.10,
+                        help="Caída de ops/s tolerada al comparar (default: 0.10)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)   # los motores loguean en INFO al construirse
+    datos = datos_captura(args.captura) if args.captura else datos_sinteticos(args.frames)
+    casos = [c for c in construir_casos(datos, args.rapido) if args.filtro in c.nombre]
+    resultados = asyncio.run(_ejecutar(casos))
+
+    print(f"\nDatos: {datos.origen} · {len(datos.frames):,} frames · "
+          f"{len(datos.trades):,} trades · {len(datos.quotes):,} quotes")
+    imprimir(resultados)
+
+    documento = {
+        "meta": {
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "datos": datos.origen,
+            "rapido": args.rapido,
+        },
+        "resultados": resultados,
+    }
+    if args.salida:
+        Path(args.salida).write_text(json.dumps(documento, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nResultados guardados en {args.salida}")
+
+    if args.comparar:
+        base = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+        regresiones = comparar(resultados, base.get("resultados", {}), args.umbral)
+        if regresiones:
+            print(f"\n{regresiones} caso(s) por debajo del umbral de {args.umbral:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
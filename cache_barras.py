@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║          CACHE DE BARRAS — Historial REST de Polygon en disco + memoria     ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  CacheBarras : Barras OHLCV por (ticker, multiplier, timespan, día ET).    ║
+║                Días cerrados → un .npy por día en disco + LRU en memoria.   ║
+║                Día en curso  → solo memoria; se pide a REST únicamente la   ║
+║                cola posterior a la última barra conocida.                  ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Un cambio de símbolo/timeframe ya visto se sirve sin tocar la red.         ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Columnas   : barras_desde_rest  → "results" a array sin dicts intermedios ║
+║               remuestrear_barras → timeframe superior con reduceat         ║
+║               barras_a_json      → velas init_ohlc serializadas desde array║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    cache = CacheBarras(CONFIG.CACHE_BARRAS_DIR)
+
+    async def descargar(desde: str, hasta: str) -> list[dict]:
+        ...  # GET /v2/aggs/ticker/{t}/range/{m}/{ts}/{desde}/{hasta} → "results"
+
+    barras = await cache.obtener("AAPL", 1, "minute", desde, hoy, descargar)
+    barras["t"], barras["c"]             # columnas NumPy (epoch seg, close, ...)
+    barras_a_json(remuestrear_barras(barras, 300)[-500:])   # velas de 5 min → JSON
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from pathlib import Path
+from typing import Awaitable, Callable
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+logger = logging.getLogger("CacheBarras")
+
+ET = ZoneInfo("America/New_York")
+
+# Barra OHLCV: t = epoch en segundos (inicio de la barra)
+DTYPE_BARRA = np.dtype([
+    ("t", np.int64),
+    ("o", np.float64),
+    ("h", np.float64),
+    ("l", np.float64),
+    ("c", np.float64),
+    ("v", np.float64),
+])
+
+Descargador = Callable[[str, str], Awaitable[list[dict]]]
+
+
+# Campo de "results" → (columna de DTYPE_BARRA, dtype)
+_CAMPOS_REST = (("t", "t", np.int64), ("o", "o", np.float64), ("h", "h", np.float64),
+                ("l", "l", np.float64), ("c", "c", np.float64), ("v", "v", np.float64))
+
+# Una vela init_ohlc; mismo texto que json.dumps de su dict
+_PLANTILLA_VELA = ('{{"time": {}, "open": {!r}, "high": {!r}, "low": {!r}, '
+                   '"close": {!r}, "volume": {!r}}}')
+
+
+def barras_desde_rest(resultados: list[dict]) -> np.ndarray:
+    """Convierte "results" de /v2/aggs a un array estructurado ordenado.
+
+    Cada columna se llena con un ``np.fromiter`` sobre ``itemgetter``: no se
+    crea ninguna tupla ni dict por barra. Si a alguna barra le falta un
+    campo (o trae null) se usa la conversión fila a fila, que rellena
+    o/h/l con el close y v con 0.
+    """
+    n = len(resultados)
+    barras = np.empty(n, dtype=DTYPE_BARRA)
+    try:
+        for campo, columna, tipo in _CAMPOS_REST:
+            barras[columna] = np.fromiter(map(itemgetter(campo), resultados), dtype=tipo, count=n)
+    except (KeyError, TypeError, ValueError):
+        return _barras_desde_rest_filas(resultados)
+    barras["t"] //= 1000
+    validas = (barras["t"] != 0) & (barras["c"] != 0)
+    if not validas.all():
+        barras = barras[validas]
+    return _ordenar(barras)
+
+
+def _barras_desde_rest_filas(resultados: list[dict]) -> np.ndarray:
+    filas = [
+        (r["t"] // 1000, r.get("o", r["c"]), r.get("h", r["c"]),
+         r.get("l", r["c"]), r["c"], r.get("v", 0))
+        for r in resultados if r.get("t") and r.get("c")
+    ]
+    return _ordenar(np.array(filas, dtype=DTYPE_BARRA))
+
+
+def _ordenar(barras: np.ndarray) -> np.ndarray:
+    if len(barras) > 1 and np.any(np.diff(barras["t"]) < 0):
+        barras.sort(order="t")
+    return barras
+
+
+def remuestrear_barras(barras: np.ndarray, tf_seg: int) -> np.ndarray:
+    """Agrega barras ordenadas a buckets de ``tf_seg`` (alineados a epoch).
+
+    Apertura de la primera barra del bucket, cierre de la última, máximos,
+    mínimos y volumen con ``reduceat``: una pasada vectorial por columna.
+    """
+    if not len(barras):
+        return barras
+    cubos = barras["t"] - barras["t"] % tf_seg
+    inicios = np.flatnonzero(np.r_[True, cubos[1:] != cubos[:-1]])
+    finales = np.r_[inicios[1:], len(barras)] - 1
+    resultado = np.empty(len(inicios), dtype=DTYPE_BARRA)
+    resultado["t"] = cubos[inicios]
+    resultado["o"] = barras["o"][inicios]
+    resultado["h"] = np.maximum.reduceat(barras["h"], inicios)
+    resultado["l"] = np.minimum.reduceat(barras["l"], inicios)
+    resultado["c"] = barras["c"][finales]
+    resultado["v"] = np.add.reduceat(barras["v"], inicios)
+    return resultado
+
+
+def barras_a_json(barras: np.ndarray) -> str:
+    """Array JSON de velas {time, open, high, low, close, volume}.
+
+    Equivale a ``json.dumps`` de la lista de dicts, pero formatea las
+    columnas directamente (``str.format`` vía ``map``, sin dicts).
+    """
+    if not len(barras):
+        return "[]"
+    return "[" + ", ".join(map(
+        _PLANTILLA_VELA.format, barras["t"].tolist(), barras["o"].tolist(), barras["h"].tolist(),
+        barras["l"].tolist(), barras["c"].tolist(), barras["v"].tolist(),
+    )) + "]"
+
+
+def _inicio_dia_et(dia: date) -> int:
+    return int(datetime(dia.year, dia.month, dia.day, tzinfo=ET).timestamp())
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CACHE EN DISCO + LRU
+# ══════════════════════════════════════════════════════════════════════════════
+
+class CacheBarras:
+    """Cache persistente de barras de /v2/aggs con LRU en memoria.
+
+    Un día ET se considera cerrado cuando su final quedó ``margen_cierre_seg``
+    atrás (agregados con retraso, cripto 24 h): cuando se descarga se
+    escribe a ``<dir>/<ticker>/<mult><timespan>/<YYYY-MM-DD>.npy`` (también
+    vacío si fue feriado/fin de semana) y no se vuelve a pedir. Hoy (y ayer,
+    mientras no haya pasado el margen) vive solo en memoria y se completa pidiendo a REST desde la última barra
+    conocida; si se actualizó hace menos de ``ttl_hoy_seg`` se sirve tal cual.
+    Las series de hoy tienen su propio LRU de ``max_entradas`` y se vacían
+    al cambiar de día.
+
+    Parámetros:
+        directorio   : str | Path → Carpeta raíz del cache en disco
+        max_entradas : int        → Días (y series de hoy) retenidos en memoria
+        ttl_hoy_seg  : float      → Frescura aceptada para el día en curso
+        margen_cierre_seg : float → Tiempo tras la medianoche ET antes de
+                                    guardar en disco el día anterior
+    """
+
+    def __init__(self, directorio: str | Path, max_entradas: int = 512,
+                 ttl_hoy_seg: float = 15.0, margen_cierre_seg: float = 3600.0):
+        self.directorio = Path(directorio)
+        self.max_entradas = max_entradas
+        self.ttl_hoy_seg = ttl_hoy_seg
+        self.margen_cierre_seg = margen_cierre_seg
+        self._lru: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self._hoy: OrderedDict[tuple, tuple[date, float, np.ndarray]] = OrderedDict()  # (ticker, mult, ts) → (día, monotonic, barras)
+        self._dia_hoy: date | None = None
+        self._metricas = {"aciertos_memoria": 0, "aciertos_disco": 0, "descargas": 0, "barras_descargadas": 0}
+
+    # ── API principal ──
+
+    async def obtener(self, ticker: str, multiplicador: int, timespan: str,
+                      desde: date, hasta: date, descargar: Descargador) -> np.ndarray:
+        """Barras de ``desde`` a ``hasta`` (días ET, inclusive), en orden.
+
+        Solo se llama a ``descargar(desde, hasta)`` para la cola que falta:
+        desde el primer día cerrado ausente, o desde la última barra de hoy
+        (en ms) si solo falta completar el día en curso.
+        """
+        serie = (ticker, multiplicador, timespan)
+        hoy = self._primer_dia_abierto()
+        dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+        por_dia: dict[date, np.ndarray] = {}
+        faltante: date | None = None
+        for dia in dias:
+            if dia >= hoy:
+                break
+            barras = self._leer_dia(serie, dia)
+            if barras is None:
+                faltante = dia
+                break
+            por_dia[dia] = barras
+
+        if faltante is not None:
+            # Un día de solape por si el proveedor corta los rangos en UTC
+            await self._descargar(serie, faltante, faltante - timedelta(days=1),
+                                  hasta, hoy, descargar)
+            for dia in dias:
+                if dia < hoy and dia not in por_dia:
+                    barras = self._leer_dia(serie, dia)
+                    if barras is not None:
+                        por_dia[dia] = barras
+        elif hasta >= hoy:
+            await self._refrescar_hoy(serie, hoy, hasta, descargar)
+
+        partes = [por_dia[d] for d in dias if d in por_dia]
+        if hasta >= hoy:
+            entrada = self._hoy.get(serie)
+            if entrada is not None and entrada[0] == hoy:
+                self._hoy.move_to_end(serie)
+                partes.append(entrada[2])
+        if not partes:
+            return np.empty(0, dtype=DTYPE_BARRA)
+        return np.concatenate(partes)
+
+    def _primer_dia_abierto(self) -> date:
+        """Primer día ET que aún no se da por cerrado (ayer durante el margen)."""
+        ahora = datetime.now(ET)
+        hoy = ahora.date()
+        if ahora.timestamp() < _inicio_dia_et(hoy) + self.margen_cierre_seg:
+            return hoy - timedelta(days=1)
+        return hoy
+
+    def obtener_metricas(self) -> dict:
+        return dict(self._metricas, entradas_memoria=len(self._lru), series_hoy=len(self._hoy))
+
+    # ── Descarga y reparto por día ──
+
+    async def _descargar(self, serie: tuple, primer_dia: date, desde_rest: date,
+                         hasta: date, hoy: date, descargar: Descargador) -> None:
+        resultados = await descargar(desde_rest.isoformat(), hasta.isoformat())
+        barras = barras_desde_rest(resultados)
+        self._metricas["descargas"] += 1
+        self._metricas["barras_descargadas"] += len(barras)
+
+        dia = primer_dia
+        fin = min(hasta, hoy - timedelta(days=1))
+        while dia <= fin:
+            i = np.searchsorted(barras["t"], _inicio_dia_et(dia), side="left")
+            j = np.searchsorted(barras["t"], _inicio_dia_et(dia + timedelta(days=1)), side="left")
+            self._guardar_dia(serie, dia, barras[i:j].copy())
+            dia += timedelta(days=1)
+
+        if hasta >= hoy:
+            i = np.searchsorted(barras["t"], _inicio_dia_et(hoy), side="left")
+            self._guardar_hoy(serie, hoy, barras[i:].copy())
+
+    async def _refrescar_hoy(self, serie: tuple, hoy: date, hasta: date,
+                             descargar: Descargador) -> None:
+        entrada = self._hoy.get(serie)
+        if entrada is not None and entrada[0] == hoy:
+            _, cuando, barras = entrada
+            if time.monotonic() - cuando < self.ttl_hoy_seg:
+                self._metricas["aciertos_memoria"] += 1
+                return
+        else:
+            barras = np.empty(0, dtype=DTYPE_BARRA)
+
+        if len(barras):
+            # La última barra puede seguir abierta: se vuelve a pedir desde ella
+            desde_rest = str(int(barras["t"][-1]) * 1000)
+        else:
+            desde_rest = hoy.isoformat()
+        nuevas = barras_desde_rest(await descargar(desde_rest, hasta.isoformat()))
+        self._metricas["descargas"] += 1
+        self._metricas["barras_descargadas"] += len(nuevas)
+        nuevas = nuevas[nuevas["t"] >= _inicio_dia_et(hoy)]
+        if len(barras) and len(nuevas):
+            barras = np.concatenate([barras[barras["t"] < nuevas["t"][0]], nuevas])
+        elif len(nuevas):
+            barras = nuevas
+        self._guardar_hoy(serie, hoy, barras)
+
+    def _guardar_hoy(self, serie: tuple, hoy: date, barras: np.ndarray) -> None:
+        if hoy != self._dia_hoy:
+            # Nuevo día: las series de ayer ya están (o estarán) en disco
+            self._hoy.clear()
+            self._dia_hoy = hoy
+        self._hoy[serie] = (hoy, time.monotonic(), barras)
+        self._hoy.move_to_end(serie)
+        while len(self._hoy) > self.max_entradas:
+            self._hoy.popitem(last=False)
+
+    # ── Memoria + disco ──
+
+    def _leer_dia(self, serie: tuple, dia: date) -> np.ndarray | None:
+        clave = (*serie, dia)
+        barras = self._lru.get(clave)
+        if barras is not None:
+            self._lru.move_to_end(clave)
+            self._metricas["aciertos_memoria"] += 1
+            return barras
+        ruta = self._ruta(serie, dia)
+        try:
+            barras = np.load(ruta, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("[CACHE] Archivo corrupto %s (%s) — se descargará de nuevo", ruta, e)
+            return None
+        if barras.dtype != DTYPE_BARRA:
+            return None
+        self._metricas["aciertos_disco"] += 1
+        self._recordar(clave, barras)
+        return barras
+
+    def _guardar_dia(self, serie: tuple, dia: date, barras: np.ndarray) -> None:
+        self._recordar((*serie, dia), barras)
+        ruta = self._ruta(serie, dia)
+        try:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            temporal = ruta.with_suffix(".tmp")
+            with open(temporal, "wb") as f:
+                np.save(f, barras, allow_pickle=False)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.warning("[CACHE] No se pudo escribir %s: %s", ruta, e)
+
+    def _recordar(self, clave: tuple, barras: np.ndarray) -> None:
+        self._lru[clave] = barras
+        self._lru.move_to_end(clave)
+        while len(self._lru) > self.max_entradas:
+            self._lru.popitem(last=False)
+
+    def _ruta(self, serie: tuple, dia: date) -> Path:
+        ticker, multiplicador, timespan = serie
+        carpeta_ticker = re.sub(r"[^A-Za-z0-9._-]", "_", ticker)
+        return self.directorio / carpeta_ticker / f"{multiplicador}{timespan}" / f"{dia.isoformat()}.npy"
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║     CALENDARIO DE MERCADO — Sesiones de NYSE/NASDAQ precalculadas en epoch  ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  CalendarioMercado : Tabla de bordes (epoch seg) de pre-market, regular y  ║
+║                      after-hours para una ventana móvil de días, con       ║
+║                      festivos y medias sesiones ya aplicados.              ║
+║  festivos_nyse     : Festivos y medias sesiones de un año (por reglas).    ║
+║  CALENDARIO        : Instancia global.                                      ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Consulta escalar  : bisect sobre los bordes, con el último intervalo en   ║
+║                      cache (los ticks en vivo casi siempre caen en él).    ║
+║  Consulta vectorial: un np.searchsorted para todo un array de timestamps.  ║
+║  Horario de verano : resuelto al construir la tabla, nunca al consultar.   ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    from calendario_mercado import CALENDARIO
+
+    CALENDARIO.en_horario(ts_seg)           # 4:00–20:00 ET de un día hábil
+    CALENDARIO.sesion(ts_seg)               # "PRE_MARKET" | "REGULAR" | ...
+    CALENDARIO.sesion_actual()
+    barras = barras[CALENDARIO.mascara_horario(barras["t"])]
+
+Sesiones (hora ET):
+    pre-market   4:00 –  9:30
+    regular      9:30 – 16:00   (13:00 en media sesión)
+    after-hours 16:00 – 20:00   (13:00 – 17:00 en media sesión)
+"""
+
+from __future__ import annotations
+
+import time
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+ET = ZoneInfo("America/New_York")
+
+PRE_MARKET = "PRE_MARKET"
+REGULAR = "REGULAR"
+AFTER_HOURS = "AFTER_HOURS"
+CLOSED = "CLOSED"
+
+# (hora, minuto) ET de los bordes de un día: inicio pre, inicio regular,
+# inicio after-hours, fin after-hours
+_HORARIO_NORMAL = ((4, 0), (9, 30), (16, 0), (20, 0))
+_HORARIO_MEDIA_SESION = ((4, 0), (9, 30), (13, 0), (17, 0))
+
+# Cierres decretados fuera de las reglas (duelo nacional, etc.)
+CIERRES_EXTRA = {
+    date(2018, 12, 5): "Duelo nacional (G. H. W. Bush)",
+    date(2025, 1, 9): "Duelo nacional (J. Carter)",
+}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  FESTIVOS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _pascua(anio: int) -> date:
+    """Domingo de Pascua (algoritmo gregoriano anónimo)."""
+    a, b, c = anio % 19, anio // 100, anio % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = (h + l - 7 * m + 114) % 31 + 1
+    return date(anio, mes, dia)
+
+
+def _enesimo(anio: int, mes: int, dia_semana: int, n: int) -> date:
+    """``n``-ésimo ``dia_semana`` (0=lunes) del mes; n=-1 → el último."""
+    if n > 0:
+        primero = date(anio, mes, 1)
+        return primero + timedelta(days=(dia_semana - primero.weekday()) % 7 + 7 * (n - 1))
+    ultimo = date(anio + mes // 12, mes % 12 + 1, 1) - timedelta(days=1)
+    return ultimo - timedelta(days=(ultimo.weekday() - dia_semana) % 7)
+
+
+def _observado(dia: date) -> date:
+    """Sábado → viernes anterior, domingo → lunes siguiente."""
+    if dia.weekday() == 5:
+        return dia - timedelta(days=1)
+    if dia.weekday() == 6:
+        return dia + timedelta(days=1)
+    return dia
+
+
+def festivos_nyse(anio: int) -> tuple[dict[date, str], set[date]]:
+    """Festivos (día → nombre) y medias sesiones de NYSE en ``anio``."""
+    festivos: dict[date, str] = {}
+    anio_nuevo = date(anio, 1, 1)
+    if anio_nuevo.weekday() != 5:   # en sábado no se traslada al 31-dic
+        festivos[_observado(anio_nuevo)] = "Año Nuevo"
+    festivos[_enesimo(anio, 1, 0, 3)] = "Martin Luther King Jr."
+    festivos[_enesimo(anio, 2, 0, 3)] = "Presidents' Day"
+    festivos[_pascua(anio) - timedelta(days=2)] = "Viernes Santo"
+    festivos[_enesimo(anio, 5, 0, -1)] = "Memorial Day"
+    if anio >= 2022:
+        festivos[_observado(date(anio, 6, 19))] = "Juneteenth"
+    festivos[_observado(date(anio, 7, 4))] = "Independence Day"
+    festivos[_enesimo(anio, 9, 0, 1)] = "Labor Day"
+    accion_gracias = _enesimo(anio, 11, 3, 4)
+    festivos[accion_gracias] = "Thanksgiving"
+    festivos[_observado(date(anio, 12, 25))] = "Navidad"
+    for dia, nombre in CIERRES_EXTRA.items():
+        if dia.year == anio:
+            festivos[dia] = nombre
+
+    medias: set[date] = {accion_gracias + timedelta(days=1)}
+    for dia in (date(anio, 7, 3), date(anio, 12, 24)):
+        if dia.weekday() < 5 and dia not in festivos:
+            medias.add(dia)
+    return festivos, medias
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CALENDARIO
+# ══════════════════════════════════════════════════════════════════════════════
+
+class CalendarioMercado:
+    """Sesiones de mercado como tabla ordenada de bordes en epoch segundos.
+
+    Cada día hábil aporta cuatro bordes (inicio pre, inicio regular, inicio
+    after-hours, fin after-hours). El número de bordes ``<= ts`` indica en
+    qué tramo cae ``ts`` y ``_etiquetas[tramo]`` su sesión, así que una
+    consulta es un bisect (o un searchsorted para un array) sin construir
+    ningún ``datetime``.
+
+    La tabla cubre ``dias_atras`` días antes de hoy y ``dias_adelante``
+    después; una consulta fuera de ese rango la reconstruye ampliada.
+
+    Parámetros:
+        dias_atras    : int → Días de historia cubiertos (default: 400)
+        dias_adelante : int → Días futuros cubiertos (default: 14)
+    """
+
+    def __init__(self, dias_atras: int = 400, dias_adelante: int = 14):
+        self.dias_atras = dias_atras
+        self.dias_adelante = dias_adelante
+        self._festivos: dict[date, str] = {}
+        self._medias: set[date] = set()
+        self._anios: set[int] = set()
+        self._desde: date | None = None
+        self._hasta: date | None = None
+        self._desde_ts = 0
+        self._hasta_ts = 0
+        self._bordes: list[int] = []
+        self._etiquetas: list[str] = [CLOSED]
+        self._bordes_np = np.empty(0, dtype=np.int64)
+        self._abierto_np = np.zeros(1, dtype=bool)
+        # Último tramo consultado: [lo, hi) → sesión
+        self._cache_lo = 0
+        self._cache_hi = 0
+        self._cache_sesion = CLOSED
+        self.reconstrucciones = 0
+        hoy = datetime.now(ET).date()
+        self._construir(hoy - timedelta(days=dias_atras), hoy + timedelta(days=dias_adelante))
+
+    # ── Construcción ──
+
+    def _cargar_anio(self, anio: int) -> None:
+        festivos, medias = festivos_nyse(anio)
+        self._festivos.update(festivos)
+        self._medias |= medias
+        self._anios.add(anio)
+
+    def _construir(self, desde: date, hasta: date) -> None:
+        bordes: list[int] = []
+        etiquetas: list[str] = [CLOSED]
+        dia = desde
+        while dia <= hasta:
+            if self.es_habil(dia):
+                horario = _HORARIO_MEDIA_SESION if dia in self._medias else _HORARIO_NORMAL
+                for h, m in horario:
+                    bordes.append(int(datetime(dia.year, dia.month, dia.day, h, m, tzinfo=ET).timestamp()))
+                etiquetas += (PRE_MARKET, REGULAR, AFTER_HOURS, CLOSED)
+            dia += timedelta(days=1)
+
+        self._desde, self._hasta = desde, hasta
+        self._desde_ts = int(datetime(desde.year, desde.month, desde.day, tzinfo=ET).timestamp())
+        siguiente = hasta + timedelta(days=1)
+        self._hasta_ts = int(datetime(siguiente.year, siguiente.month, siguiente.day, tzinfo=ET).timestamp())
+        self._bordes = bordes
+        self._etiquetas = etiquetas
+        self._bordes_np = np.array(bordes, dtype=np.int64)
+        self._abierto_np = np.array([e != CLOSED for e in etiquetas], dtype=bool)
+        self._cache_lo = self._cache_hi = 0
+        self.reconstrucciones += 1
+
+    def _cubrir(self, ts_min: float, ts_max: float) -> None:
+        """Amplía la tabla si [ts_min, ts_max] se sale de la ventana."""
+        if self._desde_ts <= ts_min and ts_max < self._hasta_ts:
+            return
+        hoy = datetime.now(ET).date()
+        desde = min(self._desde, hoy - timedelta(days=self.dias_atras),
+                    datetime.fromtimestamp(ts_min, tz=ET).date())
+        hasta = max(self._hasta, hoy + timedelta(days=self.dias_adelante),
+                    datetime.fromtimestamp(ts_max, tz=ET).date() + timedelta(days=self.dias_adelante))
+        self._construir(desde, hasta)
+
+    # ── Días ──
+
+    def es_habil(self, dia: date) -> bool:
+        """Lunes a viernes y no festivo (las medias sesiones son hábiles)."""
+        if dia.year not in self._anios:
+            self._cargar_anio(dia.year)
+        return dia.weekday() < 5 and dia not in self._festivos
+
+    def festivo(self, dia: date) -> str | None:
+        """Nombre del festivo de ``dia`` o None."""
+        self.es_habil(dia)
+        return self._festivos.get(dia)
+
+    def es_media_sesion(self, dia: date) -> bool:
+        self.es_habil(dia)
+        return dia in self._medias
+
+    # ── Consultas ──
+
+    def sesion(self, ts_seg: float) -> str:
+        """Sesión en la que cae ``ts_seg``: PRE_MARKET, REGULAR, AFTER_HOURS o CLOSED."""
+        if self._cache_lo <= ts_seg < self._cache_hi:
+            return self._cache_sesion
+        if not self._desde_ts <= ts_seg < self._hasta_ts:
+            self._cubrir(ts_seg, ts_seg)
+        bordes = self._bordes
+        tramo = bisect_right(bordes, ts_seg)
+        self._cache_lo = bordes[tramo - 1] if tramo > 0 else self._desde_ts
+        self._cache_hi = bordes[tramo] if tramo < len(bordes) else self._hasta_ts
+        self._cache_sesion = sesion = self._etiquetas[tramo]
+        return sesion
+
+    def en_horario(self, ts_seg: float) -> bool:
+        """True si ``ts_seg`` cae en pre-market, regular o after-hours."""
+        if self._cache_lo <= ts_seg < self._cache_hi:
+            return self._cache_sesion != CLOSED
+        return self.sesion(ts_seg) != CLOSED
+
+    def sesion_actual(self) -> str:
+        return self.sesion(time.time())
+
+    def mascara_horario(self, ts_seg: np.ndarray) -> np.ndarray:
+        """Máscara booleana de ``en_horario`` para un array de epoch segundos."""
+        ts_seg = np.asarray(ts_seg)
+        if not ts_seg.size:
+            return np.zeros(0, dtype=bool)
+        self._cubrir(ts_seg.min(), ts_seg.max())
+        return self._abierto_np[np.searchsorted(self._bordes_np, ts_seg, side="right")]
+
+    def sesiones(self, ts_seg: np.ndarray) -> np.ndarray:
+        """Sesión de cada timestamp de un array (dtype str)."""
+        ts_seg = np.asarray(ts_seg)
+        if not ts_seg.size:
+            return np.empty(0, dtype="<U11")
+        self._cubrir(ts_seg.min(), ts_seg.max())
+        etiquetas = np.array(self._etiquetas)
+        return etiquetas[np.searchsorted(self._bordes_np, ts_seg, side="right")]
+
+
+CALENDARIO = CalendarioMercado()
@@ -3,8 +3,9 @@
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║              CHART ENGINE — Trades + Agregador OHLC en Tiempo Real         ║
 ╠══════════════════════════════════════════════════════════════════════════════╣
-║  TradeNormalizado : Estructura de datos para trades individuales.           ║
+║  TradeNormalizado : Trade individual (definido en registros_mercado).       ║
 ║  AgregadorOHLC    : Construye candlesticks OHLC a partir de trades crudos. ║
+║  AgregadorMultiTF : Velas de 5s/1m/5m/15m/1h a la vez (roll-up en vivo).    ║
 ║  ChartServer      : WebSocket server que transmite datos al navegador      ║
 ║                     para visualización con TradingView lightweight-charts.  ║
 ║  PolygonTradesWS  : Conexión WebSocket a Polygon.io (canal de Trades).     ║
@@ -29,12 +30,12 @@ import json
 import logging
 import signal
 import time
-from collections import defaultdict
-from dataclasses import dataclass, field
+from collections import defaultdict, deque
 from datetime import datetime, timezone, timedelta
 from typing import Callable, Optional
 from zoneinfo import ZoneInfo
 
+import numpy as np
 import pandas as pd
 
 # ── Importar aiohttp para REST polling y datos históricos ──
@@ -44,11 +45,26 @@ except ImportError:
     aiohttp = None  # type: ignore[assignment]
 
 # ── Importar clases de Order Book desde orderbook.py ──
-from orderbook import OrderBookManager, QuoteNormalizado, PolygonQuotesWS
+from orderbook import CANAL_QUOTES, OrderBookManager, QuoteNormalizado, PolygonQuotesWS
 
 # ── Importar configuración centralizada (lee .env automáticamente) ──
+from almacen_series import BufferPrecios, HistorialVelas
+from cache_barras import DTYPE_BARRA, CacheBarras, barras_a_json, remuestrear_barras
+import calendario_mercado
+from calendario_mercado import CALENDARIO
+from cliente_rest import ErrorREST, cerrar_cliente, obtener_cliente
+from decodificador_polygon import DecodificadorPolygon, ErrorDecodificacion
+from grabador_polygon import FLUJO_TRADES, GrabadorPolygon
 from configuracion import CONFIG
+from difusion import DifusorPorSimbolo
+from feed_polygon import PolygonFeedWS
+from vuelo_unico import VueloUnico
 from mapeador_simbolos import Mapeador
+from metricas import METRICAS
+from monitor_loop import MonitorLoop
+from servidor_metricas import ExportadorPrometheus
+from suscripciones import GestorSuscripciones
+from registros_mercado import LoteTrades, TradeNormalizado
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Intentar importar websockets; si no está, dar instrucciones claras
@@ -95,8 +111,10 @@ CANAL_TRADES = "T"
 CANAL_CRYPTO_TRADES = "XT"
 ET = ZoneInfo("America/New_York")
 
-# REST API base URLs para crypto polling
-POLYGON_REST_BASE = "https://api.polygon.io"
+
+def _canal_trades(simbolo: str) -> str:
+    """Canal de Polygon del que llegan los trades de ``simbolo`` (T o XT)."""
+    return CANAL_CRYPTO_TRADES if Mapeador.es_crypto(simbolo) else CANAL_TRADES
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -107,12 +125,13 @@ class MarketSession:
     """Detecta la sesión actual del mercado basándose en la hora ET.
     
     Incluye detección de fines de semana y método is_open() para
-    determinar si se deben solicitar datos en tiempo real.
+    determinar si se deben solicitar datos en tiempo real. Festivos y
+    medias sesiones salen de ``calendario_mercado.CALENDARIO``.
     """
-    PRE_MARKET = "PRE_MARKET"
-    REGULAR = "REGULAR"
-    AFTER_HOURS = "AFTER_HOURS"
-    CLOSED = "CLOSED"
+    PRE_MARKET = calendario_mercado.PRE_MARKET
+    REGULAR = calendario_mercado.REGULAR
+    AFTER_HOURS = calendario_mercado.AFTER_HOURS
+    CLOSED = calendario_mercado.CLOSED
 
     LABELS = {
         "PRE_MARKET": "🟠 Pre-Market (4:00–9:30 AM ET)",
@@ -129,17 +148,8 @@ class MarketSession:
 
     @staticmethod
     def current() -> str:
-        """Detecta la sesión actual considerando fines de semana."""
-        # Si es fin de semana, siempre está cerrado
-        if MarketSession.es_fin_de_semana():
-            return MarketSession.CLOSED
-        now_et = datetime.now(ET)
-        t = now_et.hour * 60 + now_et.minute
-        if t < 240:    return MarketSession.CLOSED
-        elif t < 570:  return MarketSession.PRE_MARKET
-        elif t < 960:  return MarketSession.REGULAR
-        elif t < 1200: return MarketSession.AFTER_HOURS
-        else:          return MarketSession.CLOSED
+        """Detecta la sesión actual considerando fines de semana y festivos."""
+        return CALENDARIO.sesion_actual()
 
     @staticmethod
     def esta_abierto() -> bool:
@@ -151,64 +161,20 @@ class MarketSession:
         """Información completa de la sesión para enviar al frontend."""
         session = MarketSession.current()
         now_et = datetime.now(ET)
-        es_finde = MarketSession.es_fin_de_semana()
+        hoy = now_et.date()
         return {
             "session": session,
             "label": MarketSession.LABELS[session],
             "time_et": now_et.strftime("%H:%M:%S ET"),
-            "is_weekend": es_finde,
+            "is_weekend": now_et.weekday() >= 5,
             "is_open": session != MarketSession.CLOSED,
+            "holiday": CALENDARIO.festivo(hoy),
+            "half_day": CALENDARIO.es_media_sesion(hoy),
         }
 
 
 
 
-# ══════════════════════════════════════════════════════════════════════════════
-#  ESTRUCTURA DE DATOS — TRADE NORMALIZADO
-# ══════════════════════════════════════════════════════════════════════════════
-
-@dataclass
-class TradeNormalizado:
-    """Representa un trade individual normalizado desde el flujo de Polygon.
-
-    Campos originales de Polygon → Campos legibles:
-        sym → simbolo       Símbolo del activo (ej. "AAPL")
-        p   → precio        Precio de ejecución
-        s   → tamano        Tamaño/volumen del trade
-        t   → timestamp_ms  Timestamp en milisegundos (epoch)
-        x   → exchange_id   ID del exchange donde se ejecutó
-        c   → condiciones    Códigos de condición del trade
-    """
-    simbolo: str
-    precio: float
-    tamano: int
-    timestamp_ms: int
-    exchange_id: int = 0
-    condiciones: list = field(default_factory=list)
-
-    @property
-    def timestamp_dt(self) -> datetime:
-        """Convierte el timestamp de milisegundos a datetime UTC."""
-        return datetime.fromtimestamp(self.timestamp_ms / 1000, tz=timezone.utc)
-
-    @property
-    def latencia_ms(self) -> float:
-        """Calcula latencia aproximada: ahora - timestamp del trade."""
-        return (time.time() * 1000) - self.timestamp_ms
-
-    def to_dict(self) -> dict:
-        """Serializa a diccionario para alimentar DataFrames o gráficas."""
-        return {
-            "simbolo": self.simbolo,
-            "precio": self.precio,
-            "tamano": self.tamano,
-            "timestamp_ms": self.timestamp_ms,
-            "datetime_utc": self.timestamp_dt.isoformat(),
-            "exchange_id": self.exchange_id,
-            "latencia_ms": round(self.latencia_ms, 2),
-        }
-
-
 # ══════════════════════════════════════════════════════════════════════════════
 #  AGREGADOR DE VELAS OHLC EN TIEMPO REAL
 # ══════════════════════════════════════════════════════════════════════════════
@@ -220,18 +186,21 @@ class AgregadorOHLC:
         1. Cada trade entrante se asigna al "bucket" de su minuto.
         2. Cuando un trade pertenece a un minuto nuevo, la vela anterior se
            cierra y se emite como completa.
-        3. Se mantiene un historial por símbolo para alimentar gráficas.
+        3. Se mantiene un historial columnar y acotado por símbolo para
+           alimentar gráficas y análisis.
 
     Atributos:
         velas_en_curso : dict  → Vela actual por símbolo (aún no cerrada)
-        historial      : dict  → Lista de velas cerradas por símbolo
+        historial      : dict  → HistorialVelas (columnas NumPy) por símbolo
         intervalo_seg  : int   → Duración de cada vela en segundos (default: 60)
+        max_velas      : int   → Velas cerradas retenidas por símbolo
     """
 
-    def __init__(self, intervalo_seg: int = 60):
+    def __init__(self, intervalo_seg: int = 60, max_velas: int = 10_000):
         self.intervalo_seg = intervalo_seg
+        self.max_velas = max_velas
         self.velas_en_curso: dict[str, dict] = {}
-        self.historial: defaultdict[str, list[dict]] = defaultdict(list)
+        self.historial: dict[str, HistorialVelas] = {}
 
     def _calcular_bucket(self, timestamp_ms: int) -> int:
         """Calcula el inicio del bucket temporal al que pertenece el timestamp."""
@@ -257,7 +226,7 @@ class AgregadorOHLC:
 
             if bucket > vela_actual["bucket"]:
                 vela_cerrada = self._cerrar_vela(vela_actual)
-                self.historial[simbolo].append(vela_cerrada)
+                self._guardar_en_historial(vela_actual)
                 self.velas_en_curso[simbolo] = self._crear_vela(
                     simbolo, bucket, trade
                 )
@@ -270,20 +239,71 @@ class AgregadorOHLC:
 
         return vela_cerrada
 
-    def _crear_vela(self, simbolo: str, bucket: int, trade: TradeNormalizado) -> dict:
-        """Crea una nueva vela OHLC a partir del primer trade del intervalo."""
+    def procesar_lote(self, lote: LoteTrades) -> list[dict]:
+        """Aplica todos los trades de un frame de una vez.
+
+        Recorre el lote agrupado por símbolo: la vela en curso se busca una
+        sola vez por símbolo y OHLCV se acumula en variables locales. El
+        resultado es el mismo que llamar a ``procesar_trade`` por cada
+        trade en orden.
+
+        Returns:
+            Velas cerradas durante el frame, en orden por símbolo. Un
+            símbolo solo aporta más de una si el frame cruza varios
+            intervalos (ninguna se descarta: todas van al historial).
+        """
+        cerradas: list[dict] = []
+        intervalo = self.intervalo_seg
+        precios, tamanos, tiempos = lote.precio, lote.tamano, lote.timestamp_ms
+        for simbolo, indices in lote.indices_por_simbolo().items():
+            vela = self.velas_en_curso.get(simbolo)
+            if vela is None:
+                i = indices[0]
+                vela = self._vela_nueva(simbolo, tiempos[i] // 1000 // intervalo * intervalo,
+                                        precios[i], tamanos[i])
+                indices = indices[1:]
+            bucket = vela["bucket"]
+            alto, bajo, cierre = vela["high"], vela["low"], vela["close"]
+            volumen, n = vela["volume"], vela["num_trades"]
+            for i in indices:
+                precio = precios[i]
+                b = tiempos[i] // 1000 // intervalo * intervalo
+                if b > bucket:
+                    vela.update(high=alto, low=bajo, close=cierre, volume=volumen, num_trades=n)
+                    cerradas.append(self._cerrar_vela(vela))
+                    self._guardar_en_historial(vela)
+                    vela = self._vela_nueva(simbolo, b, precio, tamanos[i])
+                    bucket, alto, bajo, cierre = b, precio, precio, precio
+                    volumen, n = tamanos[i], 1
+                    continue
+                if precio > alto:
+                    alto = precio
+                if precio < bajo:
+                    bajo = precio
+                cierre = precio
+                volumen += tamanos[i]
+                n += 1
+            vela.update(high=alto, low=bajo, close=cierre, volume=volumen, num_trades=n)
+            self.velas_en_curso[simbolo] = vela
+        return cerradas
+
+    @staticmethod
+    def _vela_nueva(simbolo: str, bucket: int, precio: float, tamano: float) -> dict:
         return {
             "simbolo": simbolo,
             "bucket": bucket,
-            "datetime_utc": datetime.fromtimestamp(bucket, tz=timezone.utc).isoformat(),
-            "open": trade.precio,
-            "high": trade.precio,
-            "low": trade.precio,
-            "close": trade.precio,
-            "volume": trade.tamano,
+            "open": precio,
+            "high": precio,
+            "low": precio,
+            "close": precio,
+            "volume": tamano,
             "num_trades": 1,
         }
 
+    def _crear_vela(self, simbolo: str, bucket: int, trade: TradeNormalizado) -> dict:
+        """Crea una nueva vela OHLC a partir del primer trade del intervalo."""
+        return self._vela_nueva(simbolo, bucket, trade.precio, trade.tamano)
+
     @staticmethod
     def _actualizar_vela(vela: dict, trade: TradeNormalizado) -> None:
         """Actualiza una vela existente con un nuevo trade (in-place)."""
@@ -293,12 +313,25 @@ class AgregadorOHLC:
         vela["volume"] += trade.tamano
         vela["num_trades"] += 1
 
+    def _guardar_en_historial(self, vela: dict) -> None:
+        hist = self.historial.get(vela["simbolo"])
+        if hist is None:
+            hist = self.historial[vela["simbolo"]] = HistorialVelas(self.max_velas)
+        hist.agregar(
+            vela["bucket"], vela["open"], vela["high"], vela["low"],
+            vela["close"], vela["volume"], vela["num_trades"],
+        )
+
     @staticmethod
     def _cerrar_vela(vela: dict) -> dict:
-        """Retorna una copia limpia de la vela cerrada (sin 'bucket' interno)."""
+        """Retorna una copia limpia de la vela cerrada (sin 'bucket' interno).
+
+        El ISO ``datetime_utc`` solo se construye aquí, una vez por vela
+        cerrada, para los callbacks; el historial guarda el epoch entero.
+        """
         return {
             "simbolo": vela["simbolo"],
-            "datetime_utc": vela["datetime_utc"],
+            "datetime_utc": datetime.fromtimestamp(vela["bucket"], tz=timezone.utc).isoformat(),
             "open": vela["open"],
             "high": vela["high"],
             "low": vela["low"],
@@ -314,23 +347,274 @@ class AgregadorOHLC:
             simbolo: Ticker del activo (ej. "AAPL").
 
         Returns:
-            DataFrame con columnas: datetime_utc, open, high, low, close, volume.
+            DataFrame indexado por datetime_utc con columnas: open, high, low,
+            close, volume, num_trades (vistas de solo lectura del historial).
         """
-        datos = self.historial.get(simbolo, [])
-        if not datos:
-            return pd.DataFrame(
-                columns=["datetime_utc", "open", "high", "low", "close", "volume"]
-            )
-        df = pd.DataFrame(datos)
-        df["datetime_utc"] = pd.to_datetime(df["datetime_utc"])
-        df = df.set_index("datetime_utc")
-        return df
+        hist = self.historial.get(simbolo)
+        if hist is None:
+            return HistorialVelas(1).dataframe()
+        return hist.dataframe()
+
+    def obtener_arrays(self, simbolo: str) -> dict[str, np.ndarray]:
+        """Columnas del historial (bucket, open, ..., num_trades) sin copia."""
+        hist = self.historial.get(simbolo)
+        if hist is None:
+            return HistorialVelas(1).arrays()
+        return hist.arrays()
 
     def obtener_vela_actual(self, simbolo: str) -> Optional[dict]:
         """Retorna la vela en curso (aún no cerrada) para un símbolo."""
         return self.velas_en_curso.get(simbolo)
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+#  AGREGADOR MULTI-TIMEFRAME — Velas base + roll-up a marcos superiores
+# ══════════════════════════════════════════════════════════════════════════════
+
+class AgregadorMultiTF:
+    """Mantiene a la vez las velas de varios timeframes desde el flujo de trades.
+
+    Cómo funciona:
+        1. Cada trade solo toca la vela base abierta (``tf_base``, 5 s).
+        2. Al cerrarse una vela base se pliega (roll-up) en la vela parcial de
+           cada timeframe superior; la parcial se cierra cuando llega una vela
+           base de otro bucket.
+        3. La vela abierta de un timeframe superior = parcial + base abierta.
+        4. ``sembrar`` mezcla el historial REST de un timeframe con lo que ya
+           se construyó en vivo; durante ``max_edad_siembra_seg`` ese timeframe
+           se sirve de memoria sin volver a Polygon. El historial se guarda
+           como array de CacheBarras y ``velas_json`` lo serializa sin pasar
+           por dicts.
+        5. Pasada esa edad, o tras ``caducar`` (reconexión del feed), la
+           siguiente carga vuelve a sembrar y REST reemplaza las velas
+           cerradas en vivo, que pueden tener huecos.
+
+    Las velas usan el mismo formato que ``init_ohlc``:
+        {"time", "open", "high", "low", "close", "volume"}
+
+    Parámetros:
+        timeframes : tuple → Timeframes en segundos; el menor es la base y los
+                             demás deben ser múltiplos suyos
+        max_velas  : int   → Velas cerradas retenidas por símbolo y timeframe
+        max_edad_siembra_seg : float → Tiempo que una siembra se sirve de memoria
+    """
+
+    TIMEFRAMES = (5, 60, 300, 900, 3600)
+
+    def __init__(self, timeframes: tuple[int, ...] = TIMEFRAMES, max_velas: int = 500,
+                 max_edad_siembra_seg: float = 900.0):
+        self.timeframes = tuple(sorted(timeframes))
+        self.tf_base = self.timeframes[0]
+        self.superiores = self.timeframes[1:]
+        if any(tf % self.tf_base for tf in self.superiores):
+            raise ValueError("los timeframes deben ser múltiplos del timeframe base")
+        self.max_velas = max_velas
+        self.max_edad_siembra_seg = max_edad_siembra_seg
+        self._base: dict[str, dict] = {}                   # símbolo → vela base abierta
+        self._parciales: defaultdict[str, dict[int, dict]] = defaultdict(dict)  # símbolo → {tf: vela}
+        self._cerradas: dict[tuple[str, int], deque] = {}  # (símbolo, tf) → velas cerradas en vivo
+        self._historicas: dict[tuple[str, int], np.ndarray] = {}  # (símbolo, tf) → barras REST previas
+        self._sembrados: dict[tuple[str, int], float] = {}  # (símbolo, tf) → monotonic de la siembra
+
+    # ── Flujo en vivo ──
+
+    def procesar(self, simbolo: str, precio: float, tamano: float, ts_seg: int) -> None:
+        """Pliega un trade en la vela base abierta del símbolo."""
+        bucket = ts_seg - ts_seg % self.tf_base
+        base = self._base.get(simbolo)
+        if base is None or bucket > base["time"]:
+            if base is not None:
+                self._cerrar_base(simbolo, base)
+            self._base[simbolo] = {
+                "time": bucket, "open": precio, "high": precio,
+                "low": precio, "close": precio, "volume": tamano,
+            }
+            self._cerrar_parciales(simbolo, bucket)
+            return
+        # Trades tardíos del bucket anterior se pliegan en la vela abierta
+        if precio > base["high"]:
+            base["high"] = precio
+        elif precio < base["low"]:
+            base["low"] = precio
+        base["close"] = precio
+        base["volume"] += tamano
+
+    def _cerrar_base(self, simbolo: str, base: dict) -> None:
+        self._cola(simbolo, self.tf_base).append(base)
+        parciales = self._parciales[simbolo]
+        for tf in self.superiores:
+            bucket = base["time"] - base["time"] % tf
+            parcial = parciales.get(tf)
+            if parcial is None or parcial["time"] != bucket:
+                parciales[tf] = dict(base, time=bucket)
+            else:
+                _plegar_vela(parcial, base)
+
+    def _cerrar_parciales(self, simbolo: str, bucket_base: int) -> None:
+        """Cierra las parciales cuyo bucket ya no contiene la vela base nueva."""
+        parciales = self._parciales.get(simbolo)
+        if not parciales:
+            return
+        for tf in self.superiores:
+            parcial = parciales.get(tf)
+            if parcial is not None and parcial["time"] != bucket_base - bucket_base % tf:
+                self._cola(simbolo, tf).append(parciales.pop(tf))
+
+    def _cola(self, simbolo: str, tf: int) -> deque:
+        cola = self._cerradas.get((simbolo, tf))
+        if cola is None:
+            cola = self._cerradas[(simbolo, tf)] = deque(maxlen=self.max_velas)
+        return cola
+
+    # ── Lectura ──
+
+    def soporta(self, tf: int) -> bool:
+        return tf in self.timeframes
+
+    def vela_abierta(self, simbolo: str, tf: int) -> Optional[dict]:
+        """Copia de la vela en curso del timeframe (None si no hay trades)."""
+        base = self._base.get(simbolo)
+        if tf == self.tf_base:
+            return dict(base) if base else None
+        parcial = self._parciales.get(simbolo, {}).get(tf)
+        if base is None:
+            return dict(parcial) if parcial else None
+        if parcial is None:
+            return dict(base, time=base["time"] - base["time"] % tf)
+        vela = dict(parcial)
+        _plegar_vela(vela, base)
+        return vela
+
+    def velas(self, simbolo: str, tf: int, limite: int | None = None) -> list[dict]:
+        """Velas cerradas + la abierta, en orden temporal (formato init_ohlc)."""
+        historicas, vivas = self._partes(simbolo, tf, limite)
+        return _barras_a_velas(historicas) + vivas
+
+    def velas_json(self, simbolo: str, tf: int, limite: int | None = None) -> tuple[str, int]:
+        """Como ``velas`` pero ya serializado: (array JSON, número de velas)."""
+        historicas, vivas = self._partes(simbolo, tf, limite)
+        partes = [barras_a_json(historicas)[1:-1] if len(historicas) else "",
+                  json.dumps(vivas)[1:-1] if vivas else ""]
+        return "[" + ", ".join(p for p in partes if p) + "]", len(historicas) + len(vivas)
+
+    def _partes(self, simbolo: str, tf: int, limite: int | None) -> tuple[np.ndarray, list[dict]]:
+        """Últimas ``limite`` velas: barras REST (array) + velas vivas (dicts).
+
+        Las históricas llenan solo lo que las vivas dejan libre de
+        ``max_velas``, igual que si compartieran una única cola, y se cortan
+        antes de la primera vela viva para no repetir buckets.
+        """
+        vivas = list(self._cerradas.get((simbolo, tf), ()))
+        abierta = self.vela_abierta(simbolo, tf)
+        if abierta is not None:
+            vivas.append(abierta)
+        historicas = self._historicas.get((simbolo, tf), _SIN_BARRAS)
+        if vivas and len(historicas):
+            historicas = historicas[:np.searchsorted(historicas["t"], vivas[0]["time"])]
+        cupo = self.max_velas - len(self._cerradas.get((simbolo, tf), ()))
+        if limite:
+            vivas = vivas[-limite:]
+            cupo = min(cupo, limite - len(vivas))
+        return (historicas[len(historicas) - cupo:] if cupo > 0 else _SIN_BARRAS), vivas
+
+    def esta_sembrado(self, simbolo: str, tf: int) -> bool:
+        """True si el timeframe tiene historial REST reciente y se sirve de memoria."""
+        sembrado = self._sembrados.get((simbolo, tf))
+        return sembrado is not None and time.monotonic() - sembrado < self.max_edad_siembra_seg
+
+    def caducar(self, simbolos=None) -> None:
+        """Fuerza una nueva siembra de ``simbolos`` (todos si es None).
+
+        Conserva las velas: la próxima carga las completa con REST. Para
+        cuando el flujo vivo pudo perder trades (reconexión del feed).
+        """
+        for clave in self._sembrados:
+            if simbolos is None or clave[0] in simbolos:
+                self._sembrados[clave] = float("-inf")
+
+    def olvidar(self, simbolo: str) -> None:
+        """Descarta velas e historial del símbolo en todos los timeframes.
+
+        Para cuando deja de llegar el flujo vivo (desuscripción): sin él las
+        velas en memoria quedarían con un hueco y la próxima carga debe volver
+        a pasar por el cache/REST.
+        """
+        self._base.pop(simbolo, None)
+        self._parciales.pop(simbolo, None)
+        for tf in self.timeframes:
+            self._cerradas.pop((simbolo, tf), None)
+            self._historicas.pop((simbolo, tf), None)
+            self._sembrados.pop((simbolo, tf), None)
+
+    # ── Siembra desde REST ──
+
+    def sembrar(self, simbolo: str, tf: int, barras: np.ndarray) -> None:
+        """Mezcla barras REST (array de CacheBarras, ascendente) con las vivas.
+
+        Las barras anteriores al primer bucket vivo se anteponen; el bucket
+        en el que arrancó el flujo vivo toma apertura/extremos de REST porque
+        en vivo solo se vio su parte final.
+        """
+        if tf not in self.timeframes or not len(barras):
+            return
+        vivas = self._cerradas.get((simbolo, tf))
+        if vivas and (simbolo, tf) in self._sembrados:
+            # Re-siembra: las velas cerradas en vivo pueden tener huecos; donde
+            # REST ya tiene barra manda REST, solo se conserva la cola posterior
+            ultima = int(barras["t"][-1])
+            vivas = self._cerradas[(simbolo, tf)] = deque(
+                (v for v in vivas if v["time"] >= ultima), maxlen=self.max_velas)
+        if tf == self.tf_base:
+            abierta = self._base.get(simbolo)
+        else:
+            abierta = self._parciales.get(simbolo, {}).get(tf)
+        if vivas:
+            primera = vivas[0]
+        elif abierta is not None:
+            primera = abierta
+        elif tf != self.tf_base and simbolo in self._base:
+            primera = self.vela_abierta(simbolo, tf)
+        else:
+            primera = None
+
+        if primera is None:
+            previas = barras
+        else:
+            corte = int(np.searchsorted(barras["t"], primera["time"]))
+            previas = barras[:corte]
+            if corte < len(barras) and barras["t"][corte] == primera["time"]:
+                coincidente = _barras_a_velas(barras[corte:corte + 1])[0]
+                if primera is abierta or (vivas and primera is vivas[0]):
+                    _fusionar_inicio(primera, coincidente)
+                elif tf != self.tf_base:
+                    # Aún no hay parcial: la vela REST pasa a serlo
+                    self._parciales[simbolo][tf] = coincidente
+
+        self._historicas[(simbolo, tf)] = previas[-self.max_velas:].copy()
+        self._sembrados[(simbolo, tf)] = time.monotonic()
+
+
+_SIN_BARRAS = np.empty(0, dtype=DTYPE_BARRA)
+
+
+def _plegar_vela(destino: dict, vela: dict) -> None:
+    """Acumula ``vela`` (posterior) sobre ``destino`` in-place."""
+    if vela["high"] > destino["high"]:
+        destino["high"] = vela["high"]
+    if vela["low"] < destino["low"]:
+        destino["low"] = vela["low"]
+    destino["close"] = vela["close"]
+    destino["volume"] += vela["volume"]
+
+
+def _fusionar_inicio(viva: dict, rest: dict) -> None:
+    """Completa la primera vela viva con la apertura y extremos de la de REST."""
+    viva["open"] = rest["open"]
+    viva["high"] = max(viva["high"], rest["high"])
+    viva["low"] = min(viva["low"], rest["low"])
+    viva["volume"] = max(viva["volume"], rest["volume"])
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 #  CHART SERVER — WebSocket para visualización en navegador
 # ══════════════════════════════════════════════════════════════════════════════
@@ -348,25 +632,50 @@ class ChartServer:
         {"type": "symbols", "symbols": ["AAPL", "TSLA"]}
         {"type": "init", "symbol": "AAPL", "data": [{"time": 1234567, "value": 150.25}, ...]}
         {"type": "tick", "symbol": "AAPL", "time": 1234567, "value": 150.30}
+        {"type": "ticks", "symbol": "AAPL", "data": [{"time": 1234567, "value": 150.30}, ...]}
         {"type": "session", "session": "AFTER_HOURS", "label": "...", "time_et": "..."}
 
     Protocolo de mensajes (Browser → Server):
         {"action": "subscribe", "symbol": "TSLA"}
+        {"action": "subscribe", "symbol": "TSLA", "batch": true}
+
+    Con "batch": true la conexión deja de recibir un "tick" por trade y pasa a
+    recibir un "ticks" cada ``intervalo_lote_seg`` con el último precio de cada
+    segundo tocado en la ventana (misma semántica que el buffer de precios).
+    El lote lleva además la vela abierta del timeframe de esa conexión:
+        {"type": "ticks", "symbol": "AAPL", "timeframe": 60, "data": [...],
+         "candle": {"time", "open", "high", "low", "close", "volume"}}
     """
 
+    GRUPO_LOTE = "lote"
+    # Canales de Polygon que necesita un navegador mirando un símbolo
+    CANALES_POLYGON = ("trades", "quotes")
+
     def __init__(self, simbolos: list[str], host: str = "localhost", port: int = 8765,
-                 on_nuevo_simbolo_cb=None):
+                 max_cola_cliente: int = 256,
+                 intervalo_lote_seg: float = 0.05):
         self.simbolos = simbolos
         self.host = host
         self.port = port
-        self._clients: set = set()
-        self._client_symbols: dict = {}
+        # Índice símbolo → navegadores + colas de salida acotadas por conexión
+        self._difusor = DifusorPorSimbolo(max_cola=max_cola_cliente)
+        # Micro-lotes: símbolo → {ts_seg: último precio} pendiente de enviar
+        self._intervalo_lote = intervalo_lote_seg
+        self._lotes_pendientes: dict[str, dict[int, float]] = {}
+        self._clientes_lote: set = set()  # conexiones suscritas con "batch"
+        self._vaciado_lote = None  # asyncio.TimerHandle del próximo vaciado
         self._client_timeframes: dict = {}  # Timeframe seleccionado por cada cliente
-        self._price_buffer: defaultdict[str, dict[int, float]] = defaultdict(dict)
+        # Último precio por segundo de cada símbolo (ring buffer que crece hasta su capacidad)
+        self._price_buffer: defaultdict[str, BufferPrecios] = defaultdict(BufferPrecios)
+        # Velas de todos los timeframes del frontend, construidas en vivo
+        self.agregador_tf = AgregadorMultiTF(max_edad_siembra_seg=CONFIG.HISTORIAL_MEMORIA_MAX_SEG)
+        # Historial REST persistente: días cerrados en disco, hoy en memoria
+        self.cache_barras = CacheBarras(CONFIG.CACHE_BARRAS_DIR)
+        # Cargas de historial en curso: (símbolo, tf, desde, hasta) → tarea compartida
+        self._vuelos_historico = VueloUnico()
         self._server = None
-        # Callback opcional: (simbolo: str) → se llama cuando el browser suscribe un símbolo nuevo
-        self._on_nuevo_simbolo = on_nuevo_simbolo_cb
-
+        # Interés por símbolo compartido con OrderBookServer (lo asigna main)
+        self.suscripciones: Optional[GestorSuscripciones] = None
 
     async def iniciar(self) -> None:
         """Inicia el servidor WebSocket para conexiones del navegador."""
@@ -377,6 +686,9 @@ class ChartServer:
 
     async def detener(self) -> None:
         """Detiene el servidor WebSocket."""
+        if self._vaciado_lote is not None:
+            self._vaciado_lote.cancel()
+            self._vaciado_lote = None
         if self._server:
             self._server.close()
             await self._server.wait_closed()
@@ -384,9 +696,10 @@ class ChartServer:
 
     async def _handler(self, ws) -> None:
         """Maneja cada conexión de navegador."""
-        self._clients.add(ws)
+        self._difusor.registrar(ws)
         simbolo = self.simbolos[0] if self.simbolos else ""
-        self._client_symbols[ws] = simbolo
+        self._difusor.suscribir(ws, simbolo)
+        self._cambiar_interes(None, simbolo)
         self._client_timeframes[ws] = 60  # Timeframe por defecto: 1 minuto
         logger.info("Navegador conectado — enviando datos de '%s'", simbolo)
 
@@ -414,22 +727,25 @@ class ChartServer:
                     continue
                 if data.get("action") == "subscribe":
                     new_sym = data.get("symbol", simbolo).upper()
+                    if data.get("batch"):
+                        self._clientes_lote.add(ws)
+                    else:
+                        self._clientes_lote.discard(ws)
                     # Aceptar cualquier símbolo válido (no solo los del .env)
-                    self._client_symbols[ws] = new_sym
+                    self._difusor.suscribir(ws, new_sym, self._grupo_cliente(ws))
+                    self._cambiar_interes(simbolo, new_sym)
                     simbolo = new_sym
                     # Siempre cargar historial REST para el timeframe actual del cliente
                     tf = self._client_timeframes.get(ws, 60)
                     await self._cargar_y_enviar_historico(ws, new_sym, tf)
                     await self._enviar_session(ws)
                     logger.info("Navegador suscrito a símbolo '%s' (tf=%ds)", new_sym, tf)
-                    # ── Suscribir en caliente al motor de trades para recibir ticks ──
-                    if self._on_nuevo_simbolo:
-                        await self._on_nuevo_simbolo(new_sym)
 
                 # ── Nuevo: cambio de timeframe desde el frontend ──
                 elif data.get("action") == "set_timeframe":
                     tf_sec = int(data.get("timeframe", 60))
                     self._client_timeframes[ws] = tf_sec
+                    self._difusor.suscribir(ws, simbolo, self._grupo_cliente(ws))
                     logger.info("[TIMEFRAME] Navegador cambió a %ds para '%s'", tf_sec, simbolo)
                     # Re-cargar historial para este timeframe
                     await self._cargar_y_enviar_historico(ws, simbolo, tf_sec)
@@ -437,17 +753,53 @@ class ChartServer:
         except websockets.ConnectionClosed:
             pass
         finally:
-            self._clients.discard(ws)
-            self._client_symbols.pop(ws, None)
+            self._difusor.eliminar(ws)
+            self._cambiar_interes(simbolo, None)
             self._client_timeframes.pop(ws, None)
+            self._clientes_lote.discard(ws)
             logger.info("Navegador desconectado")
 
+    def _cambiar_interes(self, anterior: Optional[str], nuevo: Optional[str]) -> None:
+        """Pasa el interés de esta conexión de ``anterior`` a ``nuevo`` en Polygon."""
+        if self.suscripciones is not None:
+            self.suscripciones.cambiar(self.CANALES_POLYGON, anterior, nuevo)
+        # Crypto no pasa por el gestor de suscripciones: sus velas se
+        # descartan en cuanto el último navegador deja de mirarlo
+        if (anterior and anterior != nuevo and Mapeador.es_crypto(anterior)
+                and not self._difusor.num_suscriptores(anterior)):
+            self.olvidar_simbolos([anterior])
+
+    def olvidar_simbolos(self, simbolos: list[str]) -> None:
+        """Símbolos desuscritos de trades: la próxima carga vuelve a cache/REST."""
+        for simbolo in simbolos:
+            self.agregador_tf.olvidar(simbolo)
+            self._price_buffer.pop(simbolo, None)
+        logger.info("[HISTORICO] Velas en memoria descartadas: %s", ", ".join(simbolos))
+
+    def caducar_historial(self) -> None:
+        """Reconexión del feed de trades: las velas en memoria pueden tener un hueco."""
+        self.agregador_tf.caducar()
+        logger.info("[HISTORICO] Reconexión del feed — el historial se re-siembra en la próxima carga")
+
+    def _grupo_cliente(self, ws) -> str:
+        """Grupo del difusor: "" por tick, o "lote:<tf>" para conexiones en lote."""
+        if ws not in self._clientes_lote:
+            return ""
+        return f"{self.GRUPO_LOTE}:{self._client_timeframes.get(ws, 60)}"
+
     async def _cargar_y_enviar_historico(self, ws, simbolo: str, tf_sec: int) -> None:
-        """Carga historial de 500 velas para el timeframe solicitado y lo envía."""
-        try:
-            import aiohttp
-        except ImportError:
-            logger.warning("[HISTORICO] aiohttp no instalado para recarga de timeframe")
+        """Carga historial de 500 velas para el timeframe solicitado y lo envía.
+
+        Si el timeframe ya se sembró desde REST, el agregador multi-timeframe
+        lo mantiene al día con los trades en vivo y se sirve de memoria. Si
+        no, las barras salen del cache en disco y solo la cola que falta va a REST.
+        Las cargas concurrentes del mismo (símbolo, timeframe, rango) comparten
+        una sola descarga y el mismo payload ``init_ohlc`` ya serializado.
+        """
+        if self.agregador_tf.esta_sembrado(simbolo, tf_sec):
+            candles, n = self.agregador_tf.velas_json(simbolo, tf_sec, limite=500)
+            await ws.send(self._serializar_init_ohlc(simbolo, tf_sec, candles, n, "memoria"))
+            logger.info("[HISTORICO] %s: %d velas de %ds servidas de memoria", simbolo, n, tf_sec)
             return
 
         # Calcular cuántos días atrás necesitamos para 500 velas
@@ -455,79 +807,76 @@ class ChartServer:
         hoy = datetime.now(ET).date()
         desde = hoy - timedelta(days=dias_necesarios)
 
-        # Determinar el multiplier y timespan para Polygon REST API
-        if tf_sec < 60:
-            timespan = "second"
-            multiplier = tf_sec
-        elif tf_sec < 3600:
-            timespan = "minute"
-            multiplier = tf_sec // 60
+        try:
+            payload = await self._vuelos_historico.ejecutar(
+                (simbolo, tf_sec, desde, hoy),
+                lambda: self._construir_init_ohlc(simbolo, tf_sec, desde, hoy),
+            )
+        except Exception as e:
+            logger.error("[HISTORICO] Error recargando %s: %s", simbolo, e)
+            return
+        if payload is not None:
+            await ws.send(payload)
+
+    async def _construir_init_ohlc(self, simbolo: str, tf_sec: int, desde, hoy) -> str | None:
+        """Descarga/lee las barras y devuelve el mensaje ``init_ohlc`` serializado.
+
+        Todo el camino es columnar: filtro de horario, remuestreo, recorte y
+        JSON salen del array de CacheBarras sin crear un dict por barra.
+        """
+        multiplier, timespan = _parametros_aggs(tf_sec)
+        # 5m/15m se remuestrean desde las barras de 1 minuto: comparten
+        # cache en disco con el timeframe inicial y no gastan cupo REST
+        remuestreo = timespan == "minute" and multiplier > 1
+        if remuestreo:
+            multiplier = 1
+        logger.info("[HISTORICO] Recargando %d velas de %ds para %s...", 500, tf_sec, simbolo)
+        barras = await self.obtener_barras(simbolo, multiplier, timespan, desde, hoy)
+        if not len(barras):
+            logger.warning("[HISTORICO] Sin datos para %s en timeframe %ds", simbolo, tf_sec)
+            return None
+
+        # Stocks: eliminar barras fuera de market hours para timeline continua
+        if not Mapeador.es_crypto(simbolo):
+            barras = barras[CALENDARIO.mascara_horario(barras["t"])]
+        if remuestreo:
+            barras = remuestrear_barras(barras, tf_sec)
+
+        # Las últimas 500 barras, completadas con lo construido en vivo
+        barras = barras[-500:]
+        if self.agregador_tf.soporta(tf_sec):
+            self.agregador_tf.sembrar(simbolo, tf_sec, barras)
+            candles, n = self.agregador_tf.velas_json(simbolo, tf_sec, limite=500)
         else:
-            timespan = "hour"
-            multiplier = tf_sec // 3600
+            candles, n = barras_a_json(barras), len(barras)
 
-        polygon_ticker = Mapeador.a_polygon_ticker(simbolo)
-        url = (
-            f"https://api.polygon.io/v2/aggs/ticker/{polygon_ticker}/range/"
-            f"{multiplier}/{timespan}/"
-            f"{desde.isoformat()}/{hoy.isoformat()}"
-            f"?adjusted=true&sort=asc&limit=5000&apiKey={CONFIG.POLYGON_API_KEY}"
-        )
+        logger.info("[HISTORICO] %s: %d velas OHLC de %ds preparadas", simbolo, n, tf_sec)
+        return self._serializar_init_ohlc(simbolo, tf_sec, candles, n, "polygon_rest")
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                logger.info("[HISTORICO] Recargando %d velas de %ds para %s...", 500, tf_sec, simbolo)
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as resp:
-                    if resp.status != 200:
-                        logger.error("[HISTORICO] Error HTTP %d", resp.status)
-                        return
-                    data = await resp.json()
-
-            results = data.get("results", [])
-            if not results:
-                logger.warning("[HISTORICO] Sin datos para %s en timeframe %ds", simbolo, tf_sec)
-                return
-
-            # Convertir a formato {time, open, high, low, close, volume} ─ velas OHLC reales
-            candles = []
-            for bar in results:
-                ts_ms = bar.get("t", 0)
-                c = bar.get("c", 0.0)
-                if ts_ms and c:
-                    t = ts_ms // 1000
-                    candles.append({
-                        "time":   t,
-                        "open":   bar.get("o", c),
-                        "high":   bar.get("h", c),
-                        "low":    bar.get("l", c),
-                        "close":  c,
-                        "volume": bar.get("v", 0),
-                    })
-
-            # Stocks: eliminar barras fuera de market hours para timeline continua
-            if not Mapeador.es_crypto(simbolo):
-                candles = [b for b in candles if _en_horario_mercado(b["time"])]
+    async def obtener_barras(self, simbolo: str, multiplier: int, timespan: str,
+                             desde, hasta) -> np.ndarray:
+        """Barras de /v2/aggs a través del cache en disco (solo la cola faltante va a REST)."""
+        polygon_ticker = Mapeador.a_polygon_ticker(simbolo)
 
-            # Tomar las últimas 500 barras
-            candles = candles[-500:]
+        async def descargar(desde_rest: str, hasta_rest: str) -> list[dict]:
+            return await _descargar_aggs(
+                polygon_ticker, multiplier, timespan, desde_rest, hasta_rest
+            )
 
-            await ws.send(json.dumps({
-                "type": "init_ohlc",
-                "symbol": simbolo,
-                "candles": candles,
-                "timeframe": tf_sec,
-                "source": "polygon_rest",
-                "candles_loaded": len(candles),
-            }))
-            logger.info("[HISTORICO] %s: %d velas OHLC de %ds enviadas", simbolo, len(candles), tf_sec)
+        return await self.cache_barras.obtener(
+            polygon_ticker, multiplier, timespan, desde, hasta, descargar
+        )
 
-        except Exception as e:
-            logger.error("[HISTORICO] Error recargando %s: %s", simbolo, e)
+    @staticmethod
+    def _serializar_init_ohlc(simbolo: str, tf_sec: int, candles: str, n: int, fuente: str) -> str:
+        """Mensaje ``init_ohlc`` con ``candles`` ya serializado (array JSON)."""
+        return (f'{{"type": "init_ohlc", "symbol": {json.dumps(simbolo)}, "candles": {candles}, '
+                f'"timeframe": {tf_sec}, "source": {json.dumps(fuente)}, "candles_loaded": {n}}}')
 
     async def _enviar_init(self, ws, simbolo: str) -> None:
         """Envía historial de precios acumulados para un símbolo."""
-        buffer = self._price_buffer.get(simbolo, {})
-        data = [{"time": t, "value": v} for t, v in sorted(buffer.items())]
+        buffer = self._price_buffer.get(simbolo)
+        data = [{"time": t, "value": v} for t, v in buffer.items()] if buffer else []
         await ws.send(json.dumps({
             "type": "init",
             "symbol": simbolo,
@@ -543,35 +892,76 @@ class ChartServer:
 
     def broadcast_session(self) -> None:
         """Envía la sesión actual a todos los navegadores conectados."""
-        if not self._clients:
+        if not len(self._difusor):
             return
         msg = json.dumps({"type": "session", **MarketSession.info()})
-        websockets.broadcast(self._clients, msg)
+        self._difusor.enviar_todos(msg)
 
-    def registrar_tick(self, simbolo: str, precio: float, timestamp_ms: int) -> None:
+    def registrar_tick(self, simbolo: str, precio: float, timestamp_ms: int,
+                       tamano: float = 0) -> None:
         """Registra un trade y transmite al navegador en tiempo real.
 
-        Los precios se agregan por segundo (último precio del segundo).
+        Los precios se agregan por segundo (último precio del segundo) y el
+        trade alimenta además las velas de todos los timeframes.
         Stocks: ignora ticks fuera de market hours para evitar huecos muertos.
         """
         ts_seg = timestamp_ms // 1000
 
         # Stocks: no registrar ticks fuera de horario de mercado
-        if not Mapeador.es_crypto(simbolo) and not _en_horario_mercado(ts_seg):
+        if not Mapeador.es_crypto(simbolo) and not CALENDARIO.en_horario(ts_seg):
             return
 
-        self._price_buffer[simbolo][ts_seg] = precio
+        self._price_buffer[simbolo].agregar(ts_seg, precio)
+        self.agregador_tf.procesar(simbolo, precio, tamano, ts_seg)
+
+        # Serializar una sola vez y solo si alguien mira el símbolo
+        if self._difusor.tiene_suscriptores(simbolo, ""):
+            t0 = time.perf_counter_ns()
+            msg = json.dumps({"type": "tick", "symbol": simbolo, "time": ts_seg, "value": precio})
+            METRICAS.registrar_ns("serializacion", "chart", time.perf_counter_ns() - t0)
+            self._difusor.enviar(simbolo, msg)
+            METRICAS.registrar_difusion("chart", _canal_trades(simbolo), simbolo)
+
+        # Conexiones en modo lote: acumular y vaciar al cerrar la ventana
+        if self._difusor.num_suscriptores(simbolo) > self._difusor.num_suscriptores(simbolo, ""):
+            pendiente = self._lotes_pendientes.get(simbolo)
+            if pendiente is None:
+                pendiente = self._lotes_pendientes[simbolo] = {}
+            pendiente[ts_seg] = precio
+            if self._vaciado_lote is None:
+                self._vaciado_lote = asyncio.get_running_loop().call_later(
+                    self._intervalo_lote, self._vaciar_lotes
+                )
 
-        buf = self._price_buffer[simbolo]
-        if len(buf) > 50000:
-            sorted_times = sorted(buf.keys())
-            for t in sorted_times[:-40000]:
-                del buf[t]
+    def obtener_metricas(self) -> dict:
+        """Colas de salida, descartes y navegadores por símbolo."""
+        return {
+            **self._difusor.obtener_metricas(),
+            "clientes_por_simbolo": {
+                s: self._difusor.num_suscriptores(s) for s in self._difusor.simbolos_suscritos()
+            },
+            "cache_barras": self.cache_barras.obtener_metricas(),
+        }
 
-        msg = json.dumps({"type": "tick", "symbol": simbolo, "time": ts_seg, "value": precio})
-        targets = {ws for ws in self._clients if self._client_symbols.get(ws) == simbolo}
-        if targets:
-            websockets.broadcast(targets, msg)
+    def _vaciar_lotes(self) -> None:
+        """Envía un "ticks" por símbolo y timeframe con lo acumulado en la ventana."""
+        self._vaciado_lote = None
+        lotes, self._lotes_pendientes = self._lotes_pendientes, {}
+        for simbolo, pendiente in lotes.items():
+            data = [{"time": t, "value": v} for t, v in sorted(pendiente.items())]
+            for grupo in self._difusor.grupos_de(simbolo):
+                if not grupo.startswith(self.GRUPO_LOTE):
+                    continue
+                tf = int(grupo.rpartition(":")[2])
+                msg = {"type": "ticks", "symbol": simbolo, "timeframe": tf, "data": data}
+                vela = self.agregador_tf.vela_abierta(simbolo, tf)
+                if vela is not None:
+                    msg["candle"] = vela
+                t0 = time.perf_counter_ns()
+                texto = json.dumps(msg)
+                METRICAS.registrar_ns("serializacion", "chart", time.perf_counter_ns() - t0)
+                self._difusor.enviar(simbolo, texto, grupo)
+            METRICAS.registrar_difusion("chart", _canal_trades(simbolo), simbolo)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -582,29 +972,65 @@ class OrderBookServer:
     """Servidor WebSocket local que transmite snapshots del Order Book al navegador.
 
     El navegador (chart.html) se conecta a ws://localhost:8766 y recibe:
-        - Snapshots del order book cada vez que cambia
+        - Un snapshot completo al suscribirse (con número de secuencia)
+        - Después solo deltas: niveles cambiados/nuevos y precios eliminados
 
     Protocolo de mensajes (Server → Browser):
-        {"type": "book", "symbol": "AAPL", "bids": [...], "asks": [...],
+        {"type": "book", "symbol": "AAPL", "seq": 41, "bids": [...], "asks": [...],
          "best_bid": 189.50, "best_ask": 189.51, "spread": 0.01, "mid_price": 189.505}
+        {"type": "book_delta", "symbol": "AAPL", "seq": 42,
+         "bids": {"upd": [{"precio", "tamano", "exchanges", "interpolado"}, ...],
+                  "del": [189.42, ...]},
+         "asks": {"upd": [...], "del": [...]},
+         "best_bid": ..., "best_ask": ..., "spread": ..., "mid_price": ..., "updates": ...}
+
+        Los niveles de un delta no llevan "acumulado" (cambiaría en casi todos
+        los niveles con cada quote). Nadie lo echa en falta: el "book" completo
+        sí lo trae, pero WidgetLibroOrdenes no lo lee; sus columnas de
+        acumulado salen del notional y la cantidad que el propio widget suma
+        por nivel. Si un delta no trae seq == último seq + 1 el navegador pide
+        resync (uno solo hasta recibir el "book" o agotar su timeout) y
+        recibe de nuevo el "book" completo. Cuando un delta tocaría más de la
+        mitad de los niveles se envía "book" completo.
 
     Protocolo de mensajes (Browser → Server):
         {"action": "subscribe", "symbol": "TSLA"}
+        {"action": "resync", "symbol": "TSLA"}
+
+    Publicación:
+        - Modo pull (quotes reales): el OrderBookManager conectado con
+          ``conectar_fuente`` marca símbolos sucios y ``notificar_cambio``
+          arranca una única tarea por símbolo que construye y transmite como
+          máximo un snapshot por ventana de throttle, más un envío final
+          (trailing) para no perder el último estado.
+        - Modo push (``registrar_snapshot``): snapshots ya construidos (crypto
+          REST, OB sintético) pasan por la misma tarea coalescente.
     """
 
     def __init__(self, simbolos: list[str], host: str = "localhost", port: int = 8766,
-                 on_nuevo_simbolo_cb=None):
+                 max_cola_cliente: int = 64):
         self.simbolos = simbolos
         self.host = host
         self.port = port
-        self._clients: set = set()
-        self._client_symbols: dict = {}
+        # Índice símbolo → navegadores + colas de salida acotadas por conexión.
+        # Si una cola descarta un delta el navegador detecta el hueco de seq
+        # y pide resync.
+        self._difusor = DifusorPorSimbolo(max_cola=max_cola_cliente)
         self._last_snapshot: dict[str, dict] = {}
         self._server = None
         self._throttle_interval = 0.1  # Enviar máximo cada 100ms
         self._last_send_time: dict = defaultdict(float)
-        # Callback opcional: (simbolo: str) → se llama cuando llega un símbolo nuevo
-        self._on_nuevo_simbolo = on_nuevo_simbolo_cb
+        # Modo pull: fuente de snapshots + una tarea coalescente por símbolo
+        self._fuente_book: Optional[OrderBookManager] = None
+        self._snapshots_pendientes: dict[str, dict] = {}
+        self._tareas_publicacion: dict[str, asyncio.Task] = {}
+        # Símbolos cuyo book cambió sin nadie mirando (se arma al suscribirse)
+        self._sin_publicar: set[str] = set()
+        # Protocolo delta: secuencia y niveles publicados por símbolo
+        self._seq: defaultdict[str, int] = defaultdict(int)
+        self._niveles_publicados: dict[str, tuple[dict, dict]] = {}
+        # Interés por símbolo compartido con ChartServer (lo asigna main)
+        self.suscripciones: Optional[GestorSuscripciones] = None
 
     async def iniciar(self) -> None:
         """Inicia el servidor WebSocket para conexiones del navegador."""
@@ -625,9 +1051,8 @@ class OrderBookServer:
 
     async def _handler(self, ws) -> None:
         """Maneja cada conexión de navegador."""
-        self._clients.add(ws)
+        self._difusor.registrar(ws)
         simbolo = self.simbolos[0] if self.simbolos else ""
-        self._client_symbols[ws] = simbolo
         logger.info("Navegador conectado a OrderBook — símbolo '%s'", simbolo)
 
         try:
@@ -636,9 +1061,15 @@ class OrderBookServer:
                 "type": "symbols", "symbols": self.simbolos
             }))
 
-            # Enviar último snapshot si existe
-            if simbolo in self._last_snapshot:
-                await ws.send(json.dumps(self._last_snapshot[simbolo]))
+            # Enviar último snapshot si existe. El book completo se obtiene
+            # antes de registrar el símbolo para que el primer delta que
+            # reciba este navegador sea el siguiente a ese seq; va por la
+            # cola de la conexión para no adelantarse ni atrasarse a los deltas.
+            ultimo = self._snapshot_actual(simbolo)
+            self._difusor.suscribir(ws, simbolo)
+            self._cambiar_interes(None, simbolo)
+            if ultimo is not None:
+                self._difusor.enviar_a(ws, json.dumps(ultimo))
 
             async for message in ws:
                 try:
@@ -648,55 +1079,198 @@ class OrderBookServer:
                 if data.get("action") == "subscribe":
                     new_sym = data.get("symbol", simbolo).upper()
                     # Aceptar cualquier símbolo (no solo los del .env)
-                    self._client_symbols[ws] = new_sym
+                    ultimo = self._snapshot_actual(new_sym)
+                    self._difusor.suscribir(ws, new_sym)
+                    self._cambiar_interes(simbolo, new_sym)
                     simbolo = new_sym
-                    if new_sym in self._last_snapshot:
-                        await ws.send(json.dumps(self._last_snapshot[new_sym]))
+                    if ultimo is not None:
+                        self._difusor.enviar_a(ws, json.dumps(ultimo))
                     else:
                         # Enviar snapshot vacío para limpiar OB del símbolo anterior
-                        await ws.send(json.dumps({
+                        self._difusor.enviar_a(ws, json.dumps({
                             "type": "book", "symbol": new_sym,
                             "simbolo": new_sym,
                             "bids": [], "asks": [],
                             "best_bid": 0, "best_ask": 0,
                             "spread": 0, "mid_price": 0,
                         }))
-                    # ── Suscribir en caliente a Polygon Quotes si es nuevo ──
-                    if self._on_nuevo_simbolo:
-                        await self._on_nuevo_simbolo(new_sym)
                     logger.info("Navegador cambió OrderBook a '%s'", new_sym)
 
+                # ── Resync: el navegador detectó un hueco en la secuencia ──
+                elif data.get("action") == "resync":
+                    ultimo = self._last_snapshot.get(simbolo)
+                    if ultimo is not None:
+                        self._difusor.enviar_a(ws, json.dumps(ultimo))
+                    logger.debug("Resync de OrderBook '%s' (seq=%d)", simbolo, self._seq[simbolo])
+
         except websockets.ConnectionClosed:
             pass
         finally:
-            self._clients.discard(ws)
-            self._client_symbols.pop(ws, None)
+            self._difusor.eliminar(ws)
+            self._cambiar_interes(simbolo, None)
             logger.info("Navegador desconectado de OrderBook")
 
+    def _cambiar_interes(self, anterior: Optional[str], nuevo: Optional[str]) -> None:
+        """Pasa el interés de esta conexión de ``anterior`` a ``nuevo`` en Polygon."""
+        if self.suscripciones is not None:
+            self.suscripciones.cambiar(("quotes",), anterior, nuevo)
+
+    def conectar_fuente(self, order_book: OrderBookManager) -> None:
+        """Conecta el OrderBookManager del que se tiran snapshots (modo pull)."""
+        self._fuente_book = order_book
+
+    def notificar_cambio(self, simbolo: str) -> None:
+        """El book de ``simbolo`` cambió: agenda su publicación coalescida.
+
+        Es O(1) y no construye nada; pensado para llamarse en cada quote.
+        """
+        if simbolo not in self._tareas_publicacion:
+            self._tareas_publicacion[simbolo] = asyncio.get_running_loop().create_task(
+                self._publicar_coalescido(simbolo)
+            )
+
     def registrar_snapshot(self, snapshot: dict) -> None:
-        """Recibe un snapshot del OrderBookManager y lo transmite al navegador.
+        """Recibe un snapshot ya construido y lo transmite al navegador.
 
-        Aplica throttling para no saturar el WebSocket con demasiados updates.
+        Pasa por la misma tarea coalescente que el modo pull, así que se
+        respeta el throttle y el último snapshot nunca se pierde.
         """
         simbolo = snapshot["simbolo"]
-        now = time.time()
+        self._snapshots_pendientes[simbolo] = snapshot
+        self._sin_publicar.discard(simbolo)
+        self.notificar_cambio(simbolo)
+
+    def _tomar_pendiente(self, simbolo: str) -> dict | None:
+        """Snapshot pendiente de publicar: push explícito o pull de la fuente."""
+        snapshot = self._snapshots_pendientes.pop(simbolo, None)
+        if snapshot is None and self._fuente_book is not None:
+            t0 = time.perf_counter_ns()
+            snapshot = self._fuente_book.tomar_snapshot(simbolo)
+            if snapshot is not None:
+                METRICAS.registrar_ns("snapshot", "orderbook", time.perf_counter_ns() - t0, simbolo)
+        return snapshot
+
+    def _hay_pendiente(self, simbolo: str) -> bool:
+        return simbolo in self._snapshots_pendientes or (
+            self._fuente_book is not None and self._fuente_book.esta_sucio(simbolo)
+        )
 
-        # Throttle: máximo un envío cada 100ms por símbolo
-        if now - self._last_send_time[simbolo] < self._throttle_interval:
-            self._last_snapshot[simbolo] = {
-                "type": "book", "symbol": simbolo, **snapshot
-            }
-            return
+    def simbolos_suscritos(self) -> set[str]:
+        """Símbolos con al menos un navegador mirando el OrderBook."""
+        return self._difusor.simbolos_suscritos()
 
-        self._last_send_time[simbolo] = now
+    def obtener_metricas(self) -> dict:
+        """Colas de salida, descartes y navegadores por símbolo."""
+        return {
+            **self._difusor.obtener_metricas(),
+            "clientes_por_simbolo": {
+                s: self._difusor.num_suscriptores(s) for s in self._difusor.simbolos_suscritos()
+            },
+            "publicaciones_en_curso": len(self._tareas_publicacion),
+        }
 
-        msg_data = {"type": "book", "symbol": simbolo, **snapshot}
+    async def _publicar_coalescido(self, simbolo: str) -> None:
+        """Publica como máximo un snapshot por ventana de throttle.
+
+        El primer cambio se envía de inmediato (leading edge); los cambios
+        que llegan durante la ventana solo dejan el símbolo marcado y se
+        envían juntos al cerrarse (trailing flush). Si durante una ventana
+        completa no hubo cambios la tarea termina.
+        """
+        try:
+            while self._hay_pendiente(simbolo):
+                self._last_send_time[simbolo] = time.time()
+                if self._difusor.tiene_suscriptores(simbolo):
+                    snapshot = self._tomar_pendiente(simbolo)
+                    if snapshot is not None:
+                        self._publicar(snapshot)
+                else:
+                    # Nadie mira este símbolo: no construir ni serializar nada.
+                    self._descartar_pendiente(simbolo)
+                await asyncio.sleep(self._throttle_interval)
+        finally:
+            self._tareas_publicacion.pop(simbolo, None)
+
+    def _descartar_pendiente(self, simbolo: str) -> None:
+        """Consume el cambio pendiente sin publicarlo (símbolo sin suscriptores)."""
+        snapshot = self._snapshots_pendientes.pop(simbolo, None)
+        if snapshot is not None:
+            self._publicar(snapshot)
+        elif self._fuente_book is not None and self._fuente_book.esta_sucio(simbolo):
+            self._fuente_book.limpiar_sucio(simbolo)
+            self._sin_publicar.add(simbolo)
+
+    def _snapshot_actual(self, simbolo: str) -> dict | None:
+        """Último mensaje ``book`` del símbolo, construyendo el pendiente si lo hay."""
+        snapshot = self._tomar_pendiente(simbolo)
+        if snapshot is None and simbolo in self._sin_publicar:
+            snapshot = self._fuente_book.obtener_snapshot(simbolo)
+        self._sin_publicar.discard(simbolo)
+        if snapshot is not None:
+            self._publicar(snapshot)
+        return self._last_snapshot.get(simbolo)
+
+    def _publicar(self, snapshot: dict) -> None:
+        """Publica un snapshot con el siguiente seq del símbolo.
+
+        A los navegadores suscritos se les envía solo el delta respecto al
+        último snapshot publicado (o el book completo si el delta no compensa).
+        El book completo queda en ``_last_snapshot`` para nuevos suscriptores
+        y resyncs.
+        """
+        simbolo = snapshot["simbolo"]
+        self._seq[simbolo] += 1
+        seq = self._seq[simbolo]
+        msg_data = {"type": "book", "symbol": simbolo, "seq": seq, **snapshot}
         self._last_snapshot[simbolo] = msg_data
-        msg = json.dumps(msg_data)
 
-        targets = {ws for ws in self._clients if self._client_symbols.get(ws) == simbolo}
-        if targets:
-            websockets.broadcast(targets, msg)
+        previos = self._niveles_publicados.get(simbolo)
+        actuales = (self._indexar_niveles(snapshot["bids"]),
+                    self._indexar_niveles(snapshot["asks"]))
+        self._niveles_publicados[simbolo] = actuales
+
+        if not self._difusor.tiene_suscriptores(simbolo):
+            return
+
+        msg = None
+        if previos is not None:
+            delta_bids = self._diff_niveles(previos[0], actuales[0])
+            delta_asks = self._diff_niveles(previos[1], actuales[1])
+            cambios = (len(delta_bids["upd"]) + len(delta_bids["del"])
+                       + len(delta_asks["upd"]) + len(delta_asks["del"]))
+            if cambios * 2 <= len(actuales[0]) + len(actuales[1]):
+                delta = {"type": "book_delta", "symbol": simbolo, "seq": seq,
+                         "bids": delta_bids, "asks": delta_asks}
+                for clave, valor in snapshot.items():
+                    if clave not in ("bids", "asks"):
+                        delta[clave] = valor
+                t0 = time.perf_counter_ns()
+                msg = json.dumps(delta)
+        if msg is None:
+            t0 = time.perf_counter_ns()
+            msg = json.dumps(msg_data)
+        METRICAS.registrar_ns("serializacion", "orderbook", time.perf_counter_ns() - t0)
+        self._difusor.enviar(simbolo, msg)
+        METRICAS.registrar_difusion("orderbook", CANAL_QUOTES, simbolo)
+
+    @staticmethod
+    def _indexar_niveles(niveles: list[dict]) -> dict[float, tuple]:
+        """precio → (tamano, interpolado, exchanges) para comparar snapshots."""
+        return {
+            n["precio"]: (n["tamano"], n.get("interpolado", False), n.get("exchanges", ()))
+            for n in niveles
+        }
+
+    @staticmethod
+    def _diff_niveles(previos: dict, actuales: dict) -> dict:
+        """Niveles nuevos/cambiados ("upd") y precios que desaparecieron ("del")."""
+        upd = [
+            {"precio": precio, "tamano": nivel[0], "exchanges": nivel[2], "interpolado": nivel[1]}
+            for precio, nivel in actuales.items()
+            if previos.get(precio) != nivel
+        ]
+        borrados = [precio for precio in previos if precio not in actuales]
+        return {"upd": upd, "del": borrados}
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -719,9 +1293,15 @@ class PolygonTradesWS:
         api_key          : str   → Clave de autenticación de Polygon.io
         simbolos         : list  → Lista de tickers (ej. ["AAPL", "TSLA"])
         on_trade_cb      : func  → Callback al recibir un trade normalizado
+                                   (compatibilidad: uno por trade)
         on_vela_cb       : func  → Callback al cerrarse una vela OHLC
+        on_trades_batch_cb: func → Callback con el LoteTrades de cada frame
+        on_reconexion_cb : func  → Callback tras cada reconexión (no la primera
+                                   conexión): pudo haber trades perdidos
         max_reconexiones : int   → Intentos máximos de reconexión (default: 50)
         heartbeat_seg    : int   → Intervalo de heartbeat en segundos (default: 30)
+        feed             : PolygonFeedWS | None → Conexión compartida con el motor
+                                   de quotes (None = socket propio)
     """
 
     def __init__(
@@ -734,6 +1314,10 @@ class PolygonTradesWS:
         heartbeat_seg: int = 30,
         ws_url: str = POLYGON_WS_URL,
         canal: str = CANAL_TRADES,
+        on_trades_batch_cb: Callable[[LoteTrades], None] | None = None,
+        grabador: GrabadorPolygon | None = None,
+        feed: PolygonFeedWS | None = None,
+        on_reconexion_cb: Callable[[], None] | None = None,
     ):
         self.api_key = api_key
         self.simbolos = [s.upper() for s in simbolos]
@@ -742,16 +1326,28 @@ class PolygonTradesWS:
 
         self._on_trade = on_trade_cb
         self._on_vela = on_vela_cb
+        self._on_trades_batch = on_trades_batch_cb
+        self._on_reconexion = on_reconexion_cb
+        self._grabador = grabador
 
         self._ws: Optional[websockets.WebSocketClientProtocol] = None
         self._conectado = False
         self._detener = False
         self._reconexiones = 0
+        self._conexiones = 0  # Sesiones suscritas (propias o del feed compartido)
         self._max_reconexiones = max_reconexiones
         self._heartbeat_seg = heartbeat_seg
 
         # Motor de agregación OHLC
-        self.agregador = AgregadorOHLC(intervalo_seg=60)
+        self.agregador = AgregadorOHLC(intervalo_seg=60, max_velas=CONFIG.HISTORIAL_MAX_VELAS)
+
+        # Frame crudo → TradeNormalizado (msgspec/orjson si están instalados)
+        self._decodificador = DecodificadorPolygon(fabrica_trade=TradeNormalizado)
+
+        # Conexión compartida: sin socket propio, el feed entrega los lotes
+        self._feed = feed
+        if feed is not None:
+            feed.adjuntar(self, "trades")
 
         # Métricas
         self._trades_recibidos = 0
@@ -770,6 +1366,11 @@ class PolygonTradesWS:
         logger.info("  Canal    : %s (Trades)", CANAL_TRADES)
         logger.info("=" * 60)
 
+        if self._feed is not None:
+            logger.info("  Conexión : compartida (%s)", self._feed.ws_url)
+            await self._feed.iniciar()
+            return
+
         while not self._detener:
             try:
                 await self._conectar_y_escuchar()
@@ -803,6 +1404,9 @@ class PolygonTradesWS:
     async def detener(self) -> None:
         """Detiene el motor de forma limpia."""
         logger.info("Deteniendo chart engine...")
+        if self._feed is not None:
+            await self._feed.soltar(self)
+            return
         self._detener = True
         if self._ws:
             await self._ws.close()
@@ -830,6 +1434,7 @@ class PolygonTradesWS:
 
             await self._autenticar()
             await self._suscribir()
+            self._al_conectar()
 
             logger.info("Escuchando flujo de trades en tiempo real...")
             async for mensaje_crudo in ws:
@@ -838,7 +1443,15 @@ class PolygonTradesWS:
                 if self._reconexiones > 0 and (time.time() - self._connect_ts) > 10:
                     logger.info("Conexión estable >10s — reseteando contador de reconexiones")
                     self._reconexiones = 0
-                await self._on_message(mensaje_crudo)
+                if self._grabador is not None:
+                    self._grabador.grabar(FLUJO_TRADES, mensaje_crudo)
+                self._on_message(mensaje_crudo)
+
+    def _al_conectar(self) -> None:
+        """Sesión suscrita; a partir de la segunda avisa de la reconexión."""
+        self._conexiones += 1
+        if self._conexiones > 1 and self._on_reconexion is not None:
+            self._on_reconexion()
 
     async def _autenticar(self) -> None:
         """Envía el mensaje de autenticación a Polygon."""
@@ -861,34 +1474,47 @@ class PolygonTradesWS:
 
     async def _suscribir(self) -> None:
         """Suscribe al canal de Trades para todos los símbolos."""
-        suscripciones = []
-        for s in self.simbolos:
-            if self._canal == CANAL_CRYPTO_TRADES:
-                suscripciones.append(f"{self._canal}.X:{s}")
-            else:
-                suscripciones.append(f"{self._canal}.{s}")
-        params = ",".join(suscripciones)
+        params = ",".join(self._param(s) for s in self.simbolos)
         payload = json.dumps({"action": "subscribe", "params": params})
         await self._ws.send(payload)
         logger.info("Suscrito a: %s", params)
 
+    def _param(self, simbolo: str) -> str:
+        """Canal.símbolo tal como lo espera Polygon (cripto lleva prefijo X:)."""
+        if self._canal == CANAL_CRYPTO_TRADES:
+            return f"{self._canal}.X:{simbolo}"
+        return f"{self._canal}.{simbolo}"
+
     # ──────────────────────────────────────────────────────────────────────────
     #  SUSCRIPCIÓN DINÁMICA
     # ──────────────────────────────────────────────────────────────────────────
 
+    async def aplicar_suscripciones(self, altas: list[str], bajas: list[str]) -> None:
+        """Aplica varias altas y bajas con un mensaje ``subscribe`` y otro ``unsubscribe``.
+
+        ``self.simbolos`` se actualiza antes de enviar: si la conexión se
+        cae a medias, la reconexión suscribe ya el conjunto nuevo.
+        """
+        altas = [s.upper() for s in altas if s.upper() not in self.simbolos]
+        bajas = [s.upper() for s in bajas if s.upper() in self.simbolos]
+        self.simbolos.extend(altas)
+        for simbolo in bajas:
+            self.simbolos.remove(simbolo)
+        if not (self._ws and self._conectado):
+            return
+        for accion, lista in (("subscribe", altas), ("unsubscribe", bajas)):
+            if lista:
+                params = ",".join(self._param(s) for s in lista)
+                await self._ws.send(json.dumps({"action": accion, "params": params}))
+                logger.info("%s dinámico: %s", accion, params)
+
     async def suscribir_simbolo(self, simbolo: str) -> None:
         """Añade un nuevo símbolo a la suscripción en caliente."""
         simbolo = simbolo.upper()
         if simbolo in self.simbolos:
             logger.warning("'%s' ya esta suscrito.", simbolo)
             return
-
-        self.simbolos.append(simbolo)
-        if self._ws and self._conectado:
-            params = f"{CANAL_TRADES}.{simbolo}"
-            payload = json.dumps({"action": "subscribe", "params": params})
-            await self._ws.send(payload)
-            logger.info("Suscripcion dinamica anadida: %s", params)
+        await self.aplicar_suscripciones([simbolo], [])
 
     async def desuscribir_simbolo(self, simbolo: str) -> None:
         """Elimina un símbolo de la suscripción en caliente."""
@@ -896,67 +1522,50 @@ class PolygonTradesWS:
         if simbolo not in self.simbolos:
             logger.warning("'%s' no estaba suscrito.", simbolo)
             return
-
-        self.simbolos.remove(simbolo)
-        if self._ws and self._conectado:
-            params = f"{CANAL_TRADES}.{simbolo}"
-            payload = json.dumps({"action": "unsubscribe", "params": params})
-            await self._ws.send(payload)
-            logger.info("Desuscrito de: %s", params)
+        await self.aplicar_suscripciones([], [simbolo])
 
     # ──────────────────────────────────────────────────────────────────────────
     #  PROCESAMIENTO DE MENSAJES
     # ──────────────────────────────────────────────────────────────────────────
 
-    async def _on_message(self, mensaje_crudo: str) -> None:
-        """Procesa cada mensaje del WebSocket (solo trades)."""
+    def _on_message(self, mensaje_crudo: str | bytes) -> None:
+        """Procesa cada frame del WebSocket (solo trades) como un lote."""
+        recibido_ns = time.perf_counter_ns()
         try:
-            mensajes = json.loads(mensaje_crudo)
-        except json.JSONDecodeError:
+            lotes = self._decodificador.decodificar_lotes(mensaje_crudo)
+        except ErrorDecodificacion:
             logger.error("JSON invalido recibido: %s", mensaje_crudo[:200])
             return
+        METRICAS.registrar_ns("decodificacion", self._canal, time.perf_counter_ns() - recibido_ns)
 
-        if not isinstance(mensajes, list):
-            mensajes = [mensajes]
-
-        for msg in mensajes:
-            tipo_evento = msg.get("ev")
-
-            if tipo_evento in ("T", "XT"):
-                await self._procesar_trade(msg)
-            elif tipo_evento == "status":
-                logger.debug("Status: %s", msg.get("message", ""))
+        if lotes.trades:
+            METRICAS.registrar_frame(self._canal, lotes.trades.simbolos, lotes.trades.timestamp_ms,
+                                     recibido_ns, self._ultimo_mensaje_ts * 1000)
+            self._procesar_lote(lotes.trades)
+        for estado in lotes.estados:
+            logger.debug("Status: %s", estado.get("message", ""))
 
-    async def _procesar_trade(self, raw: dict) -> None:
-        """Normaliza un trade crudo de Polygon y lo despacha.
+    def _procesar_lote(self, lote: LoteTrades) -> None:
+        """Despacha los trades de un frame: agregador, velas y callbacks.
 
-        Mapeo de campos crudos:
-            sym → simbolo, p → precio, s → tamano,
-            t → timestamp_ms, x → exchange_id, c → condiciones
+        ``on_trades_batch`` recibe el lote entero; ``on_trade`` se mantiene
+        por compatibilidad y sigue llamándose una vez por trade.
         """
-        # Normalizar símbolo (quitar prefijo X: de crypto)
-        sym_raw = raw.get("sym", "???")
-        sym_limpio = Mapeador.normalizar(sym_raw)
-
-        trade = TradeNormalizado(
-            simbolo=sym_limpio,
-            precio=raw.get("p", 0.0),
-            tamano=raw.get("s", 0),
-            timestamp_ms=raw.get("t", 0),
-            exchange_id=raw.get("x", 0),
-            condiciones=raw.get("c", []),
-        )
-
-        self._trades_recibidos += 1
-
-        # Alimentar el agregador OHLC
-        vela_cerrada = self.agregador.procesar_trade(trade)
-        if vela_cerrada and self._on_vela:
-            self._on_vela(vela_cerrada)
-
-        # Despachar al callback del usuario
+        self._trades_recibidos += len(lote)
+
+        # Alimentar el agregador OHLC con el frame completo
+        t0 = time.perf_counter_ns()
+        velas_cerradas = self.agregador.procesar_lote(lote)
+        METRICAS.registrar_ns("proceso", self._canal, time.perf_counter_ns() - t0)
+        for vela_cerrada in velas_cerradas:
+            if self._on_vela:
+                self._on_vela(vela_cerrada)
+
+        if self._on_trades_batch:
+            self._on_trades_batch(lote)
         if self._on_trade:
-            self._on_trade(trade)
+            for trade in lote:
+                self._on_trade(trade)
 
     # ──────────────────────────────────────────────────────────────────────────
     #  MÉTRICAS
@@ -982,97 +1591,192 @@ class PolygonTradesWS:
 
 class CryptoRESTPoller:
     """Poller REST para datos crypto de Polygon.
-    
-    Usa el endpoint /v2/aggs para obtener el último precio y genera
-    un orderbook sintético a partir de él. Adapta el spread y los
-    niveles de acuerdo al precio del activo.
+
+    Cada barrido pide todos los pares pendientes en una sola llamada al
+    snapshot multi-ticker de crypto (``/v2/snapshot/locale/global/markets/
+    crypto/tickers?tickers=X:BTCUSD,X:ETHUSD,...``). Si la llamada falla, ese
+    barrido cae a ``/v2/last/trade`` + ``/v2/aggs/.../prev`` por par, en
+    paralelo con un semáforo de ``max_concurrencia``. Solo si el plan no
+    incluye snapshots (401/403/404) se deja de probar durante
+    ``reintento_snapshot_seg``.
+
+    Cadencia:
+        - Los barridos van sobre una rejilla fija de ``intervalo_seg``
+          (loop.time): el tiempo de las peticiones no desplaza el siguiente
+          barrido y, si uno se pasa de la ventana, se salta al siguiente
+          hueco en lugar de encadenar barridos atrasados.
+        - Cada par tiene su propio intervalo: vuelve a ``intervalo_seg`` en
+          cuanto su precio cambia y se duplica (hasta ``intervalo_max_seg``)
+          mientras no cambia. Un barrido solo pide los pares que tocan.
+
+    Con cada precio nuevo genera un trade (alimenta el agregador OHLC y
+    ``on_trade``) y un orderbook sintético cuyo spread y niveles se adaptan
+    al precio del activo.
+
+    Las peticiones van por el cliente REST compartido del proceso
+    (``obtener_cliente()``), que usa ``CONFIG.POLYGON_API_KEY``.
     """
 
+    RUTA_SNAPSHOT = "/v2/snapshot/locale/global/markets/crypto/tickers"
+    # Respuestas que indican que el plan no da acceso al snapshot
+    ESTADOS_SIN_SNAPSHOT = frozenset({401, 403, 404})
+
     def __init__(
         self,
-        api_key: str,
         simbolos: list[str],
         on_trade_cb: Callable[[TradeNormalizado], None] | None = None,
         on_vela_cb: Callable[[dict], None] | None = None,
         on_book_cb: Callable[[dict], None] | None = None,
         intervalo_seg: float = 5.0,
+        intervalo_max_seg: float | None = None,
+        max_concurrencia: int = 8,
+        reintento_snapshot_seg: float = 600.0,
     ):
-        self.api_key = api_key
         self.simbolos = [s.upper() for s in simbolos]
         self._on_trade = on_trade_cb
         self._on_vela = on_vela_cb
         self._on_book = on_book_cb
         self._intervalo = intervalo_seg
+        self._intervalo_max = intervalo_max_seg or intervalo_seg * 6
+        self._semaforo = asyncio.Semaphore(max_concurrencia)
+        self._reintento_snapshot = reintento_snapshot_seg
         self._detener_flag = False
         self._trades_recibidos = 0
         self._reconexiones = 0
         self._conectado = False
         self._ultimo_precio: dict[str, float] = {}
 
-        self.agregador = AgregadorOHLC(intervalo_seg=60)
+        # Intervalo adaptativo y próxima consulta (loop.time) por par
+        self._intervalo_par: dict[str, float] = {}
+        self._proxima_par: dict[str, float] = {}
+        # loop.time a partir del cual se vuelve a probar el snapshot (0 = usarlo)
+        self._snapshot_vetado_hasta = 0.0
+        self._barridos = 0
+        self._barridos_atrasados = 0
+        self._ultimo_barrido_seg = 0.0
+
+        self.agregador = AgregadorOHLC(intervalo_seg=60, max_velas=CONFIG.HISTORIAL_MAX_VELAS)
 
     async def iniciar(self) -> None:
-        """Loop principal de polling REST."""
-        logger.info("[CRYPTO-REST] 🪙 Iniciando polling REST para: %s (cada %.0fs)",
-                    ", ".join(self.simbolos), self._intervalo)
+        """Loop principal de polling REST sobre una rejilla de tiempo fija."""
+        logger.info("[CRYPTO-REST] 🪙 Iniciando polling REST para: %s (cada %.0fs, hasta %.0fs sin cambios)",
+                    ", ".join(self.simbolos), self._intervalo, self._intervalo_max)
         self._conectado = True
 
-        async with aiohttp.ClientSession() as session:
-            while not self._detener_flag:
-                for simbolo in self.simbolos:
-                    try:
-                        await self._poll_precio(session, simbolo)
-                    except Exception as e:
-                        logger.error("[CRYPTO-REST] Error polling %s: %s", simbolo, e)
-                await asyncio.sleep(self._intervalo)
-
-    async def _poll_precio(self, session: aiohttp.ClientSession, simbolo: str) -> None:
-        """Consulta el último precio de un símbolo crypto via REST aggs."""
-        ticker = Mapeador.a_polygon_ticker(simbolo)  # BTCUSD → X:BTCUSD
-
-        # Intentar primero last/trade, fallback a aggs/prev
-        precio = 0.0
-        ts_ms = int(time.time() * 1000)
+        loop = asyncio.get_running_loop()
+        cliente = obtener_cliente()
+        proximo = loop.time()
+        while not self._detener_flag:
+            inicio = loop.time()
+            pendientes = [s for s in self.simbolos if self._proxima_par.get(s, 0.0) <= inicio]
+            if pendientes:
+                try:
+                    await self._barrer(cliente, pendientes, inicio)
+                except Exception as e:
+                    logger.error("[CRYPTO-REST] Error en barrido: %s", e)
+                self._barridos += 1
+            self._ultimo_barrido_seg = loop.time() - inicio
+
+            # Siguiente hueco de la rejilla; si el barrido se comió varios, saltarlos
+            proximo += self._intervalo
+            ahora = loop.time()
+            if ahora > proximo:
+                saltos = int((ahora - proximo) // self._intervalo) + 1
+                proximo += saltos * self._intervalo
+                self._barridos_atrasados += 1
+            await asyncio.sleep(proximo - ahora)
+
+    async def _barrer(self, cliente, simbolos: list[str], ahora: float) -> None:
+        """Consulta ``simbolos`` (snapshot o por par) y aplica los precios."""
+        precios: dict[str, tuple[float, int]] | None = None
+        if ahora >= self._snapshot_vetado_hasta:
+            try:
+                precios = await self._consultar_snapshot(cliente, simbolos)
+                self._snapshot_vetado_hasta = 0.0
+            except ErrorREST as e:
+                if e.estado in self.ESTADOS_SIN_SNAPSHOT:
+                    self._snapshot_vetado_hasta = ahora + self._reintento_snapshot
+                    logger.warning("[CRYPTO-REST] Snapshot multi-ticker no disponible (%s) — "
+                                   "consultando por par durante %.0fs", e, self._reintento_snapshot)
+                else:
+                    # 429/5xx transitorio: solo este barrido va por par
+                    logger.warning("[CRYPTO-REST] Snapshot falló (%s) — consultando por par "
+                                   "en este barrido", e)
+            except Exception as e:
+                logger.debug("[CRYPTO-REST] Snapshot falló (%s) — consultando por par", e)
 
-        # Intento 1: /v2/last/trade (más preciso)
-        try:
-            url = (f"{POLYGON_REST_BASE}/v2/last/trade/{ticker}"
-                   f"?apiKey={self.api_key}")
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=8)) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    result = data.get("results", {})
-                    if result and result.get("p", 0) > 0:
-                        precio = result["p"]
-                        ts_raw = result.get("t", 0)
-                        if ts_raw > 1e15:
-                            ts_ms = int(ts_raw / 1e6)
-                        elif ts_raw > 1e12:
-                            ts_ms = int(ts_raw)
-        except Exception:
-            pass
+        if precios is None:
+            resultados = await asyncio.gather(
+                *(self._consultar_ticker(cliente, s) for s in simbolos), return_exceptions=True
+            )
+            precios = {}
+            for simbolo, r in zip(simbolos, resultados):
+                if isinstance(r, BaseException):
+                    logger.error("[CRYPTO-REST] Error polling %s: %s", simbolo, r)
+                elif r is not None:
+                    precios[simbolo] = r
 
-        # Intento 2: /v2/aggs/ticker/{}/prev (fallback)
-        if precio <= 0:
+        for simbolo in simbolos:
+            dato = precios.get(simbolo)
+            cambio = dato is not None and self._aplicar_precio(simbolo, *dato)
+            self._reprogramar(simbolo, cambio, ahora)
+
+    def _reprogramar(self, simbolo: str, cambio: bool, ahora: float) -> None:
+        """Intervalo base tras un cambio; el doble (con tope) si no cambió."""
+        if cambio:
+            intervalo = self._intervalo
+        else:
+            intervalo = min(self._intervalo_par.get(simbolo, self._intervalo) * 2, self._intervalo_max)
+        self._intervalo_par[simbolo] = intervalo
+        # Margen de medio intervalo base: el par entra en el barrido de la rejilla que toca
+        self._proxima_par[simbolo] = ahora + intervalo - self._intervalo / 2
+
+    async def _consultar_snapshot(self, cliente, simbolos: list[str]) -> dict[str, tuple[float, int]]:
+        """Un GET para todos los pares: símbolo → (precio, ts_ms)."""
+        por_ticker = {Mapeador.a_polygon_ticker(s): s for s in simbolos}
+        data = await cliente.get_json(self.RUTA_SNAPSHOT, {"tickers": ",".join(por_ticker)},
+                                      timeout_seg=8)
+        precios = {}
+        for t in data.get("tickers") or []:
+            simbolo = por_ticker.get(t.get("ticker", ""))
+            if simbolo is None:
+                continue
+            ultimo = t.get("lastTrade") or {}
+            precio = ultimo.get("p") or (t.get("min") or {}).get("c") or (t.get("day") or {}).get("c") \
+                or (t.get("prevDay") or {}).get("c") or 0.0
+            if precio > 0:
+                precios[simbolo] = (precio, _a_ms(ultimo.get("t") or t.get("updated") or 0))
+        return precios
+
+    async def _consultar_ticker(self, cliente, simbolo: str) -> tuple[float, int] | None:
+        """Respaldo por par: /v2/last/trade y, si no hay precio, /v2/aggs/.../prev."""
+        ticker = Mapeador.a_polygon_ticker(simbolo)  # BTCUSD → X:BTCUSD
+        async with self._semaforo:
+            # Intento 1: /v2/last/trade (más preciso)
             try:
-                url = (f"{POLYGON_REST_BASE}/v2/aggs/ticker/{ticker}/prev"
-                       f"?adjusted=true&apiKey={self.api_key}")
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=8)) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        results = data.get("results", [])
-                        if results:
-                            precio = results[0].get("c", 0.0)  # close
+                data = await cliente.get_json(f"/v2/last/trade/{ticker}", timeout_seg=8)
+                result = data.get("results", {})
+                if result and result.get("p", 0) > 0:
+                    return result["p"], _a_ms(result.get("t", 0))
             except Exception:
                 pass
 
-        if precio <= 0:
-            return
+            # Intento 2: /v2/aggs/ticker/{}/prev (fallback)
+            try:
+                data = await cliente.get_json(
+                    f"/v2/aggs/ticker/{ticker}/prev", {"adjusted": "true"}, timeout_seg=8
+                )
+                results = data.get("results", [])
+                if results and results[0].get("c", 0.0) > 0:
+                    return results[0]["c"], int(time.time() * 1000)
+            except Exception:
+                pass
+        return None
 
-        # Verificar si el precio cambió
-        prev = self._ultimo_precio.get(simbolo, 0)
-        if prev == precio:
-            return
+    def _aplicar_precio(self, simbolo: str, precio: float, ts_ms: int) -> bool:
+        """Emite trade, vela y book si el precio cambió; devuelve si cambió."""
+        if self._ultimo_precio.get(simbolo, 0) == precio:
+            return False
         self._ultimo_precio[simbolo] = precio
 
         # Crear trade normalizado
@@ -1082,7 +1786,6 @@ class CryptoRESTPoller:
             tamano=1,
             timestamp_ms=ts_ms,
             exchange_id=1,
-            condiciones=[],
         )
         self._trades_recibidos += 1
 
@@ -1096,6 +1799,7 @@ class CryptoRESTPoller:
         # ── Generar orderbook sintético ──
         if self._on_book:
             self._generar_book_sintetico(simbolo, precio, ts_ms)
+        return True
 
     def _generar_book_sintetico(self, simbolo: str, precio: float, ts_ms: int) -> None:
         """Genera un orderbook sintético con niveles realistas alrededor del precio."""
@@ -1163,14 +1867,29 @@ class CryptoRESTPoller:
             "trades_recibidos": self._trades_recibidos,
             "reconexiones": self._reconexiones,
             "conectado": self._conectado,
+            "barridos": self._barridos,
+            "barridos_atrasados": self._barridos_atrasados,
+            "ultimo_barrido_seg": round(self._ultimo_barrido_seg, 3),
+            "modo": "snapshot" if self._snapshot_vetado_hasta == 0.0 else "por_par",
         }
 
 
+def _a_ms(ts: int | float) -> int:
+    """Timestamp de Polygon (ns, µs o ms) → ms; 0 o ausente → ahora."""
+    if ts > 1e17:
+        return int(ts / 1e6)
+    if ts > 1e14:
+        return int(ts / 1e3)
+    if ts > 1e11:
+        return int(ts)
+    return int(time.time() * 1000)
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 #  ORDER BOOK SINTÉTICO PARA STOCKS (fuera de horario)
 # ══════════════════════════════════════════════════════════════════════════════
 
-async def _obtener_precio_rest_para_sintetico(simbolo: str, api_key: str) -> float:
+async def _obtener_precio_rest_para_sintetico(simbolo: str) -> float:
     """Consulta el cierre del día anterior (o último disponible) vía REST de Polygon.
 
     Usado por el OB sintético para obtener un precio de referencia cuando el
@@ -1178,25 +1897,19 @@ async def _obtener_precio_rest_para_sintetico(simbolo: str, api_key: str) -> flo
     Retorna 0.0 si falla o si el símbolo no es un stock válido.
     """
     try:
-        import aiohttp
         ticker = Mapeador.a_polygon_ticker(simbolo)
-        url = (
-            f"https://api.polygon.io/v2/aggs/ticker/{ticker}/prev"
-            f"?adjusted=true&apiKey={api_key}"
+        data = await obtener_cliente().get_json(
+            f"/v2/aggs/ticker/{ticker}/prev", {"adjusted": "true"}, timeout_seg=8
         )
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=8)) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    results = data.get("results", [])
-                    if results:
-                        precio = results[0].get("c", 0.0)
-                        if precio > 0:
-                            logger.info(
-                                "[OB SYNTH] 💰 Precio REST para %s: $%.2f (cierre anterior)",
-                                simbolo, precio
-                            )
-                            return precio
+        results = data.get("results", [])
+        if results:
+            precio = results[0].get("c", 0.0)
+            if precio > 0:
+                logger.info(
+                    "[OB SYNTH] 💰 Precio REST para %s: $%.2f (cierre anterior)",
+                    simbolo, precio
+                )
+                return precio
     except Exception as e:
         logger.debug("[OB SYNTH] No pudo obtener precio REST para %s: %s", simbolo, e)
     return 0.0
@@ -1270,19 +1983,6 @@ def _generar_book_sintetico_stock(simbolo: str, precio: float, counter: int = 0)
 #  CARGA DE HISTORIAL — REST API Polygon
 # ══════════════════════════════════════════════════════════════════════════════
 
-def _en_horario_mercado(ts_seg: int) -> bool:
-    """Retorna True si el timestamp está en extended market hours (4AM-8PM ET, Lun-Vie).
-
-    Cubre pre-market (4:00 AM), regular (9:30 AM-4:00 PM), y after-hours (hasta 8:00 PM).
-    Filtra noches y fines de semana para que la timeline sea continua.
-    """
-    dt = datetime.fromtimestamp(ts_seg, tz=ET)
-    # Lunes=0 ... Viernes=4, Sábado=5, Domingo=6
-    if dt.weekday() >= 5:
-        return False
-    return 4 <= dt.hour < 20  # 4:00 AM - 8:00 PM ET
-
-
 def _calcular_dias_historico(tf_sec: int) -> int:
     """Calcula cuántos días de datos necesitamos para obtener ~500 velas.
     
@@ -1304,18 +2004,56 @@ def _calcular_dias_historico(tf_sec: int) -> int:
     return max(3, min(60, dias_calendario))
 
 
+def _parametros_aggs(tf_sec: int) -> tuple[int, str]:
+    """(multiplier, timespan) de Polygon /v2/aggs para un timeframe en segundos."""
+    if tf_sec < 60:
+        return tf_sec, "second"
+    if tf_sec < 3600:
+        return tf_sec // 60, "minute"
+    return tf_sec // 3600, "hour"
+
+
+async def _descargar_aggs(polygon_ticker: str, multiplier: int, timespan: str,
+                          desde: str, hasta: str) -> list[dict]:
+    """Descarga barras de /v2/aggs siguiendo ``next_url`` hasta el final.
+
+    ``desde``/``hasta`` aceptan fecha ISO o epoch en ms (formato de Polygon).
+    Lanza excepción ante errores HTTP para que el cache no guarde días
+    incompletos como vacíos.
+    """
+    cliente = obtener_cliente()
+    data = await cliente.get_json(
+        f"/v2/aggs/ticker/{polygon_ticker}/range/{multiplier}/{timespan}/{desde}/{hasta}",
+        {"adjusted": "true", "sort": "asc", "limit": 50000},
+        timeout_seg=30,
+    )
+    resultados: list[dict] = list(data.get("results") or [])
+    while data.get("next_url"):
+        data = await cliente.get_json(data["next_url"], timeout_seg=30)
+        resultados.extend(data.get("results") or [])
+    return resultados
+
+
+def _barras_a_velas(barras: np.ndarray) -> list[dict]:
+    """Array de CacheBarras → velas {time, open, high, low, close, volume}."""
+    return [
+        {"time": t, "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for t, o, h, l, c, v in barras.tolist()
+    ]
+
+
 async def cargar_historico_rest(api_key: str, simbolos: list[str], chart_server) -> None:
     """Carga 500 velas de 1-minuto vía REST API de Polygon y pre-popula el price buffer.
 
     Para el timeframe por defecto (1m), carga suficientes datos para tener
-    ~500 velas disponibles al hacer scroll hacia atrás.
+    ~500 velas disponibles al hacer scroll hacia atrás. Las barras pasan por
+    el cache en disco del ChartServer: tras un reinicio solo se pide a REST
+    la parte del día en curso que falte.
     
     Cuando el usuario cambia de timeframe, el ChartServer recargará
     automáticamente vía _cargar_y_enviar_historico().
     """
-    try:
-        import aiohttp
-    except ImportError:
+    if aiohttp is None:
         logger.warning(
             "[HISTORICO] aiohttp no instalado — ejecuta: pip install aiohttp\n"
             "             Continuando sin datos historicos."
@@ -1327,71 +2065,54 @@ async def cargar_historico_rest(api_key: str, simbolos: list[str], chart_server)
     dias = _calcular_dias_historico(tf_inicial)
     hoy = datetime.now(ET).date()
     desde = hoy - timedelta(days=dias)
-    url_base = "https://api.polygon.io/v2/aggs/ticker"
 
     logger.info("[HISTORICO] ═══ Cargando historial inicial de Polygon.io ═══")
     logger.info("[HISTORICO] Plan: Massive | Fuente: REST API v2/aggs")
     logger.info("[HISTORICO] Rango: %s → %s (%d días)", desde, hoy, dias)
 
-    async with aiohttp.ClientSession() as session:
-        for simbolo in simbolos:
-            # Usar ticker de Polygon (con X: para crypto)
-            polygon_ticker = Mapeador.a_polygon_ticker(simbolo)
-            url = (
-                f"{url_base}/{polygon_ticker}/range/1/minute/"
-                f"{desde.isoformat()}/{hoy.isoformat()}"
-                f"?adjusted=true&sort=asc&limit=50000&apiKey={api_key}"
-            )
-            try:
-                logger.info("[HISTORICO] 📊 Solicitando velas 1-min para %s ...", simbolo)
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                    if resp.status != 200:
-                        logger.error(
-                            "[HISTORICO] ❌ Error HTTP %d para %s", resp.status, simbolo
-                        )
-                        continue
-                    data = await resp.json()
+    for simbolo in simbolos:
+        try:
+            logger.info("[HISTORICO] 📊 Solicitando velas 1-min para %s ...", simbolo)
+            barras = await chart_server.obtener_barras(simbolo, 1, "minute", desde, hoy)
+            if not len(barras):
+                logger.warning("[HISTORICO] ⚠️ Sin datos para %s", simbolo)
+                continue
 
-                results = data.get("results", [])
-                if not results:
-                    logger.warning("[HISTORICO] ⚠️ Sin datos para %s", simbolo)
+            # Stocks: filtrar barras fuera de market hours (una pasada vectorial)
+            if not Mapeador.es_crypto(simbolo):
+                barras = barras[CALENDARIO.mascara_horario(barras["t"])]
+                if not len(barras):
+                    logger.warning("[HISTORICO] ⚠️ Sin barras en horario de mercado para %s", simbolo)
                     continue
 
-                # Pre-popular el price buffer del ChartServer con el close de cada vela
-                count = 0
-                es_crypto = Mapeador.es_crypto(simbolo)
-                for bar in results:
-                    ts_ms = bar.get("t", 0)    # timestamp en ms
-                    close = bar.get("c", 0.0)  # close price
-                    if ts_ms and close:
-                        ts_seg = ts_ms // 1000
-                        # Stocks: filtrar barras fuera de market hours
-                        if not es_crypto and not _en_horario_mercado(ts_seg):
-                            continue
-                        chart_server._price_buffer[simbolo][ts_seg] = close
-                        count += 1
-
-                # ── Verificación de datos reales ──
-                primer_precio = results[0].get("c", 0.0)
-                ultimo_precio = results[-1].get("c", 0.0)
-                primer_ts = datetime.fromtimestamp(results[0].get("t", 0) / 1000, tz=ET)
-                ultimo_ts = datetime.fromtimestamp(results[-1].get("t", 0) / 1000, tz=ET)
-                
-                logger.info(
-                    "[HISTORICO] ✅ %s: %d velas REALES cargadas de Polygon.io",
-                    simbolo, count,
-                )
-                logger.info(
-                    "[HISTORICO]    Primer vela: %s → $%.2f",
-                    primer_ts.strftime("%Y-%m-%d %H:%M"), primer_precio,
-                )
-                logger.info(
-                    "[HISTORICO]    Última vela: %s → $%.2f",
-                    ultimo_ts.strftime("%Y-%m-%d %H:%M"), ultimo_precio,
-                )
+            # Pre-popular el price buffer del ChartServer con el close de cada vela
+            chart_server._price_buffer[simbolo].extender(barras["t"], barras["c"])
+            count = len(barras)
 
-            except Exception as e:
-                logger.error("[HISTORICO] ❌ Error cargando %s: %s", simbolo, e)
+            # Sembrar el timeframe de 1m: el primer init_ohlc sale de memoria
+            chart_server.agregador_tf.sembrar(simbolo, tf_inicial, barras[-500:])
+
+            # ── Verificación de datos reales ──
+            primer_precio = float(barras["c"][0])
+            ultimo_precio = float(barras["c"][-1])
+            primer_ts = datetime.fromtimestamp(int(barras["t"][0]), tz=ET)
+            ultimo_ts = datetime.fromtimestamp(int(barras["t"][-1]), tz=ET)
+            
+            logger.info(
+                "[HISTORICO] ✅ %s: %d velas REALES cargadas de Polygon.io",
+                simbolo, count,
+            )
+            logger.info(
+                "[HISTORICO]    Primer vela: %s → $%.2f",
+                primer_ts.strftime("%Y-%m-%d %H:%M"), primer_precio,
+            )
+            logger.info(
+                "[HISTORICO]    Última vela: %s → $%.2f",
+                ultimo_ts.strftime("%Y-%m-%d %H:%M"), ultimo_precio,
+            )
+
+        except Exception as e:
+            logger.error("[HISTORICO] ❌ Error cargando %s: %s", simbolo, e)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -1415,6 +2136,7 @@ def main():
     SIMBOLOS_CRYPTO = CONFIG.SIMBOLOS_CRYPTO
     CHART_PORT = CONFIG.CHART_PORT
     ORDERBOOK_PORT = CONFIG.ORDERBOOK_PORT
+    WS_URL = CONFIG.POLYGON_WS_URL
 
     # ── Detectar sesión de mercado ──
     session = MarketSession.current()
@@ -1430,9 +2152,20 @@ def main():
     print(f"  Trades:      ws://localhost:{CHART_PORT}")
     print(f"  Order Book:  ws://localhost:{ORDERBOOK_PORT}")
     print(f"  Sesion:      {session_label}")
+    if WS_URL != POLYGON_WS_URL:
+        print(f"  Feed WS:     {WS_URL}")
+    if SIMBOLOS_STOCKS:
+        print(f"  Conexion:    {'trades + quotes en un socket' if CONFIG.FEED_MULTIPLEXADO else 'un socket por motor'}")
+    if CONFIG.GRABAR_FEED:
+        print(f"  Grabando:    {CONFIG.GRABAR_FEED}")
+    if CONFIG.METRICS_PORT:
+        print(f"  Metricas:    http://{CONFIG.METRICS_HOST}:{CONFIG.METRICS_PORT}/metrics")
     print(f"  Hora ET:     {now_et}")
     if es_finde:
         print(f"  ⚠️  FIN DE SEMANA — Mercado cerrado hasta Lunes")
+    festivo = CALENDARIO.festivo(datetime.now(ET).date())
+    if festivo:
+        print(f"  ⚠️  FESTIVO ({festivo}) — Mercado cerrado")
     print("  Presiona CTRL+C para detener")
     print("=" * 70 + "\n")
 
@@ -1444,10 +2177,10 @@ def main():
     last_stats_time = [time.time()]
 
     # ── Chart Server ──
-    chart_server = ChartServer(simbolos=SIMBOLOS, port=CHART_PORT)
+    chart_server = ChartServer(simbolos=SIMBOLOS, port=CHART_PORT,
+                               intervalo_lote_seg=CONFIG.CHART_LOTE_MS / 1000)
 
-    # ── OrderBook Server (con callback para suscripción dinámica a motor_quotes) ──
-    # NOTA: motor_quotes se crea después, se parchea el callback tras crearlo
+    # ── OrderBook Server (las suscripciones las lleva GestorSuscripciones) ──
     ob_server = OrderBookServer(simbolos=SIMBOLOS, port=ORDERBOOK_PORT)
 
     # ── Callback: Se ejecuta por cada trade recibido ──
@@ -1456,7 +2189,23 @@ def main():
         trade_count_window[0] += 1
         lat = trade.latencia_ms
         print(f"  [{trade.simbolo}] ${trade.precio:.2f} | Latencia: {lat:>8.1f}ms")
-        chart_server.registrar_tick(trade.simbolo, trade.precio, trade.timestamp_ms)
+        chart_server.registrar_tick(trade.simbolo, trade.precio, trade.timestamp_ms, trade.tamano)
+
+    # ── Callback: Se ejecuta una vez por frame de trades (WebSocket) ──
+    def al_recibir_lote_trades(lote: LoteTrades) -> None:
+        trade_count_window[0] += len(lote)
+        simbolos, precios = lote.simbolos, lote.precio
+        tiempos, tamanos = lote.timestamp_ms, lote.tamano
+        for i in range(len(lote)):
+            chart_server.registrar_tick(simbolos[i], precios[i], tiempos[i], tamanos[i])
+        # Último precio del frame por símbolo; el detalle solo en DEBUG (un
+        # print por frame bloquea el loop con muchos símbolos suscritos)
+        detalle = logger.isEnabledFor(logging.DEBUG)
+        ahora_ms = time.time() * 1000
+        for simbolo, i in lote.ultimo_por_simbolo().items():
+            ultimo_precio[simbolo] = precios[i]
+            if detalle:
+                logger.debug("[%s] $%.2f | Latencia: %8.1fms", simbolo, precios[i], ahora_ms - tiempos[i])
 
     # ── Callback: Se ejecuta al cerrarse una vela OHLC ──
     def al_cerrar_vela(vela: dict) -> None:
@@ -1466,62 +2215,136 @@ def main():
             vela["low"], vela["close"], vela["volume"]
         )
 
-    # ── Callback: Se ejecuta cuando el Order Book L2 cambia ──
+    # ── Callback: snapshots ya construidos (crypto REST, OB sintético) ──
     def al_actualizar_book(snapshot: dict) -> None:
         ob_server.registrar_snapshot(snapshot)
 
+    # ── Captura opcional de frames crudos (ver grabador_polygon.py) ──
+    grabador = GrabadorPolygon(CONFIG.GRABAR_FEED) if CONFIG.GRABAR_FEED else None
+
+    # ── Conexión única a Polygon para trades + quotes de stocks ──
+    # FEED_MULTIPLEXADO=0 vuelve a un socket por motor.
+    feed = PolygonFeedWS(
+        api_key=API_KEY, ws_url=WS_URL,
+        max_reconexiones=50, heartbeat_seg=30, grabador=grabador,
+    ) if SIMBOLOS_STOCKS and CONFIG.FEED_MULTIPLEXADO else None
+
     # ── Motor de Trades (Stocks) ──
     motor_trades = PolygonTradesWS(
         api_key=API_KEY, simbolos=SIMBOLOS_STOCKS,
-        on_trade_cb=al_recibir_trade, on_vela_cb=al_cerrar_vela,
+        on_trades_batch_cb=al_recibir_lote_trades, on_vela_cb=al_cerrar_vela,
         max_reconexiones=50, heartbeat_seg=30,
-        ws_url=POLYGON_WS_URL, canal=CANAL_TRADES,
+        ws_url=WS_URL, canal=CANAL_TRADES, grabador=grabador, feed=feed,
+        on_reconexion_cb=chart_server.caducar_historial,
     ) if SIMBOLOS_STOCKS else None
 
     # ── Motor de Trades (Crypto) → REST Polling (WS no disponible en este plan) ──
     motor_crypto = CryptoRESTPoller(
-        api_key=API_KEY, simbolos=SIMBOLOS_CRYPTO,
+        simbolos=SIMBOLOS_CRYPTO,
         on_trade_cb=al_recibir_trade, on_vela_cb=al_cerrar_vela,
         on_book_cb=al_actualizar_book,
         intervalo_seg=5.0,
     ) if SIMBOLOS_CRYPTO else None
 
     # ── Motor de Quotes — Order Book (Stocks) ──
+    # Modo pull: el motor solo avisa qué símbolo cambió y el OrderBookServer
+    # construye el snapshot cuando le toca publicar (máx. 1 por ventana).
     motor_quotes = PolygonQuotesWS(
         api_key=API_KEY, simbolos=SIMBOLOS_STOCKS,
-        on_book_cb=al_actualizar_book,
+        on_book_cambio_cb=ob_server.notificar_cambio,
         max_reconexiones=50, heartbeat_seg=30,
+        ws_url=WS_URL, grabador=grabador, feed=feed,
     ) if SIMBOLOS_STOCKS else None
-
-    # ── Conectar callbacks de suscripción dinámica ──
-    async def _suscribir_simbolo_dinamico(simbolo: str) -> None:
-        """Suscribe en caliente cuando el browser pide un símbolo no listado al OrderBook."""
-        if not motor_quotes:
-            return
-        from mapeador_simbolos import Mapeador
-        if Mapeador.es_crypto(simbolo):
-            return   # crypto no tiene quotes L2 en Polygon
-        await motor_quotes.suscribir_simbolo(simbolo)
-        logger.info("[OB] 🔔 Suscripción dinámica a Polygon Quotes: %s", simbolo)
-
-    async def _suscribir_simbolo_dinamico_trades(simbolo: str) -> None:
-        """Suscribe en caliente al motor de trades cuando el browser pide un símbolo nuevo."""
-        from mapeador_simbolos import Mapeador
-        if Mapeador.es_crypto(simbolo):
-            return   # crypto usa REST poller — no el WS de trades
-        if motor_trades:
-            await motor_trades.suscribir_simbolo(simbolo)
-            logger.info("[TRADES] 🔔 Suscripción dinámica a Polygon Trades: %s", simbolo)
-        # También suscribir al OB (quotes) para sincronización de precio
-        if motor_quotes:
-            await motor_quotes.suscribir_simbolo(simbolo)
-
-    ob_server._on_nuevo_simbolo = _suscribir_simbolo_dinamico
-    chart_server._on_nuevo_simbolo = _suscribir_simbolo_dinamico_trades
+    if motor_quotes:
+        ob_server.conectar_fuente(motor_quotes.order_book)
+
+    # ── Suscripciones guiadas por los navegadores ──
+    # Un símbolo abierto en cualquier navegador se suscribe en Polygon; cuando
+    # nadie lo mira durante SUSCRIPCION_GRACIA_SEG se desuscribe. Los del .env
+    # quedan fijos. Crypto no pasa por aquí (REST poller, sin quotes L2).
+    suscripciones = GestorSuscripciones(gracia_seg=CONFIG.SUSCRIPCION_GRACIA_SEG)
+    for canal, motor in (("trades", motor_trades), ("quotes", motor_quotes)):
+        if motor:
+            suscripciones.registrar_canal(
+                canal, motor, fijos=SIMBOLOS_STOCKS,
+                acepta=lambda s: not Mapeador.es_crypto(s),
+                # Sin trades vivos las velas sembradas se congelarían
+                al_retirar=chart_server.olvidar_simbolos if canal == "trades" else None,
+            )
+    chart_server.suscripciones = suscripciones
+    ob_server.suscripciones = suscripciones
 
     # No hay motor de quotes crypto (REST no soporta orderbook L2 en tiempo real)
     motor_quotes_crypto = None
 
+    # ── Endpoint Prometheus: lee el estado de motores y servidores en cada scrape ──
+    def colector_motores(e) -> None:
+        for nombre, motor in (("trades", motor_trades), ("crypto", motor_crypto),
+                              ("quotes", motor_quotes)):
+            if motor is None:
+                continue
+            m = motor.obtener_metricas()
+            recibidos = m.get("trades_recibidos", m.get("quotes_recibidos", 0))
+            e.contador("mensajes_total", recibidos, "Trades/quotes procesados por motor", motor=nombre)
+            e.contador("reconexiones_total", m["reconexiones"], "Reconexiones del motor", motor=nombre)
+            e.gauge("conectado", m["conectado"], "1 si el motor está conectado", motor=nombre)
+            if m.get("ultimo_mensaje_hace_seg") is not None:
+                e.gauge("ultimo_mensaje_edad_segundos", m["ultimo_mensaje_hace_seg"],
+                        "Segundos desde el último frame recibido", motor=nombre)
+
+    def colector_servidores(e) -> None:
+        for nombre, servidor in (("chart", chart_server), ("orderbook", ob_server)):
+            m = servidor.obtener_metricas()
+            e.gauge("clientes", m["clientes"], "Navegadores conectados", servidor=nombre)
+            e.gauge("cola_profundidad_max", m["profundidad_max"],
+                    "Mensajes en la cola de salida más llena", servidor=nombre)
+            e.gauge("cola_profundidad_total", m["profundidad_total"],
+                    "Mensajes pendientes en todas las colas de salida", servidor=nombre)
+            e.contador("mensajes_descartados_total", m["descartados"],
+                       "Mensajes descartados por cola llena", servidor=nombre)
+            for simbolo, n in sorted(m["clientes_por_simbolo"].items()):
+                e.gauge("clientes_simbolo", n, "Navegadores suscritos por símbolo",
+                        servidor=nombre, simbolo=simbolo)
+        for clave, valor in chart_server.obtener_metricas()["cache_barras"].items():
+            if clave == "entradas_memoria":
+                e.gauge("cache_barras_entradas", valor, "Series/día en el LRU de barras")
+            elif clave == "series_hoy":
+                e.gauge("cache_barras_series_hoy", valor, "Series del día en curso en memoria")
+            elif clave == "barras_descargadas":
+                e.contador("cache_barras_descargadas_total", valor, "Barras bajadas por REST")
+            else:
+                e.contador("cache_barras_total", valor, "Resultado de las lecturas del cache de barras",
+                           resultado=clave)
+        for clave, valor in obtener_cliente().obtener_metricas().items():
+            e.contador("rest_total", valor, "Peticiones REST a Polygon", tipo=clave)
+        m = suscripciones.obtener_metricas()
+        for canal, c in m["canales"].items():
+            e.gauge("suscripciones", c["suscritos"], "Símbolos suscritos en Polygon por canal", canal=canal)
+            e.gauge("suscripciones_en_gracia", c["en_gracia"],
+                    "Símbolos sin navegadores esperando desuscripción", canal=canal)
+        e.contador("suscripciones_mensajes_total", m["mensajes_enviados"],
+                   "Mensajes subscribe/unsubscribe enviados a Polygon")
+
+    # ── Lag del event loop + callbacks lentos (SIGUSR1 → perfil de 10s en perfiles/) ──
+    monitor_loop = MonitorLoop(umbral_lento_seg=CONFIG.LOOP_LENTO_MS / 1000)
+
+    def colector_loop(e) -> None:
+        m = monitor_loop.obtener_metricas()
+        e.contador("loop_callbacks_lentos_total", m["callbacks_lentos"],
+                   f"Callbacks del event loop que tardaron más de {CONFIG.LOOP_LENTO_MS:g} ms")
+        e.gauge("loop_lag_max_segundos", m["lag_max_ms"] / 1000, "Mayor lag del event loop observado")
+
+    async def ruta_perfil(params: dict) -> str:
+        return await monitor_loop.perfilar(min(float(params.get("seg", 10)), 120))
+
+    exportador = None
+    if CONFIG.METRICS_PORT:
+        exportador = ExportadorPrometheus(CONFIG.METRICS_HOST, CONFIG.METRICS_PORT)
+        exportador.agregar_colector(colector_motores)
+        exportador.agregar_colector(colector_servidores)
+        exportador.agregar_colector(colector_loop)
+        exportador.agregar_ruta("/perfil", ruta_perfil)
+
     # ── Manejo limpio de CTRL+C ──
     loop = asyncio.new_event_loop()
 
@@ -1561,6 +2384,12 @@ def main():
                 total_trades, mc.get("trades_recibidos", 0), total_quotes, tps,
                 MarketSession.LABELS[cur_session],
             )
+            for linea in METRICAS.resumen_log():
+                logger.info("[LATENCIA] %s", linea)
+            peores = monitor_loop.obtener_metricas(peores=3)["peores"]
+            if peores:
+                logger.info("[LOOP] Callbacks lentos (total %d): %s", monitor_loop.callbacks_lentos,
+                            " | ".join(f"{p['callback']} ×{p['veces']}" for p in peores))
             if cur_session != prev_session:
                 logger.info("[SESION] Cambio: %s", MarketSession.LABELS[cur_session])
                 prev_session = cur_session
@@ -1582,7 +2411,7 @@ def main():
 
             # Unir símbolos del .env con los suscritos dinámicamente por clientes
             simbolos_clientes = {
-                sym for sym in ob_server._client_symbols.values()
+                sym for sym in ob_server.simbolos_suscritos()
                 if sym and sym.upper() not in CRYPTO_SYMBOLS
             }
             simbolos_a_generar = set(SIMBOLOS_STOCKS) | simbolos_clientes
@@ -1598,14 +2427,14 @@ def main():
                 precio = ultimo_precio.get(simbolo, 0)
                 if precio <= 0:
                     # 2º: último tick del price_buffer
-                    buf = chart_server._price_buffer.get(simbolo, {})
-                    if buf:
-                        max_ts = max(buf.keys())
-                        precio = buf[max_ts]
+                    buf = chart_server._price_buffer.get(simbolo)
+                    ultimo = buf.ultimo() if buf is not None else None
+                    if ultimo:
+                        precio = ultimo[1]
                         ultimo_precio[simbolo] = precio
                 if precio <= 0:
                     # 3º: consultar Polygon REST (cierre anterior)
-                    precio = await _obtener_precio_rest_para_sintetico(simbolo, API_KEY)
+                    precio = await _obtener_precio_rest_para_sintetico(simbolo)
                     if precio > 0:
                         ultimo_precio[simbolo] = precio
                 if precio <= 0:
@@ -1619,17 +2448,20 @@ def main():
 
     # ── Ejecutar todo ──
     async def ejecutar():
+        monitor_loop.iniciar()
         await chart_server.iniciar()
         await ob_server.iniciar()
+        if exportador:
+            await exportador.iniciar()
         # Cargar historial de velas antes de conectar WebSocket en tiempo real
         await cargar_historico_rest(API_KEY, SIMBOLOS, chart_server)
         # Poblar ultimo_precio con el último close del historial para OB sintético
         for simbolo in SIMBOLOS:
-            buf = chart_server._price_buffer.get(simbolo, {})
-            if buf:
-                max_ts = max(buf.keys())
-                ultimo_precio[simbolo] = buf[max_ts]
-                logger.info("[HISTORICO] 💰 %s: último precio conocido = $%.2f", simbolo, buf[max_ts])
+            buf = chart_server._price_buffer.get(simbolo)
+            ultimo = buf.ultimo() if buf is not None else None
+            if ultimo:
+                ultimo_precio[simbolo] = ultimo[1]
+                logger.info("[HISTORICO] 💰 %s: último precio conocido = $%.2f", simbolo, ultimo[1])
         logger.info("[POLYGON] Conectando a Polygon.io en tiempo real...")
         if SIMBOLOS_CRYPTO:
             logger.info("[POLYGON] 🪙 Crypto activos via REST polling: %s (cada 5s, 24/7)", ", ".join(SIMBOLOS_CRYPTO))
@@ -1652,7 +2484,12 @@ def main():
         if motor_quotes_crypto: loop.run_until_complete(motor_quotes_crypto.detener())
         loop.run_until_complete(chart_server.detener())
         loop.run_until_complete(ob_server.detener())
+        if exportador: loop.run_until_complete(exportador.detener())
     finally:
+        monitor_loop.detener()
+        loop.run_until_complete(cerrar_cliente())
+        if grabador:
+            grabador.cerrar()
         loop.close()
 
     # ── Métricas finales ──
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║         CLIENTE REST POLYGON — Sesión HTTP compartida por el proceso        ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  LimitadorTasa       : Token bucket (peticiones/seg + ráfaga).             ║
+║  ClientePolygonREST  : aiohttp con keep-alive, límite de conexiones por    ║
+║                        host, rate limit y reintentos con backoff+jitter.   ║
+║  obtener_cliente()   : Instancia única del proceso (cerrar_cliente() al    ║
+║                        apagar).                                            ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Todas las llamadas REST reutilizan las mismas conexiones TCP+TLS a        ║
+║  api.polygon.io en lugar de abrir una sesión nueva por petición.           ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    from cliente_rest import obtener_cliente, cerrar_cliente
+
+    cliente = obtener_cliente()
+    data = await cliente.get_json("/v2/aggs/ticker/AAPL/prev", {"adjusted": "true"})
+    ...
+    await cerrar_cliente()   # al apagar el proceso
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from urllib.parse import urlencode
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # type: ignore[assignment]
+
+from configuracion import CONFIG
+
+logger = logging.getLogger("ClienteREST")
+
+POLYGON_REST_BASE = "https://api.polygon.io"
+
+# Respuestas que merecen reintento (rate limit y errores transitorios del servidor)
+ESTADOS_REINTENTABLES = frozenset({429, 500, 502, 503, 504})
+
+
+class ErrorREST(Exception):
+    """Respuesta HTTP no exitosa de Polygon (tras agotar reintentos si aplica)."""
+
+    def __init__(self, estado: int, url: str):
+        super().__init__(f"HTTP {estado} en {url}")
+        self.estado = estado
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  TOKEN BUCKET
+# ══════════════════════════════════════════════════════════════════════════════
+
+class LimitadorTasa:
+    """Token bucket: ``tasa`` tokens por segundo con capacidad ``rafaga``.
+
+    ``adquirir()`` espera lo justo hasta que haya un token; las esperas se
+    sirven en orden de llegada gracias al candado.
+    """
+
+    def __init__(self, tasa: float, rafaga: int | None = None):
+        if tasa <= 0:
+            raise ValueError("tasa debe ser > 0")
+        self.tasa = tasa
+        self.rafaga = rafaga or max(1, int(tasa))
+        self._tokens = float(self.rafaga)
+        self._ultimo = time.monotonic()
+        self._candado = asyncio.Lock()
+
+    async def adquirir(self) -> None:
+        async with self._candado:
+            while True:
+                ahora = time.monotonic()
+                self._tokens = min(self.rafaga, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.tasa)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CLIENTE REST
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ClientePolygonREST:
+    """Cliente HTTP de Polygon compartido por todos los consumidores REST.
+
+    Parámetros:
+        api_key         : str   → API key de Polygon (se añade como apiKey)
+        rps             : float → Peticiones por segundo permitidas
+        max_conexiones  : int   → Conexiones totales del pool
+        max_por_host    : int   → Conexiones simultáneas a un mismo host
+        reintentos      : int   → Reintentos ante 429/5xx/errores de red
+        timeout_seg     : float → Timeout total por petición (por defecto)
+        max_espera_seg  : float → Tope de la espera entre reintentos (también
+                                  para el Retry-After del servidor)
+    """
+
+    def __init__(self, api_key: str, base_url: str = POLYGON_REST_BASE,
+                 rps: float = 50.0, max_conexiones: int = 32, max_por_host: int = 16,
+                 reintentos: int = 3, timeout_seg: float = 15.0,
+                 max_espera_seg: float = 10.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.reintentos = reintentos
+        self.timeout_seg = timeout_seg
+        self.max_espera_seg = max_espera_seg
+        self._max_conexiones = max_conexiones
+        self._max_por_host = max_por_host
+        self._limitador = LimitadorTasa(rps, rafaga=max(1, int(rps)))
+        self._sesion: "aiohttp.ClientSession | None" = None
+        self._peticiones = 0
+        self._reintentos_hechos = 0
+        self._errores = 0
+
+    def _obtener_sesion(self) -> "aiohttp.ClientSession":
+        if aiohttp is None:
+            raise RuntimeError("aiohttp no instalado — ejecuta: pip install aiohttp")
+        if self._sesion is None or self._sesion.closed:
+            conector = aiohttp.TCPConnector(
+                limit=self._max_conexiones,
+                limit_per_host=self._max_por_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            self._sesion = aiohttp.ClientSession(connector=conector)
+        return self._sesion
+
+    def _url(self, ruta_o_url: str, params: dict | None) -> str:
+        """Ruta relativa o URL completa (p. ej. ``next_url``) + params + apiKey."""
+        url = ruta_o_url if ruta_o_url.startswith("http") else self.base_url + ruta_o_url
+        consulta = dict(params or {})
+        if "apiKey=" not in url:
+            consulta["apiKey"] = self.api_key
+        if consulta:
+            url += ("&" if "?" in url else "?") + urlencode(consulta)
+        return url
+
+    async def get_json(self, ruta_o_url: str, params: dict | None = None,
+                       timeout_seg: float | None = None) -> dict:
+        """GET con rate limit y reintentos; devuelve el JSON de la respuesta.
+
+        Raises:
+            ErrorREST: estado HTTP no exitoso (o reintentable agotado).
+            aiohttp.ClientError / asyncio.TimeoutError: red tras agotar reintentos.
+        """
+        sesion = self._obtener_sesion()
+        url = self._url(ruta_o_url, params)
+        timeout = aiohttp.ClientTimeout(total=timeout_seg or self.timeout_seg)
+
+        intento = 0
+        while True:
+            await self._limitador.adquirir()
+            self._peticiones += 1
+            espera_servidor = None
+            try:
+                async with sesion.get(url, timeout=timeout) as resp:
+                    if resp.status == 200:
+                        return await resp.json()
+                    if resp.status not in ESTADOS_REINTENTABLES or intento == self.reintentos:
+                        self._errores += 1
+                        raise ErrorREST(resp.status, ruta_o_url)
+                    espera_servidor = resp.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if intento == self.reintentos:
+                    self._errores += 1
+                    raise
+
+            self._reintentos_hechos += 1
+            await asyncio.sleep(self._espera_reintento(intento, espera_servidor))
+            intento += 1
+
+    def _espera_reintento(self, intento: int, retry_after: str | None) -> float:
+        """Backoff exponencial con full jitter (respeta Retry-After si viene).
+
+        Ambas esperas se acotan a ``max_espera_seg``: un Retry-After largo
+        bloquearía la carga, a quienes la comparten y al sondeo de cripto.
+        """
+        if retry_after:
+            try:
+                return max(0.0, min(float(retry_after), self.max_espera_seg))
+            except ValueError:
+                pass
+        return random.uniform(0, min(8.0, self.max_espera_seg, 0.25 * (2 ** intento)))
+
+    async def cerrar(self) -> None:
+        """Cierra la sesión y sus conexiones keep-alive."""
+        if self._sesion is not None and not self._sesion.closed:
+            await self._sesion.close()
+        self._sesion = None
+
+    def obtener_metricas(self) -> dict:
+        return {
+            "peticiones": self._peticiones,
+            "reintentos": self._reintentos_hechos,
+            "errores": self._errores,
+        }
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  INSTANCIA DEL PROCESO
+# ══════════════════════════════════════════════════════════════════════════════
+
+_cliente: ClientePolygonREST | None = None
+
+
+def obtener_cliente() -> ClientePolygonREST:
+    """Cliente REST único del proceso (se crea en el primer uso)."""
+    global _cliente
+    if _cliente is None:
+        _cliente = ClientePolygonREST(CONFIG.POLYGON_API_KEY, rps=CONFIG.POLYGON_REST_RPS)
+    return _cliente
+
+
+async def cerrar_cliente() -> None:
+    """Hook de apagado: cierra el pool de conexiones si se llegó a crear."""
+    global _cliente
+    if _cliente is not None:
+        await _cliente.cerrar()
+        _cliente = None
@@ -95,6 +95,65 @@ class Configuracion:
             "ORDERBOOK_PORT", 
             os.environ.get("ORDERBOOK_PORT", "8766")
         ))
+        # Ventana de micro-lotes de ticks para navegadores en modo "batch" (ms)
+        self.CHART_LOTE_MS = int(self._vars.get(
+            "CHART_LOTE_MS",
+            os.environ.get("CHART_LOTE_MS", "50")
+        ))
+        # Velas OHLC cerradas retenidas en memoria por símbolo
+        self.HISTORIAL_MAX_VELAS = int(self._vars.get(
+            "HISTORIAL_MAX_VELAS",
+            os.environ.get("HISTORIAL_MAX_VELAS", "10000")
+        ))
+        # Segundos que un historial sembrado se sirve de memoria antes de re-sembrarlo
+        self.HISTORIAL_MEMORIA_MAX_SEG = float(self._vars.get(
+            "HISTORIAL_MEMORIA_MAX_SEG",
+            os.environ.get("HISTORIAL_MEMORIA_MAX_SEG", "900")
+        ))
+        # Límite de peticiones REST a Polygon por segundo (token bucket compartido)
+        self.POLYGON_REST_RPS = float(self._vars.get(
+            "POLYGON_REST_RPS",
+            os.environ.get("POLYGON_REST_RPS", "50")
+        ))
+        # WebSocket de Polygon (stocks); apuntar a grabador_polygon.py replay para pruebas sin red
+        self.POLYGON_WS_URL = self._vars.get(
+            "POLYGON_WS_URL",
+            os.environ.get("POLYGON_WS_URL", "wss://socket.polygon.io/stocks")
+        )
+        # Si no está vacío, los frames crudos de trades y quotes se graban en este archivo
+        self.GRABAR_FEED = self._vars.get(
+            "GRABAR_FEED",
+            os.environ.get("GRABAR_FEED", "")
+        )
+        # Endpoint Prometheus (GET /metrics); 0 lo desactiva
+        self.METRICS_PORT = int(self._vars.get(
+            "METRICS_PORT",
+            os.environ.get("METRICS_PORT", "9108")
+        ))
+        self.METRICS_HOST = self._vars.get(
+            "METRICS_HOST",
+            os.environ.get("METRICS_HOST", "127.0.0.1")
+        )
+        # Un callback del event loop que tarde más que esto se registra como lento (ms)
+        self.LOOP_LENTO_MS = float(self._vars.get(
+            "LOOP_LENTO_MS",
+            os.environ.get("LOOP_LENTO_MS", "50")
+        ))
+        # Trades y quotes de stocks por una sola conexión WebSocket (0 = una por motor)
+        self.FEED_MULTIPLEXADO = self._vars.get(
+            "FEED_MULTIPLEXADO",
+            os.environ.get("FEED_MULTIPLEXADO", "1")
+        ).strip().lower() not in ("0", "false", "no")
+        # Segundos que un símbolo sin navegadores sigue suscrito en Polygon
+        self.SUSCRIPCION_GRACIA_SEG = float(self._vars.get(
+            "SUSCRIPCION_GRACIA_SEG",
+            os.environ.get("SUSCRIPCION_GRACIA_SEG", "120")
+        ))
+        # Carpeta del cache de barras históricas (un .npy por símbolo/timeframe/día)
+        self.CACHE_BARRAS_DIR = self._vars.get(
+            "CACHE_BARRAS_DIR",
+            os.environ.get("CACHE_BARRAS_DIR", str(Path(__file__).parent / ".cache_barras"))
+        )
         
         # ÔöÇÔöÇ S├¡mbolos a monitorear ÔöÇÔöÇ
         simbolos_raw = self._vars.get(
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║         DIFUSIÓN POR SÍMBOLO — Fan-out de mensajes a navegadores           ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  ColaCliente       : Cola de salida acotada por conexión (drop-oldest).     ║
+║  DifusorPorSimbolo : Índice símbolo → suscriptores; serializa una vez y    ║
+║                      encola el mismo mensaje a todos los suscriptores.     ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Una pestaña lenta o congelada solo pierde sus mensajes más viejos; nunca   ║
+║  acumula buffers sin límite ni frena al resto de conexiones.               ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    difusor = DifusorPorSimbolo(max_cola=256)
+    difusor.registrar(ws)                 # al conectar
+    difusor.suscribir(ws, "AAPL")         # al elegir símbolo
+    difusor.suscribir(ws, "AAPL", grupo="lote:60")  # variante por conexión
+    difusor.enviar("AAPL", json.dumps(msg))
+    difusor.enviar("AAPL", json.dumps(lote), grupo="lote:60")
+    difusor.eliminar(ws)                  # al desconectar
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Callable
+
+try:
+    from websockets.exceptions import ConnectionClosed
+except ImportError:
+    raise SystemExit(
+        "\n[ERROR] La librería 'websockets' no está instalada.\n"
+        "Ejecuta:  pip install websockets\n"
+    )
+
+logger = logging.getLogger("Difusion")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  COLA DE SALIDA POR CONEXIÓN
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ColaCliente:
+    """Cola de salida acotada de una conexión WebSocket.
+
+    Los mensajes se encolan sin bloquear y una tarea escritora los envía en
+    orden. Si la cola está llena se descarta el mensaje más antiguo
+    (``deque(maxlen=...)``) y se cuenta en ``descartados``.
+
+    Si el envío falla por algo que no sea el cierre de la conexión, la
+    conexión se cierra y se llama ``al_fallar(ws)`` para darla de baja.
+
+    Atributos:
+        ws          : conexión WebSocket del navegador
+        descartados : int → mensajes perdidos por cola llena
+    """
+
+    __slots__ = ("ws", "_cola", "_evento", "_tarea", "_al_fallar", "descartados")
+
+    def __init__(self, ws, max_mensajes: int = 256,
+                 al_fallar: Callable[[object], None] | None = None):
+        self.ws = ws
+        self._al_fallar = al_fallar
+        self._cola: deque[str] = deque(maxlen=max_mensajes)
+        self._evento = asyncio.Event()
+        self.descartados = 0
+        self._tarea = asyncio.get_running_loop().create_task(self._escribir())
+
+    def encolar(self, mensaje: str) -> None:
+        """Añade un mensaje ya serializado (descarta el más viejo si está llena)."""
+        if len(self._cola) == self._cola.maxlen:
+            self.descartados += 1
+        self._cola.append(mensaje)
+        self._evento.set()
+
+    @property
+    def profundidad(self) -> int:
+        """Mensajes pendientes de enviar."""
+        return len(self._cola)
+
+    async def _escribir(self) -> None:
+        """Tarea escritora: vacía la cola en orden mientras la conexión viva."""
+        cola = self._cola
+        try:
+            while True:
+                await self._evento.wait()
+                self._evento.clear()
+                while cola:
+                    await self.ws.send(cola.popleft())
+        except ConnectionClosed:
+            pass
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error("[DIFUSION] Error enviando a %s: %s [%s] — cerrando conexión",
+                         getattr(self.ws, "remote_address", "?"), e, type(e).__name__)
+            self._cola.clear()
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+            # Al final: dar de baja cancela esta misma tarea
+            if self._al_fallar is not None:
+                self._al_fallar(self.ws)
+
+    def cerrar(self) -> None:
+        """Cancela la tarea escritora y libera los mensajes pendientes."""
+        self._tarea.cancel()
+        self._cola.clear()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  ÍNDICE SÍMBOLO → SUSCRIPTORES
+# ══════════════════════════════════════════════════════════════════════════════
+
+class DifusorPorSimbolo:
+    """Mantiene qué conexiones miran cada símbolo y les reparte mensajes.
+
+    El índice se actualiza al suscribir/desconectar, así que enviar un
+    mensaje a un símbolo cuesta O(suscriptores del símbolo) y no un barrido
+    de todas las conexiones. El mensaje se serializa una sola vez (lo hace
+    quien llama) y la misma cadena se encola en cada suscriptor.
+
+    Cada conexión pertenece además a un ``grupo`` (por defecto ""), que
+    permite que conexiones del mismo símbolo reciban formatos distintos
+    (p. ej. ticks sueltos vs. lotes) sin filtrar en cada envío.
+
+    Parámetros:
+        max_cola : int → Mensajes máximos pendientes por conexión (default: 256)
+    """
+
+    def __init__(self, max_cola: int = 256):
+        self._max_cola = max_cola
+        self._colas: dict = {}                       # ws → ColaCliente
+        self._simbolo_de: dict = {}                  # ws → (símbolo, grupo) actual
+        self._por_simbolo: dict[str, dict[str, dict]] = {}  # símbolo → grupo → {ws: ColaCliente}
+        self._descartados_cerrados = 0               # descartes de conexiones ya cerradas
+
+    # ── Ciclo de vida de conexiones ──
+
+    def registrar(self, ws) -> ColaCliente:
+        """Registra una conexión nueva (sin símbolo todavía)."""
+        cola = ColaCliente(ws, self._max_cola, al_fallar=self.eliminar)
+        self._colas[ws] = cola
+        return cola
+
+    def suscribir(self, ws, simbolo: str, grupo: str = "") -> None:
+        """Mueve la conexión al índice de ``simbolo`` dentro de ``grupo``."""
+        cola = self._colas.get(ws)
+        if cola is None:
+            return
+        clave = (simbolo, grupo)
+        anterior = self._simbolo_de.get(ws)
+        if anterior == clave:
+            return
+        if anterior is not None:
+            self._quitar_de_indice(ws, anterior)
+        self._simbolo_de[ws] = clave
+        self._por_simbolo.setdefault(simbolo, {}).setdefault(grupo, {})[ws] = cola
+
+    def eliminar(self, ws) -> None:
+        """Quita la conexión de todos los índices y cierra su cola."""
+        anterior = self._simbolo_de.pop(ws, None)
+        if anterior is not None:
+            self._quitar_de_indice(ws, anterior)
+        cola = self._colas.pop(ws, None)
+        if cola is not None:
+            self._descartados_cerrados += cola.descartados
+            cola.cerrar()
+
+    def _quitar_de_indice(self, ws, clave: tuple) -> None:
+        simbolo, grupo = clave
+        grupos = self._por_simbolo.get(simbolo)
+        if grupos is None:
+            return
+        suscriptores = grupos.get(grupo)
+        if suscriptores is None:
+            return
+        suscriptores.pop(ws, None)
+        if not suscriptores:
+            del grupos[grupo]
+            if not grupos:
+                del self._por_simbolo[simbolo]
+
+    # ── Consultas ──
+
+    def simbolo_de(self, ws) -> str | None:
+        clave = self._simbolo_de.get(ws)
+        return clave[0] if clave else None
+
+    def tiene_suscriptores(self, simbolo: str, grupo: str | None = None) -> bool:
+        """True si alguien mira el símbolo (en cualquier grupo si ``grupo`` es None)."""
+        grupos = self._por_simbolo.get(simbolo)
+        if grupos is None:
+            return False
+        return grupo is None or grupo in grupos
+
+    def num_suscriptores(self, simbolo: str, grupo: str | None = None) -> int:
+        grupos = self._por_simbolo.get(simbolo)
+        if not grupos:
+            return 0
+        if grupo is not None:
+            return len(grupos.get(grupo, ()))
+        return sum(len(s) for s in grupos.values())
+
+    def grupos_de(self, simbolo: str) -> list[str]:
+        """Grupos con al menos un suscriptor del símbolo."""
+        return list(self._por_simbolo.get(simbolo, ()))
+
+    def simbolos_suscritos(self) -> set[str]:
+        """Símbolos con al menos un navegador mirando."""
+        return set(self._por_simbolo)
+
+    def __len__(self) -> int:
+        return len(self._colas)
+
+    # ── Envío ──
+
+    def enviar(self, simbolo: str, mensaje: str, grupo: str = "") -> int:
+        """Encola un mensaje ya serializado a los suscriptores del símbolo/grupo.
+
+        Returns:
+            Número de conexiones a las que se encoló.
+        """
+        suscriptores = self._por_simbolo.get(simbolo, {}).get(grupo)
+        if not suscriptores:
+            return 0
+        for cola in suscriptores.values():
+            cola.encolar(mensaje)
+        return len(suscriptores)
+
+    def enviar_a(self, ws, mensaje: str) -> None:
+        """Encola un mensaje a una sola conexión (respeta el orden de su cola)."""
+        cola = self._colas.get(ws)
+        if cola is not None:
+            cola.encolar(mensaje)
+
+    def enviar_todos(self, mensaje: str) -> None:
+        """Encola un mensaje a todas las conexiones registradas."""
+        for cola in self._colas.values():
+            cola.encolar(mensaje)
+
+    # ── Métricas ──
+
+    def obtener_metricas(self) -> dict:
+        """Clientes, profundidad de colas y mensajes descartados."""
+        colas = self._colas.values()
+        return {
+            "clientes": len(self._colas),
+            "simbolos": len(self._por_simbolo),
+            "profundidad_max": max((c.profundidad for c in colas), default=0),
+            "profundidad_total": sum(c.profundidad for c in colas),
+            "descartados": self._descartados_cerrados + sum(c.descartados for c in colas),
+        }
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║      FEED POLYGON — Una sola conexión WebSocket para trades y quotes        ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  PolygonFeedWS : Conecta, autentica y suscribe una vez al cluster de       ║
+║                  stocks con los canales de todos los motores adjuntos      ║
+║                  (T.* y Q.*), decodifica cada frame una sola vez y         ║
+║                  reparte los lotes: trades → PolygonTradesWS,              ║
+║                  quotes → PolygonQuotesWS.                                 ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  - Un handshake, un bucle de reconexión y un heartbeat para los dos.       ║
+║  - Un único lector: si el proceso no da abasto, la presión se acumula en   ║
+║    un solo buffer de websockets (max_queue) y no en dos que compiten.      ║
+║  - Los motores conservan su API (iniciar/detener/suscribir_simbolo/...).   ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    feed = PolygonFeedWS(api_key=API_KEY, ws_url=WS_URL)
+    motor_trades = PolygonTradesWS(api_key=API_KEY, simbolos=SIMBOLOS, feed=feed)
+    motor_quotes = PolygonQuotesWS(api_key=API_KEY, simbolos=SIMBOLOS, feed=feed)
+    await asyncio.gather(motor_trades.iniciar(), motor_quotes.iniciar())
+
+Un motor adjunto no abre socket propio: ``iniciar()`` espera al feed
+compartido y ``detener()`` lo suelta (el feed se cierra con el último).
+El feed mantiene al día ``_ws``, ``_conectado``, ``_reconexiones`` y
+``_ultimo_mensaje_ts`` de cada motor, así que sus suscripciones dinámicas y
+``obtener_metricas()`` funcionan igual que con conexión propia.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+from decodificador_polygon import DecodificadorPolygon, ErrorDecodificacion
+from grabador_polygon import FLUJO_MIXTO, FLUJO_QUOTES, FLUJO_TRADES, GrabadorPolygon
+from metricas import METRICAS
+from registros_mercado import QuoteNormalizado, TradeNormalizado
+
+logger = logging.getLogger("FeedPolygon")
+
+POLYGON_WS_URL = "wss://socket.polygon.io/stocks"
+
+TIPOS = ("trades", "quotes")
+
+
+class PolygonFeedWS:
+    """Conexión WebSocket compartida por un motor de trades y uno de quotes.
+
+    Cada motor adjunto aporta su canal (``_canal``), sus símbolos y su
+    ``_param(simbolo)``; el feed los junta en un único ``subscribe`` al
+    conectar. Las suscripciones dinámicas de cada motor salen por este
+    mismo socket.
+
+    Parámetros:
+        api_key          : str   → Clave de autenticación de Polygon.io
+        ws_url           : str   → Cluster (default: stocks)
+        max_reconexiones : int   → Intentos máximos de reconexión (default: 50)
+        heartbeat_seg    : int   → Intervalo de heartbeat en segundos (default: 30)
+        grabador         : GrabadorPolygon | None → Captura de frames crudos
+    """
+
+    def __init__(self, api_key: str, ws_url: str = POLYGON_WS_URL,
+                 max_reconexiones: int = 50, heartbeat_seg: int = 30,
+                 grabador: GrabadorPolygon | None = None):
+        self.api_key = api_key
+        self.ws_url = ws_url
+        self._max_reconexiones = max_reconexiones
+        self._heartbeat_seg = heartbeat_seg
+        self._grabador = grabador
+
+        self._trades = None   # PolygonTradesWS adjunto
+        self._quotes = None   # PolygonQuotesWS adjunto
+        self._motores: list = []
+        self._decodificador = DecodificadorPolygon()
+        self._etiqueta = ""   # feed en METRICAS: "T+Q"
+
+        self._ws = None
+        self._conectado = False
+        self._detener = False
+        self._reconexiones = 0
+        self._tarea: asyncio.Task | None = None
+
+        # Métricas
+        self.frames_recibidos = 0
+        self._ultimo_mensaje_ts = 0.0
+        self._connect_ts = 0.0
+
+    # ── Motores ──
+
+    def adjuntar(self, motor, tipo: str) -> None:
+        """Registra ``motor`` como consumidor de ``tipo`` ("trades" | "quotes")."""
+        if tipo not in TIPOS:
+            raise ValueError(f"tipo desconocido: {tipo!r} (opciones: {', '.join(TIPOS)})")
+        if getattr(self, f"_{tipo}") is not None:
+            raise ValueError(f"el feed ya tiene un motor de {tipo}")
+        setattr(self, f"_{tipo}", motor)
+        self._motores.append(motor)
+        self._reconfigurar()
+
+    async def soltar(self, motor) -> None:
+        """Desadjunta ``motor``; con el último motor se cierra la conexión."""
+        if motor not in self._motores:
+            return
+        self._motores.remove(motor)
+        if self._trades is motor:
+            self._trades = None
+        if self._quotes is motor:
+            self._quotes = None
+        self._reconfigurar()
+        if not self._motores:
+            await self.detener()
+        elif self._ws and self._conectado and motor.simbolos:
+            params = ",".join(motor._param(s) for s in motor.simbolos)
+            await self._ws.send(json.dumps({"action": "unsubscribe", "params": params}))
+        motor._conectado = False
+
+    def _reconfigurar(self) -> None:
+        # El decodificador solo materializa los tipos que alguien consume
+        self._decodificador = DecodificadorPolygon(
+            fabrica_trade=TradeNormalizado if self._trades is not None else None,
+            fabrica_quote=QuoteNormalizado if self._quotes is not None else None,
+        )
+        self._etiqueta = "+".join(m._canal for m in self._motores)
+
+    def _actualizar_motores(self, **estado) -> None:
+        for motor in self._motores:
+            for campo, valor in estado.items():
+                setattr(motor, campo, valor)
+
+    # ── Ciclo de vida ──
+
+    async def iniciar(self) -> None:
+        """Arranca la conexión compartida (una vez) y espera a que termine.
+
+        Pueden llamarlo todos los motores adjuntos: el primero la lanza y
+        los demás esperan a la misma tarea.
+        """
+        if self._tarea is None or self._tarea.done():
+            self._detener = False
+            self._tarea = asyncio.get_running_loop().create_task(self._ejecutar())
+        await asyncio.shield(self._tarea)
+
+    async def detener(self) -> None:
+        """Cierra la conexión compartida para todos los motores."""
+        logger.info("Deteniendo feed multiplexado...")
+        self._detener = True
+        if self._ws:
+            await self._ws.close()
+
+    async def _ejecutar(self) -> None:
+        logger.info("=" * 60)
+        logger.info("  FEED POLYGON — Trades + Quotes en una conexión")
+        logger.info("  Canales  : %s", ", ".join(
+            f"{m._canal} ({len(m.simbolos)} símbolos)" for m in self._motores))
+        logger.info("=" * 60)
+
+        while not self._detener:
+            try:
+                await self._conectar_y_escuchar()
+            except ConnectionClosed as e:
+                logger.warning("Conexion cerrada: %s", e)
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.error("Error de red: %s", e)
+            except Exception as e:
+                logger.error("Error inesperado: %s [%s]", e, type(e).__name__)
+            finally:
+                self._conectado = False
+                self._actualizar_motores(_conectado=False)
+
+            if self._detener:
+                break
+
+            self._reconexiones += 1
+            self._actualizar_motores(_reconexiones=self._reconexiones)
+            if self._reconexiones > self._max_reconexiones:
+                logger.critical(
+                    "Maximo de reconexiones alcanzado (%d). Abortando.",
+                    self._max_reconexiones,
+                )
+                break
+
+            espera = min(2 ** self._reconexiones, 60)
+            logger.info(
+                "Reconectando en %ds (intento %d/%d)...",
+                espera, self._reconexiones, self._max_reconexiones,
+            )
+            await asyncio.sleep(espera)
+
+        logger.info("Feed multiplexado detenido.")
+
+    async def _conectar_y_escuchar(self) -> None:
+        """Conecta, autentica, suscribe todos los canales y reparte frames."""
+        logger.info("Conectando a %s ...", self.ws_url)
+
+        async with websockets.connect(
+            self.ws_url,
+            ping_interval=self._heartbeat_seg,
+            ping_timeout=10,
+            close_timeout=5,
+            max_size=2 ** 22,
+        ) as ws:
+            self._ws = ws
+            self._conectado = True
+            self._connect_ts = time.time()
+            logger.info("Conexion WebSocket establecida")
+
+            bienvenida = await ws.recv()
+            logger.debug("[BIENVENIDA] %s", bienvenida[:500])
+
+            await self._autenticar()
+            # Los motores ven el socket antes del subscribe: una suscripción
+            # dinámica que llegue ahora sale por aquí y no se pierde.
+            self._actualizar_motores(_ws=ws, _conectado=True)
+            await self._suscribir()
+            if self._trades is not None:
+                self._trades._al_conectar()
+
+            logger.info("Escuchando trades y quotes en tiempo real...")
+            async for mensaje_crudo in ws:
+                ahora = time.time()
+                self._ultimo_mensaje_ts = ahora
+                if self._reconexiones > 0 and (ahora - self._connect_ts) > 10:
+                    logger.info("Conexión estable >10s — reseteando contador de reconexiones")
+                    self._reconexiones = 0
+                    self._actualizar_motores(_reconexiones=0)
+                self._on_message(mensaje_crudo, ahora)
+
+    async def _autenticar(self) -> None:
+        """Envía el mensaje de autenticación a Polygon."""
+        await self._ws.send(json.dumps({"action": "auth", "params": self.api_key}))
+
+        respuesta = await self._ws.recv()
+        logger.debug("[AUTH] %s", respuesta[:500])
+
+        datos = json.loads(respuesta)
+        if isinstance(datos, list):
+            for msg in datos:
+                if msg.get("status") == "auth_success":
+                    logger.info("Autenticacion exitosa")
+                    return
+                elif msg.get("status") == "auth_failed":
+                    raise PermissionError(
+                        f"Autenticacion fallida: {msg.get('message', 'API Key invalida')}"
+                    )
+
+    async def _suscribir(self) -> None:
+        """Un único ``subscribe`` con los canales de todos los motores."""
+        params = ",".join(m._param(s) for m in self._motores for s in m.simbolos)
+        if not params:
+            return
+        await self._ws.send(json.dumps({"action": "subscribe", "params": params}))
+        logger.info("Suscrito a: %s", params)
+
+    # ── Reparto ──
+
+    def _on_message(self, mensaje_crudo: str | bytes, recibido_ts: float) -> None:
+        """Decodifica el frame una vez y entrega cada lote a su motor."""
+        recibido_ns = time.perf_counter_ns()
+        self.frames_recibidos += 1
+        try:
+            lotes = self._decodificador.decodificar_lotes(mensaje_crudo)
+        except ErrorDecodificacion:
+            logger.error("JSON invalido recibido: %s", mensaje_crudo[:200])
+            if self._grabador is not None:
+                self._grabador.grabar(FLUJO_MIXTO, mensaje_crudo)
+            return
+        METRICAS.registrar_ns("decodificacion", self._etiqueta, time.perf_counter_ns() - recibido_ns)
+
+        if self._grabador is not None:
+            # Un frame mixto lleva su propio flujo: la réplica lo entrega a
+            # los motores de trades y de quotes aunque vayan por separado.
+            if lotes.trades and lotes.quotes:
+                flujo = FLUJO_MIXTO
+            else:
+                flujo = FLUJO_QUOTES if lotes.quotes else FLUJO_TRADES
+            self._grabador.grabar(flujo, mensaje_crudo)
+
+        trades, quotes = self._trades, self._quotes
+        # Cada motor solo se marca con los frames que traen datos de su canal:
+        # así la edad del último mensaje delata un canal muerto aunque el
+        # otro siga recibiendo.
+        if lotes.trades and trades is not None:
+            trades._ultimo_mensaje_ts = recibido_ts
+            METRICAS.registrar_frame(trades._canal, lotes.trades.simbolos, lotes.trades.timestamp_ms,
+                                     recibido_ns, recibido_ts * 1000)
+            trades._procesar_lote(lotes.trades)
+        if lotes.quotes and quotes is not None:
+            quotes._ultimo_mensaje_ts = recibido_ts
+            METRICAS.registrar_frame(quotes._canal, lotes.quotes.simbolos, lotes.quotes.timestamp_ms,
+                                     recibido_ns, recibido_ts * 1000)
+            quotes._procesar_lote(lotes.quotes)
+        for estado in lotes.estados:
+            logger.debug("Status: %s", estado.get("message", ""))
+
+    # ── Métricas ──
+
+    def obtener_metricas(self) -> dict:
+        return {
+            "frames_recibidos": self.frames_recibidos,
+            "reconexiones": self._reconexiones,
+            "conectado": self._conectado,
+            "canales": self._etiqueta,
+            "ultimo_mensaje_hace_seg": (
+                round(time.time() - self._ultimo_mensaje_ts, 2)
+                if self._ultimo_mensaje_ts > 0
+                else None
+            ),
+        }
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║       GRABADOR POLYGON — Captura y reproducción del feed WebSocket          ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  GrabadorPolygon : Añade los frames crudos recibidos a un archivo binario  ║
+║                    append-only, con la hora de recepción en ns.            ║
+║  leer_grabacion  : Itera (ts_ns, flujo, frame) de una captura.             ║
+║  ServidorReplay  : WebSocket local que imita el handshake de Polygon       ║
+║                    (connected → auth → subscribe) y reproduce la captura   ║
+║                    a 1x, Nx o a máxima velocidad.                          ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Formato: cabecera b"PGRB\\x01" y registros <q B I> (ts_ns, flujo, len)    ║
+║  seguidos del frame tal cual llegó (UTF-8). flujo: b"T" trades, b"Q" quotes.║
+║  b"M" = frame mixto del feed multiplexado (trades y quotes juntos).        ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Grabar (en .env):
+    GRABAR_FEED=capturas/sesion.pgrb
+
+Reproducir y apuntar main() a la réplica:
+    python grabador_polygon.py replay capturas/sesion.pgrb --puerto 8800 --velocidad 10
+    POLYGON_WS_URL=ws://127.0.0.1:8800 python chart.py
+
+Resumen de una captura:
+    python grabador_polygon.py info capturas/sesion.pgrb
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import struct
+import time
+from pathlib import Path
+from typing import Iterator
+
+import websockets
+
+logger = logging.getLogger("GrabadorPolygon")
+
+CABECERA = b"PGRB\x01"
+REGISTRO = struct.Struct("<qBI")   # ts_ns recepción, flujo, longitud del frame
+
+FLUJO_TRADES = ord("T")
+FLUJO_QUOTES = ord("Q")
+FLUJO_MIXTO = ord("M")     # feed multiplexado: el frame trae trades y quotes
+
+# Prefijo del canal suscrito → flujo grabado que le corresponde
+_FLUJO_DE_CANAL = {"T": FLUJO_TRADES, "XT": FLUJO_TRADES, "Q": FLUJO_QUOTES, "XQ": FLUJO_QUOTES}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  GRABACIÓN
+# ══════════════════════════════════════════════════════════════════════════════
+
+class GrabadorPolygon:
+    """Escribe frames crudos en un archivo append-only.
+
+    Las escrituras van a un buffer de ``buffer_bytes``; el sistema operativo
+    recibe bloques grandes y el event loop no espera disco por frame. Un
+    mismo grabador puede compartirse entre el motor de trades y el de
+    quotes: cada registro lleva su flujo.
+
+    Parámetros:
+        ruta         : str | Path → Archivo de captura (se crea o se continúa)
+        buffer_bytes : int        → Tamaño del buffer de escritura
+    """
+
+    def __init__(self, ruta: str | Path, buffer_bytes: int = 1 << 20):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        nuevo = not self.ruta.exists() or self.ruta.stat().st_size == 0
+        self._f = open(self.ruta, "ab", buffering=buffer_bytes)
+        if nuevo:
+            self._f.write(CABECERA)
+        self.frames = 0
+        self.bytes = 0
+
+    def grabar(self, flujo: int, frame: str | bytes, ts_ns: int | None = None) -> None:
+        """Añade un frame (``flujo`` = FLUJO_TRADES / FLUJO_QUOTES)."""
+        if self._f.closed:
+            return
+        datos = frame.encode("utf-8") if isinstance(frame, str) else frame
+        self._f.write(REGISTRO.pack(ts_ns if ts_ns is not None else time.time_ns(), flujo, len(datos)))
+        self._f.write(datos)
+        self.frames += 1
+        self.bytes += REGISTRO.size + len(datos)
+
+    def cerrar(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+            logger.info("[GRABADOR] %s: %d frames, %.1f MB", self.ruta, self.frames, self.bytes / 1e6)
+
+
+def leer_grabacion(ruta: str | Path) -> Iterator[tuple[int, int, bytes]]:
+    """Itera (ts_ns, flujo, frame) en orden de grabación.
+
+    Un registro truncado al final (p. ej. el proceso murió escribiendo) se
+    ignora.
+    """
+    with open(ruta, "rb") as f:
+        if f.read(len(CABECERA)) != CABECERA:
+            raise ValueError(f"{ruta} no es una captura PGRB")
+        while True:
+            cabecera = f.read(REGISTRO.size)
+            if len(cabecera) < REGISTRO.size:
+                return
+            ts_ns, flujo, n = REGISTRO.unpack(cabecera)
+            frame = f.read(n)
+            if len(frame) < n:
+                return
+            yield ts_ns, flujo, frame
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  SERVIDOR DE REPRODUCCIÓN
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ServidorReplay:
+    """Sustituto local de ``wss://socket.polygon.io`` que reproduce una captura.
+
+    Cada conexión recibe ``connected``, responde ``auth_success`` a cualquier
+    API key y, tras el primer ``subscribe``, reproduce los frames de los
+    flujos suscritos (canales T/XT → trades, Q/XQ → quotes). Los frames
+    mixtos del feed multiplexado van a toda conexión que suscriba trades o
+    quotes; cada motor ignora los eventos del otro tipo. Los frames se
+    envían tal cual se grabaron: no se filtra por símbolo.
+
+    El ritmo sigue las horas de recepción grabadas divididas por
+    ``velocidad``; ``velocidad=0`` envía todo sin esperas.
+
+    Parámetros:
+        ruta      : str | Path → Captura a reproducir
+        host/port : str / int  → Dirección de escucha
+        velocidad : float      → 1 = tiempo real, N = N veces más rápido, 0 = máximo
+        bucle     : bool       → Volver a empezar al terminar la captura
+    """
+
+    def __init__(self, ruta: str | Path, host: str = "127.0.0.1", port: int = 8800,
+                 velocidad: float = 1.0, bucle: bool = False):
+        self.ruta = Path(ruta)
+        self.host = host
+        self.port = port
+        self.velocidad = velocidad
+        self.bucle = bucle
+        self._server = None
+        self.frames_enviados = 0
+
+    async def iniciar(self) -> None:
+        self._server = await websockets.serve(self._handler, self.host, self.port, max_size=2 ** 22)
+        logger.info("[REPLAY] %s en ws://%s:%d (velocidad=%s)",
+                    self.ruta.name, self.host, self.port, self.velocidad or "máx")
+
+    async def detener(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handler(self, ws) -> None:
+        await ws.send(_estado("connected", "Connected Successfully"))
+        flujos: set[int] = set()
+        reproduccion: asyncio.Task | None = None
+        try:
+            async for mensaje in ws:
+                try:
+                    datos = json.loads(mensaje)
+                except json.JSONDecodeError:
+                    continue
+                accion = datos.get("action")
+                if accion == "auth":
+                    await ws.send(_estado("auth_success", "authenticated"))
+                elif accion in ("subscribe", "unsubscribe"):
+                    params = [p for p in str(datos.get("params", "")).split(",") if p]
+                    for p in params:
+                        flujo = _FLUJO_DE_CANAL.get(p.split(".", 1)[0])
+                        if flujo is not None and accion == "subscribe":
+                            flujos.add(flujo)
+                    prefijo = "subscribed to" if accion == "subscribe" else "unsubscribed to"
+                    await ws.send(json.dumps([
+                        {"ev": "status", "status": "success", "message": f"{prefijo}: {p}"}
+                        for p in params
+                    ]))
+                    if reproduccion is None and flujos:
+                        reproduccion = asyncio.create_task(self._reproducir(ws, flujos))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if reproduccion is not None:
+                reproduccion.cancel()
+
+    async def _reproducir(self, ws, flujos: set[int]) -> None:
+        try:
+            while True:
+                inicio_real = time.monotonic()
+                inicio_grabado = None
+                for ts_ns, flujo, frame in leer_grabacion(self.ruta):
+                    if flujo not in flujos and not (flujo == FLUJO_MIXTO and flujos):
+                        continue
+                    if self.velocidad > 0:
+                        if inicio_grabado is None:
+                            inicio_grabado = ts_ns
+                        espera = (inicio_real + (ts_ns - inicio_grabado) / 1e9 / self.velocidad
+                                  - time.monotonic())
+                        if espera > 0:
+                            await asyncio.sleep(espera)
+                    await ws.send(frame.decode("utf-8"))
+                    self.frames_enviados += 1
+                if not self.bucle:
+                    break
+            logger.info("[REPLAY] Captura terminada (%d frames enviados)", self.frames_enviados)
+        except websockets.ConnectionClosed:
+            pass
+
+
+def _estado(status: str, message: str) -> str:
+    return json.dumps([{"ev": "status", "status": status, "message": message}])
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CLI
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _info(ruta: str) -> None:
+    por_flujo: dict[int, list[int]] = {}
+    primero = ultimo = None
+    for ts_ns, flujo, frame in leer_grabacion(ruta):
+        cuenta = por_flujo.setdefault(flujo, [0, 0])
+        cuenta[0] += 1
+        cuenta[1] += len(frame)
+        primero = ts_ns if primero is None else primero
+        ultimo = ts_ns
+    duracion = (ultimo - primero) / 1e9 if primero is not None else 0.0
+    print(f"{ruta}: {duracion:,.1f} s grabados")
+    for flujo, (n, b) in sorted(por_flujo.items()):
+        print(f"  {chr(flujo)}: {n:,} frames · {b / 1e6:,.1f} MB · {n / duracion if duracion else 0:,.0f} frames/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Capturas del feed WebSocket de Polygon")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    rep = sub.add_parser("replay", help="Servir una captura como si fuera Polygon")
+    rep.add_argument("ruta")
+    rep.add_argument("--host", default="127.0.0.1")
+    rep.add_argument("--puerto", type=int, default=8800)
+    rep.add_argument("--velocidad", type=float, default=1.0, help="1 = tiempo real, 0 = máxima")
+    rep.add_argument("--bucle", action="store_true", help="Repetir la captura indefinidamente")
+    inf = sub.add_parser("info", help="Resumen de una captura")
+    inf.add_argument("ruta")
+    args = parser.parse_args()
+
+    if args.comando == "info":
+        _info(args.ruta)
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s │ %(levelname)-7s │ %(message)s",
+                        datefmt="%H:%M:%S")
+
+    async def servir() -> None:
+        servidor = ServidorReplay(args.ruta, args.host, args.puerto, args.velocidad, args.bucle)
+        await servidor.iniciar()
+        await asyncio.Future()
+
+    try:
+        asyncio.run(servir())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
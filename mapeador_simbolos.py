@@ -18,6 +18,8 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
+
 
 # ══════════════════════════════════════════════════════════════════════════════
 #  CONSTANTES
@@ -53,6 +55,128 @@ FOREX_QUOTES = {"USD", "EUR", "GBP", "JPY", "CHF", "CAD", "AUD", "NZD",
                 "MXN", "BRL", "CLP", "COP", "ARS"}
 
 
+# ── Tablas precalculadas (se construyen una vez al importar) ──
+CRYPTO_PARES: frozenset[str] = frozenset(
+    f"{base}{quote}" for base in CRYPTO_BASES for quote in CRYPTO_QUOTES
+)
+FOREX_PARES: frozenset[str] = frozenset(
+    f"{base}{quote}" for base in FOREX_BASES for quote in FOREX_QUOTES
+)
+
+
+def _label_crypto(par: str) -> str:
+    """"BTCUSD" → "BTC/USD" usando la base crypto más larga que encaje."""
+    for base in sorted(CRYPTO_BASES, key=len, reverse=True):
+        if par.startswith(base):
+            quote_part = par[len(base):]
+            return f"{base}/{quote_part}" if quote_part else base
+    return par
+
+
+# Par crypto limpio → label legible
+CRYPTO_LABELS: dict[str, str] = {par: _label_crypto(par) for par in CRYPTO_PARES}
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  CLASIFICACIÓN MEMOIZADA POR SÍMBOLO
+# ══════════════════════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True, slots=True)
+class ClasificacionSimbolo:
+    """Todo lo que el resto del sistema pregunta sobre un símbolo, ya resuelto.
+
+    Campos:
+        simbolo        : Símbolo limpio interno ("BTCUSD", "AAPL")
+        clase          : "crypto" | "forex" | "stock"
+        es_crypto      : bool
+        es_forex       : bool
+        polygon_ticker : "X:BTCUSD" | "C:EURUSD" | "AAPL"
+        canal_trades   : "XT.X:BTCUSD" | "T.AAPL"
+        canal_quotes   : "XQ.X:BTCUSD" | "Q.AAPL"
+        ws_url         : Endpoint WebSocket de Polygon para la clase de activo
+        label          : "BTC/USD" | "AAPL"
+    """
+    simbolo: str
+    clase: str
+    es_crypto: bool
+    es_forex: bool
+    polygon_ticker: str
+    canal_trades: str
+    canal_quotes: str
+    ws_url: str
+    label: str
+
+
+# Entrada tal cual llega (sin normalizar) → clasificación. Acotado por si el
+# frontend manda símbolos arbitrarios durante días.
+_CLASIFICACIONES: dict[str, ClasificacionSimbolo] = {}
+_MAX_CLASIFICACIONES = 10_000
+
+
+def _es_crypto(simbolo: str) -> bool:
+    simbolo = simbolo.upper().strip()
+    # Formato explícito de Polygon: "X:BTCUSD"
+    if simbolo.startswith("X:"):
+        return True
+    # Quitar guiones: "BTC-USD" → "BTCUSD"
+    return simbolo.replace("-", "") in CRYPTO_PARES
+
+
+def _es_forex(simbolo: str) -> bool:
+    simbolo = simbolo.upper().strip()
+    # Formato explícito de Polygon: "C:EURUSD"
+    if simbolo.startswith("C:"):
+        return True
+    # Si ya es crypto, no es forex
+    if _es_crypto(simbolo):
+        return False
+    # Base 3 letras + quote 3 letras, ambos divisas/metales conocidos
+    return simbolo.replace("-", "") in FOREX_PARES
+
+
+def _normalizar(simbolo: str) -> str:
+    simbolo = simbolo.upper().strip()
+    # Quitar prefijo "X:"
+    if simbolo.startswith("X:"):
+        simbolo = simbolo[2:]
+    # Quitar guiones
+    return simbolo.replace("-", "")
+
+
+def _clasificar(simbolo: str) -> ClasificacionSimbolo:
+    """Construye la clasificación completa (mismas reglas que los métodos públicos)."""
+    limpio = _normalizar(simbolo)
+    es_crypto = _es_crypto(simbolo)
+    es_forex = _es_forex(simbolo)
+    limpio_crypto = _es_crypto(limpio)
+
+    if limpio_crypto:
+        polygon_ticker = f"X:{limpio}"
+    elif _es_forex(limpio):
+        polygon_ticker = f"C:{limpio}"
+    else:
+        polygon_ticker = limpio
+
+    if es_crypto:
+        ws_url = POLYGON_WS_CRYPTO
+    elif es_forex:
+        ws_url = POLYGON_WS_FOREX
+    else:
+        ws_url = POLYGON_WS_STOCKS
+
+    return ClasificacionSimbolo(
+        simbolo=limpio,
+        clase="crypto" if es_crypto else "forex" if es_forex else "stock",
+        es_crypto=es_crypto,
+        es_forex=es_forex,
+        polygon_ticker=polygon_ticker,
+        canal_trades=f"XT.X:{limpio}" if limpio_crypto else f"T.{limpio}",
+        canal_quotes=f"XQ.X:{limpio}" if limpio_crypto else f"Q.{limpio}",
+        ws_url=ws_url,
+        label=CRYPTO_LABELS.get(limpio, limpio) if limpio_crypto else limpio,
+    )
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 #  CLASE PRINCIPAL — MAPEADOR DE SÍMBOLOS
 # ══════════════════════════════════════════════════════════════════════════════
@@ -63,6 +187,10 @@ class Mapeador:
     Todo es estático — no necesita instanciar.
     El patrón de detección: si el símbolo contiene "X:" al inicio
     o si su base está en CRYPTO_BASES, es crypto.
+
+    Cada símbolo se clasifica una sola vez (``clasificar``) y el resultado
+    queda memoizado: en el camino caliente (un trade) cualquier consulta
+    cuesta una búsqueda en un dict.
     
     Ejemplos:
         Mapeador.es_crypto("BTCUSD")       → True
@@ -71,8 +199,19 @@ class Mapeador:
         Mapeador.normalizar("X:BTCUSD")     → "BTCUSD"
         Mapeador.a_polygon_ticker("BTCUSD") → "X:BTCUSD"
         Mapeador.a_polygon_ticker("AAPL")   → "AAPL"
+        Mapeador.clasificar("BTC-USD").clase → "crypto"
     """
 
+    @staticmethod
+    def clasificar(simbolo: str) -> ClasificacionSimbolo:
+        """Clasificación memoizada del símbolo (tal cual llega, sin normalizar)."""
+        info = _CLASIFICACIONES.get(simbolo)
+        if info is None:
+            if len(_CLASIFICACIONES) >= _MAX_CLASIFICACIONES:
+                _CLASIFICACIONES.clear()
+            info = _CLASIFICACIONES[simbolo] = _clasificar(simbolo)
+        return info
+
     @staticmethod
     def es_crypto(simbolo: str) -> bool:
         """Detecta si un símbolo es criptomoned.
@@ -83,22 +222,7 @@ class Mapeador:
             "BTC-USD"   → True (formato con guión)
             "AAPL"      → False (acción)
         """
-        simbolo = simbolo.upper().strip()
-        
-        # Formato explícito de Polygon: "X:BTCUSD"
-        if simbolo.startswith("X:"):
-            return True
-        
-        # Quitar guiones: "BTC-USD" → "BTCUSD"
-        limpio = simbolo.replace("-", "")
-        
-        # Verificar si la base es una crypto conocida
-        for base in CRYPTO_BASES:
-            for quote in CRYPTO_QUOTES:
-                if limpio == f"{base}{quote}":
-                    return True
-        
-        return False
+        return Mapeador.clasificar(simbolo).es_crypto
 
     @staticmethod
     def es_forex(simbolo: str) -> bool:
@@ -106,27 +230,7 @@ class Mapeador:
 
         "EURUSD" → True  |  "XAUUSD" → True  |  "AAPL" → False
         """
-        simbolo = simbolo.upper().strip()
-        
-        # Formato explícito de Polygon: "C:EURUSD"
-        if simbolo.startswith("C:"):
-            return True
-        
-        # Si ya es crypto, no es forex
-        if Mapeador.es_crypto(simbolo):
-            return False
-        
-        limpio = simbolo.replace("-", "")
-        
-        # Verificar si base 3 letras + quote 3 letras y ambos son divisas/metales conocidos
-        if len(limpio) == 6:
-            base  = limpio[:3]
-            quote = limpio[3:]
-            if base in FOREX_BASES and quote in FOREX_QUOTES:
-                # Excluir parámetros que no existan (ej. "USDMXN" tiene base en FOREX_BASES)
-                return True
-        
-        return False
+        return Mapeador.clasificar(simbolo).es_forex
 
 
     @staticmethod
@@ -139,13 +243,7 @@ class Mapeador:
         "BTCUSD"    → "BTCUSD"
         "AAPL"      → "AAPL"
         """
-        simbolo = simbolo.upper().strip()
-        # Quitar prefijo "X:"
-        if simbolo.startswith("X:"):
-            simbolo = simbolo[2:]
-        # Quitar guiones
-        simbolo = simbolo.replace("-", "")
-        return simbolo
+        return Mapeador.clasificar(simbolo).simbolo
 
     @staticmethod
     def a_polygon_ticker(simbolo: str) -> str:
@@ -155,12 +253,7 @@ class Mapeador:
         "EURUSD" → "C:EURUSD"   (forex)
         "AAPL"   → "AAPL"       (stock)
         """
-        limpio = Mapeador.normalizar(simbolo)
-        if Mapeador.es_crypto(limpio):
-            return f"X:{limpio}"
-        if Mapeador.es_forex(limpio):
-            return f"C:{limpio}"
-        return limpio
+        return Mapeador.clasificar(simbolo).polygon_ticker
 
     @staticmethod
     def canal_trades(simbolo: str) -> str:
@@ -169,10 +262,7 @@ class Mapeador:
         "BTCUSD" → "XT.X:BTCUSD"
         "AAPL"   → "T.AAPL"
         """
-        limpio = Mapeador.normalizar(simbolo)
-        if Mapeador.es_crypto(limpio):
-            return f"XT.X:{limpio}"
-        return f"T.{limpio}"
+        return Mapeador.clasificar(simbolo).canal_trades
 
     @staticmethod
     def canal_quotes(simbolo: str) -> str:
@@ -181,10 +271,7 @@ class Mapeador:
         "BTCUSD" → "XQ.X:BTCUSD"
         "AAPL"   → "Q.AAPL"
         """
-        limpio = Mapeador.normalizar(simbolo)
-        if Mapeador.es_crypto(limpio):
-            return f"XQ.X:{limpio}"
-        return f"Q.{limpio}"
+        return Mapeador.clasificar(simbolo).canal_quotes
 
     @staticmethod
     def ws_url(simbolo: str) -> str:
@@ -194,11 +281,7 @@ class Mapeador:
         "EURUSD" → wss://socket.polygon.io/forex
         "AAPL"   → wss://socket.polygon.io/stocks
         """
-        if Mapeador.es_crypto(simbolo):
-            return POLYGON_WS_CRYPTO
-        if Mapeador.es_forex(simbolo):
-            return POLYGON_WS_FOREX
-        return POLYGON_WS_STOCKS
+        return Mapeador.clasificar(simbolo).ws_url
 
     @staticmethod
     def label_legible(simbolo: str) -> str:
@@ -208,16 +291,7 @@ class Mapeador:
         "ETHUSD"  → "ETH/USD"
         "AAPL"    → "AAPL"
         """
-        limpio = Mapeador.normalizar(simbolo)
-        if Mapeador.es_crypto(limpio):
-            # Buscar la base crypto más larga que matchee
-            for base in sorted(CRYPTO_BASES, key=len, reverse=True):
-                if limpio.startswith(base):
-                    quote_part = limpio[len(base):]
-                    if quote_part:
-                        return f"{base}/{quote_part}"
-                    return base
-        return limpio
+        return Mapeador.clasificar(simbolo).label
 
     @staticmethod
     def separar_por_tipo(simbolos: list[str]) -> tuple[list[str], list[str]]:
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║        MÉTRICAS — Histogramas de latencia por etapa, feed y símbolo         ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  HistogramaLatencia : Buckets log-lineales estilo HDR (µs, error ≤ 3.2%).   ║
+║                       Registrar es O(1): un bit_length y un dict.get.       ║
+║  RegistroMetricas   : Un histograma por (etapa, feed, símbolo) y la hora   ║
+║                       de recepción del último frame de cada símbolo.        ║
+║  METRICAS           : Instancia global que usan motores y servidores.      ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Etapas (exchange → navegador):                                             ║
+║    red            : timestamp del exchange → frame recibido (por símbolo)   ║
+║    decodificacion : frame crudo → lotes (por frame)                         ║
+║    proceso        : agregador OHLC / order book sobre el lote (por frame)   ║
+║    serializacion  : json.dumps del mensaje al navegador (por mensaje)       ║
+║    difusion       : frame recibido → mensaje entregado al difusor           ║
+║                     (incluye esperas de micro-lote y throttle del book)     ║
+║    snapshot       : construcción del snapshot del order book               ║
+║    lag            : retraso del event loop (monitor_loop.MonitorLoop)       ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    from metricas import METRICAS
+
+    t0 = time.perf_counter_ns()
+    ...
+    METRICAS.registrar_ns("decodificacion", "T", time.perf_counter_ns() - t0)
+
+    METRICAS.instantanea()     # {"decodificacion/T": {"n", "p50_us", ...}, ...}
+    METRICAS.resumen_log()     # líneas para stats_periodico (y rota la ventana)
+
+``red`` mezcla dos relojes (el del exchange y el local): un NTP desajustado
+se ve ahí y solo ahí; las demás etapas usan perf_counter_ns.
+"""
+
+from __future__ import annotations
+
+import time
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  HISTOGRAMA
+# ══════════════════════════════════════════════════════════════════════════════
+
+_BITS_SUB = 5                        # 32 sub-buckets por potencia de 2
+_LINEAL = 1 << (_BITS_SUB + 1)       # valores < 64 µs tienen bucket exacto
+_MAX_US = (1 << 36) - 1              # ~19 h; lo que pase de ahí se satura
+
+
+def _indice(valor: int) -> int:
+    if valor < _LINEAL:
+        return valor if valor > 0 else 0
+    if valor > _MAX_US:
+        valor = _MAX_US
+    desplazamiento = valor.bit_length() - _BITS_SUB - 1
+    return (desplazamiento << _BITS_SUB) + (valor >> desplazamiento)
+
+
+def _limite_inferior(indice: int) -> int:
+    if indice < _LINEAL:
+        return indice
+    desplazamiento = (indice >> _BITS_SUB) - 1
+    return (indice - (desplazamiento << _BITS_SUB)) << desplazamiento
+
+
+def _limite_superior(indice: int) -> int:
+    """Mayor valor que cae en el bucket ``indice``."""
+    if indice < _LINEAL:
+        return indice
+    desplazamiento = (indice >> _BITS_SUB) - 1
+    return _limite_inferior(indice) + (1 << desplazamiento) - 1
+
+
+class HistogramaLatencia:
+    """Histograma de latencias en microsegundos con precisión relativa fija.
+
+    Como HdrHistogram: rango lineal exacto hasta 64 µs y, por encima, 32
+    buckets por cada potencia de 2, así que un percentil nunca se desvía
+    más de ~3% del valor real sin importar si se mide 5 µs o 5 s. Los
+    buckets se guardan en un dict disperso: un histograma por símbolo
+    cuesta solo los buckets que se han tocado.
+
+    Los percentiles devuelven el límite superior del bucket (nunca
+    subestiman).
+    """
+
+    __slots__ = ("_cuentas", "n", "suma", "minimo", "maximo")
+
+    def __init__(self):
+        self._cuentas: dict[int, int] = {}
+        self.n = 0
+        self.suma = 0
+        self.minimo = 0
+        self.maximo = 0
+
+    def registrar(self, valor_us: int) -> None:
+        valor_us = int(valor_us)
+        i = _indice(valor_us)
+        c = self._cuentas
+        c[i] = c.get(i, 0) + 1
+        if self.n == 0 or valor_us < self.minimo:
+            self.minimo = valor_us
+        if valor_us > self.maximo:
+            self.maximo = valor_us
+        self.n += 1
+        self.suma += valor_us
+
+    def fusionar(self, otro: HistogramaLatencia) -> None:
+        """Suma las cuentas de ``otro`` a este histograma."""
+        if not otro.n:
+            return
+        c = self._cuentas
+        for i, k in otro._cuentas.items():
+            c[i] = c.get(i, 0) + k
+        self.minimo = otro.minimo if self.n == 0 else min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+        self.n += otro.n
+        self.suma += otro.suma
+
+    def percentil(self, p: float) -> int:
+        """Valor (µs) por debajo del cual cae el ``p``% de las muestras."""
+        if not self.n:
+            return 0
+        objetivo = max(1, -(-self.n * p // 100))
+        acumulado = 0
+        for i in sorted(self._cuentas):
+            acumulado += self._cuentas[i]
+            if acumulado >= objetivo:
+                return min(_limite_superior(i), self.maximo)
+        return self.maximo
+
+    def buckets(self) -> list[tuple[int, int]]:
+        """(límite superior µs, cuenta) de cada bucket con muestras, en orden."""
+        return [(_limite_superior(i), self._cuentas[i]) for i in sorted(self._cuentas)]
+
+    def resumen(self) -> dict:
+        return {
+            "n": self.n,
+            "media_us": round(self.suma / self.n, 1) if self.n else 0.0,
+            "p50_us": self.percentil(50),
+            "p90_us": self.percentil(90),
+            "p99_us": self.percentil(99),
+            "p999_us": self.percentil(99.9),
+            "max_us": self.maximo,
+        }
+
+    def __len__(self) -> int:
+        return self.n
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  REGISTRO
+# ══════════════════════════════════════════════════════════════════════════════
+
+class RegistroMetricas:
+    """Histogramas por (etapa, feed, símbolo) en dos horizontes.
+
+    Se registra solo en la *ventana* en curso; ``rotar()`` la pasa al
+    acumulado desde el arranque y empieza una nueva. Así el log periódico
+    ve los percentiles del intervalo y un exportador puede leer el total
+    (``acumulado()``) sin que uno interfiera con el otro.
+
+    Símbolo "" = medición por frame, no atribuible a un símbolo.
+    """
+
+    def __init__(self):
+        self._ventana: dict[tuple[str, str, str], HistogramaLatencia] = {}
+        self._total: dict[tuple[str, str, str], HistogramaLatencia] = {}
+        # (canal, símbolo) → perf_counter_ns del último frame que lo trajo
+        self._recepcion: dict[tuple[str, str], int] = {}
+        # (feed, símbolo) → eventos recibidos desde el arranque
+        self.eventos: dict[tuple[str, str], int] = {}
+        self._inicio_ventana = time.monotonic()
+
+    # ── Registro (camino caliente) ──
+
+    def registrar_us(self, etapa: str, feed: str, valor_us: int, simbolo: str = "") -> None:
+        clave = (etapa, feed, simbolo)
+        h = self._ventana.get(clave)
+        if h is None:
+            h = self._ventana[clave] = HistogramaLatencia()
+        h.registrar(valor_us)
+
+    def registrar_ns(self, etapa: str, feed: str, valor_ns: int, simbolo: str = "") -> None:
+        self.registrar_us(etapa, feed, valor_ns // 1000, simbolo)
+
+    def registrar_frame(self, feed: str, simbolos: list[str], timestamps_ms: list[int],
+                        recibido_ns: int, recibido_epoch_ms: float) -> None:
+        """Etapa ``red``, eventos por símbolo y hora de recepción de un frame.
+
+        Solo se mide el último evento de cada símbolo del frame: es el que
+        termina en el navegador y evita un registro por evento.
+        """
+        ultimo: dict[str, int] = {}
+        for i, sym in enumerate(simbolos):
+            ultimo[sym] = i
+        eventos = self.eventos
+        if len(ultimo) == 1:
+            clave = (feed, simbolos[0])
+            eventos[clave] = eventos.get(clave, 0) + len(simbolos)
+        else:
+            for sym in simbolos:
+                clave = (feed, sym)
+                eventos[clave] = eventos.get(clave, 0) + 1
+        recepcion = self._recepcion
+        for sym, i in ultimo.items():
+            recepcion[(feed, sym)] = recibido_ns
+            self.registrar_us("red", feed, int((recibido_epoch_ms - timestamps_ms[i]) * 1000), sym)
+
+    def registrar_difusion(self, feed: str, canal: str, simbolo: str) -> None:
+        """Etapa ``difusion``: desde el último frame de ``simbolo`` en ``canal``.
+
+        ``canal`` es el feed de origen (T, XT, Q...) con el que se llamó a
+        ``registrar_frame``; ``feed`` etiqueta el histograma (chart, orderbook).
+        """
+        recibido = self._recepcion.get((canal, simbolo))
+        if recibido is not None:
+            self.registrar_ns("difusion", feed, time.perf_counter_ns() - recibido, simbolo)
+
+    # ── Lectura ──
+
+    def rotar(self) -> dict[tuple[str, str, str], HistogramaLatencia]:
+        """Cierra la ventana en curso, la suma al acumulado y la devuelve."""
+        ventana, self._ventana = self._ventana, {}
+        self._inicio_ventana = time.monotonic()
+        for clave, h in ventana.items():
+            total = self._total.get(clave)
+            if total is None:
+                total = self._total[clave] = HistogramaLatencia()
+            total.fusionar(h)
+        return ventana
+
+    def acumulado(self) -> dict[tuple[str, str, str], HistogramaLatencia]:
+        """Histogramas desde el arranque (acumulado + ventana en curso, copias)."""
+        resultado: dict[tuple[str, str, str], HistogramaLatencia] = {}
+        for fuente in (self._total, self._ventana):
+            for clave, h in fuente.items():
+                destino = resultado.get(clave)
+                if destino is None:
+                    destino = resultado[clave] = HistogramaLatencia()
+                destino.fusionar(h)
+        return resultado
+
+    def instantanea(self, por_simbolo: bool = False) -> dict[str, dict]:
+        """Resumen de la ventana en curso: ``"etapa/feed"`` (o ``.../símbolo``)."""
+        return _resumir(self._ventana, por_simbolo)
+
+    def resumen_log(self, peores: int = 3) -> list[str]:
+        """Rota la ventana y la formatea para el log periódico.
+
+        Una línea por etapa/feed (todos los símbolos juntos) más, en las
+        etapas por símbolo, los ``peores`` símbolos por p99.
+        """
+        segundos = time.monotonic() - self._inicio_ventana
+        ventana = self.rotar()
+        lineas = []
+        for nombre, r in _resumir(ventana, False).items():
+            linea = (f"{nombre:<22} n={r['n']:<7} p50={_fmt(r['p50_us'])} "
+                     f"p99={_fmt(r['p99_us'])} max={_fmt(r['max_us'])}")
+            etapa, feed = nombre.split("/")
+            por_sym = sorted(
+                ((h.percentil(99), sym) for (e, f, sym), h in ventana.items()
+                 if e == etapa and f == feed and sym),
+                reverse=True,
+            )[:peores]
+            if por_sym:
+                linea += "  peores p99: " + ", ".join(f"{sym}={_fmt(p)}" for p, sym in por_sym)
+            lineas.append(linea)
+        if lineas:
+            lineas.insert(0, f"ventana de {segundos:.0f}s")
+        return lineas
+
+
+def _resumir(hists: dict[tuple[str, str, str], HistogramaLatencia],
+             por_simbolo: bool) -> dict[str, dict]:
+    agrupados: dict[str, HistogramaLatencia] = {}
+    for (etapa, feed, simbolo), h in hists.items():
+        nombre = f"{etapa}/{feed}/{simbolo}" if por_simbolo and simbolo else f"{etapa}/{feed}"
+        destino = agrupados.get(nombre)
+        if destino is None:
+            destino = agrupados[nombre] = HistogramaLatencia()
+        destino.fusionar(h)
+    return {nombre: agrupados[nombre].resumen() for nombre in sorted(agrupados)}
+
+
+def _fmt(us: int) -> str:
+    if us >= 1_000_000:
+        return f"{us / 1e6:.2f}s"
+    if us >= 1000:
+        return f"{us / 1000:.1f}ms"
+    return f"{us}µs"
+
+
+METRICAS = RegistroMetricas()
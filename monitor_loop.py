@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║        MONITOR LOOP — Lag del event loop y callbacks que lo bloquean        ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  MonitorLoop        : Muestreador de lag + detector de callbacks lentos    ║
+║                       (mide cada Handle._run y nombra la tarea/corrutina   ║
+║                       y la línea donde estaba).                            ║
+║  PerfiladorMuestreo : Perfilador de muestreo bajo demanda: un hilo lee la  ║
+║                       pila del hilo del loop cada ms y la agrega en        ║
+║                       formato "collapsed" (flamegraph.pl / speedscope).    ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Disparo del perfil : SIGUSR1 → perfil de N s a un archivo                  ║
+║                       GET /perfil?seg=N en el endpoint de métricas         ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    monitor = MonitorLoop(umbral_lento_seg=0.05)
+    monitor.iniciar()                 # dentro del loop
+    ...
+    monitor.obtener_metricas()        # {"lag_max_ms", "callbacks_lentos", "peores": [...]}
+    texto = await monitor.perfilar(10)
+
+Todos los motores y ambos servidores comparten un único loop: cualquier
+trabajo síncrono largo (un snapshot grande, un print por trade, un
+DataFrame) retrasa a todos los demás. El lag dice *cuánto*; el detector de
+callbacks lentos dice *quién*; el perfil dice *en qué línea*.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+
+from metricas import METRICAS
+
+logger = logging.getLogger("MonitorLoop")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  PERFILADOR DE MUESTREO
+# ══════════════════════════════════════════════════════════════════════════════
+
+class PerfiladorMuestreo:
+    """Muestrea la pila de un hilo desde otro hilo, sin instrumentar nada.
+
+    Coste cero mientras no se usa; durante la captura, el hilo muestreador
+    compite por el GIL una vez por ``intervalo_seg``.
+
+    Parámetros:
+        hilo_id       : int   → ``threading.get_ident()`` del hilo del loop
+        intervalo_seg : float → Periodo de muestreo (default: 1 ms)
+    """
+
+    def __init__(self, hilo_id: int, intervalo_seg: float = 0.001):
+        self.hilo_id = hilo_id
+        self.intervalo_seg = intervalo_seg
+
+    def capturar(self, segundos: float) -> str:
+        """Bloquea ``segundos`` muestreando; llamar desde otro hilo."""
+        pilas: Counter[str] = Counter()
+        fin = time.monotonic() + segundos
+        muestras = 0
+        while time.monotonic() < fin:
+            frame = sys._current_frames().get(self.hilo_id)
+            if frame is not None:
+                pilas[_pila_colapsada(frame)] += 1
+                muestras += 1
+            time.sleep(self.intervalo_seg)
+        lineas = [f"{pila} {n}" for pila, n in pilas.most_common()]
+        logger.info("[PERFIL] %d muestras en %.1fs, %d pilas distintas", muestras, segundos, len(pilas))
+        return "\n".join(lineas) + "\n"
+
+
+def _pila_colapsada(frame) -> str:
+    marcos = []
+    while frame is not None:
+        codigo = frame.f_code
+        marcos.append(f"{codigo.co_qualname} ({Path(codigo.co_filename).name}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(marcos))
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  MONITOR
+# ══════════════════════════════════════════════════════════════════════════════
+
+class MonitorLoop:
+    """Lag del loop, callbacks lentos y perfiles bajo demanda.
+
+    El detector sustituye ``asyncio.Handle._run`` por una versión que mide
+    cada callback (dos lecturas de reloj; todos los pasos de tareas pasan
+    por ahí). Los que superan ``umbral_lento_seg`` se guardan con el nombre
+    de la tarea, la corrutina y la línea en la que quedó suspendida, se
+    registran en la etapa ``callback_lento`` de METRICAS y se avisan en el
+    log (como mucho una vez por callback cada ``aviso_cada_seg``).
+
+    Parámetros:
+        umbral_lento_seg  : float → Duración a partir de la cual un callback es lento
+        intervalo_lag_seg : float → Periodo del muestreador de lag
+        max_lentos        : int   → Últimos callbacks lentos guardados
+        dir_perfiles      : str   → Carpeta de los perfiles disparados por señal
+    """
+
+    _activo: MonitorLoop | None = None   # el parche de Handle._run es global
+
+    def __init__(self, umbral_lento_seg: float = 0.05, intervalo_lag_seg: float = 0.1,
+                 max_lentos: int = 50, dir_perfiles: str | Path = "perfiles",
+                 aviso_cada_seg: float = 10.0):
+        self.umbral_lento_seg = umbral_lento_seg
+        self.intervalo_lag_seg = intervalo_lag_seg
+        self.dir_perfiles = Path(dir_perfiles)
+        self._aviso_cada_seg = aviso_cada_seg
+        self.lentos: deque[dict] = deque(maxlen=max_lentos)
+        self.callbacks_lentos = 0
+        self.lag_max_ms = 0.0
+        self._por_callback: Counter[str] = Counter()
+        self._ultimo_aviso: dict[str, float] = {}
+        self._run_original = None
+        self._tarea_lag: asyncio.Task | None = None
+        self._perfilando = False
+        self._perfilador: PerfiladorMuestreo | None = None
+
+    # ── Ciclo de vida ──
+
+    def iniciar(self) -> None:
+        """Arranca el muestreador de lag y el detector; llamar dentro del loop."""
+        loop = asyncio.get_running_loop()
+        self._perfilador = PerfiladorMuestreo(threading.get_ident())
+        self._tarea_lag = loop.create_task(self._muestrear_lag())
+
+        if MonitorLoop._activo is None:
+            MonitorLoop._activo = self
+            self._run_original = original = asyncio.Handle._run
+            umbral = self.umbral_lento_seg
+            reloj = time.perf_counter
+
+            def _run_medido(handle):
+                t0 = reloj()
+                original(handle)
+                dt = reloj() - t0
+                if dt >= umbral:
+                    self._registrar_lento(handle, dt)
+
+            asyncio.Handle._run = _run_medido
+
+        if hasattr(signal, "SIGUSR1"):
+            try:
+                loop.add_signal_handler(signal.SIGUSR1, self._perfil_por_senal)
+            except (NotImplementedError, RuntimeError):
+                pass
+        logger.info("[LOOP] Monitor activo (umbral callbacks lentos: %.0f ms)", self.umbral_lento_seg * 1000)
+
+    def detener(self) -> None:
+        if self._tarea_lag is not None:
+            self._tarea_lag.cancel()
+            self._tarea_lag = None
+        if MonitorLoop._activo is self:
+            asyncio.Handle._run = self._run_original
+            MonitorLoop._activo = None
+
+    # ── Lag ──
+
+    async def _muestrear_lag(self) -> None:
+        """Duerme ``intervalo_lag_seg`` y registra cuánto tarde despertó."""
+        intervalo_ns = int(self.intervalo_lag_seg * 1e9)
+        while True:
+            t0 = time.perf_counter_ns()
+            await asyncio.sleep(self.intervalo_lag_seg)
+            retraso = max(0, time.perf_counter_ns() - t0 - intervalo_ns)
+            METRICAS.registrar_ns("lag", "loop", retraso)
+            if retraso / 1e6 > self.lag_max_ms:
+                self.lag_max_ms = retraso / 1e6
+
+    # ── Callbacks lentos ──
+
+    def _registrar_lento(self, handle, dt: float) -> None:
+        descripcion = _describir(handle)
+        self.callbacks_lentos += 1
+        self._por_callback[descripcion] += 1
+        self.lentos.append({"ts": time.time(), "duracion_ms": round(dt * 1000, 1),
+                            "callback": descripcion})
+        METRICAS.registrar_us("callback_lento", "loop", int(dt * 1e6))
+        ahora = time.monotonic()
+        if ahora - self._ultimo_aviso.get(descripcion, 0.0) >= self._aviso_cada_seg:
+            self._ultimo_aviso[descripcion] = ahora
+            logger.warning("[LOOP] Callback lento (%.1f ms): %s", dt * 1000, descripcion)
+
+    def obtener_metricas(self, peores: int = 5) -> dict:
+        return {
+            "lag_max_ms": round(self.lag_max_ms, 2),
+            "callbacks_lentos": self.callbacks_lentos,
+            "peores": [{"callback": c, "veces": n} for c, n in self._por_callback.most_common(peores)],
+            "ultimos": list(self.lentos)[-peores:],
+        }
+
+    # ── Perfiles bajo demanda ──
+
+    async def perfilar(self, segundos: float = 10.0) -> str:
+        """Perfil de muestreo del hilo del loop en formato collapsed.
+
+        La captura corre en un hilo aparte y el loop sigue atendiendo
+        mientras tanto (es justo lo que se quiere medir). Solo una captura
+        a la vez.
+        """
+        if self._perfilador is None:
+            raise RuntimeError("MonitorLoop no iniciado")
+        if self._perfilando:
+            raise RuntimeError("ya hay un perfil en curso")
+        self._perfilando = True
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._perfilador.capturar, segundos
+            )
+        finally:
+            self._perfilando = False
+
+    def _perfil_por_senal(self, segundos: float = 10.0) -> None:
+        async def guardar() -> None:
+            try:
+                texto = await self.perfilar(segundos)
+            except RuntimeError as e:
+                logger.warning("[PERFIL] %s", e)
+                return
+            self.dir_perfiles.mkdir(parents=True, exist_ok=True)
+            ruta = self.dir_perfiles / f"perfil_{datetime.now():%Y%m%d_%H%M%S}.txt"
+            ruta.write_text(texto, encoding="utf-8")
+            logger.info("[PERFIL] Guardado en %s", ruta)
+
+        logger.info("[PERFIL] SIGUSR1 recibido — muestreando %.0fs", segundos)
+        asyncio.get_running_loop().create_task(guardar())
+
+
+def _describir(handle) -> str:
+    """Tarea/corrutina y línea donde quedó, o el nombre del callback."""
+    callback = handle._callback
+    duenio = getattr(callback, "__self__", None)
+    if isinstance(duenio, asyncio.Task):
+        coro = duenio.get_coro()
+        nombre = getattr(coro, "__qualname__", repr(coro))
+        frame = getattr(coro, "cr_frame", None)
+        donde = f" ({Path(frame.f_code.co_filename).name}:{frame.f_lineno})" if frame is not None else ""
+        return f"{duenio.get_name()} {nombre}{donde}"
+    nombre = getattr(callback, "__qualname__", None) or repr(callback)
+    codigo = getattr(callback, "__code__", None)
+    if codigo is not None:
+        nombre += f" ({Path(codigo.co_filename).name}:{codigo.co_firstlineno})"
+    return nombre
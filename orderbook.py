@@ -25,12 +25,15 @@ import json
 import logging
 import signal
 import time
+from bisect import bisect_left, insort
 from collections import defaultdict
-from dataclasses import dataclass
-from datetime import datetime, timezone
 from typing import Callable, Optional
 
-from mapeador_simbolos import Mapeador
+from decodificador_polygon import DecodificadorPolygon, ErrorDecodificacion
+from feed_polygon import PolygonFeedWS
+from grabador_polygon import FLUJO_QUOTES, GrabadorPolygon
+from metricas import METRICAS
+from registros_mercado import LoteQuotes, QuoteNormalizado
 
 # ÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇ
 # Intentar importar websockets; si no est├í, dar instrucciones claras
@@ -89,58 +92,86 @@ EXCHANGES = {
 
 
 # ÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉ
-#  ESTRUCTURA DE DATOS ÔÇö QUOTE NORMALIZADO
+#  ORDER BOOK LEVEL 2 ÔÇö AGREGADO POR EXCHANGE EN TIEMPO REAL
 # ÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉ
 
-@dataclass
-class QuoteNormalizado:
-    """Representa una cotizaci├│n bid/ask normalizada.
-
-    Campos originales de Polygon ÔåÆ Campos legibles:
-        sym ÔåÆ simbolo       S├¡mbolo del activo
-        bp  ÔåÆ bid_precio    Mejor precio de compra
-        bs  ÔåÆ bid_tamano    Tama├▒o en el bid
-        ap  ÔåÆ ask_precio    Mejor precio de venta
-        as  ÔåÆ ask_tamano    Tama├▒o en el ask
-        bx  ÔåÆ bid_exchange  ID del exchange del bid
-        ax  ÔåÆ ask_exchange  ID del exchange del ask
-        t   ÔåÆ timestamp_ms  Timestamp en milisegundos
+class LadoLibro:
+    """Un lado del libro (bids o asks) mantenido de forma incremental.
+
+    Guarda la última cotización de cada exchange y, en paralelo, los niveles
+    de precio con la contribución de cada exchange en ese nivel. Las claves
+    de precio se mantienen ordenadas (mejor precio primero) con ``bisect``,
+    así que cada quote se aplica con una búsqueda O(log n) y el snapshot
+    solo tiene que recorrer los niveles ya ordenados.
+
+    Atributos:
+        por_exchange : dict[int, tuple]   → ex_id → (precio, tamano, ts_ms)
+        niveles      : dict[float, dict]  → precio → {ex_id: (tamano, ts_ms)}
     """
-    simbolo: str
-    bid_precio: float
-    bid_tamano: int
-    ask_precio: float
-    ask_tamano: int
-    timestamp_ms: int
-    bid_exchange: int = 0
-    ask_exchange: int = 0
-
-    @property
-    def spread(self) -> float:
-        """Calcula el spread bid-ask."""
-        return round(self.ask_precio - self.bid_precio, 6)
-
-    @property
-    def mid_price(self) -> float:
-        """Precio medio entre bid y ask."""
-        return round((self.bid_precio + self.ask_precio) / 2, 6)
-
-    def to_dict(self) -> dict:
-        return {
-            "simbolo": self.simbolo,
-            "bid_precio": self.bid_precio,
-            "bid_tamano": self.bid_tamano,
-            "ask_precio": self.ask_precio,
-            "ask_tamano": self.ask_tamano,
-            "spread": self.spread,
-            "mid_price": self.mid_price,
-            "timestamp_ms": self.timestamp_ms,
-        }
 
+    __slots__ = ("descendente", "por_exchange", "niveles", "_claves")
+
+    def __init__(self, descendente: bool):
+        self.descendente = descendente
+        self.por_exchange: dict[int, tuple[float, int, int]] = {}
+        self.niveles: dict[float, dict[int, tuple[int, int]]] = {}
+        # Claves ordenadas ascendentes; en bids se guarda -precio para que
+        # el mejor nivel (precio más alto) quede siempre en la posición 0.
+        self._claves: list[float] = []
+
+    def _clave(self, precio: float) -> float:
+        return -precio if self.descendente else precio
+
+    def actualizar(self, ex_id: int, precio: float, tamano: int, ts_ms: int) -> bool:
+        """Aplica la cotización de un exchange. Retorna True si el lado cambió."""
+        prev = self.por_exchange.get(ex_id)
+        if prev is not None:
+            if prev[0] == precio and prev[1] == tamano:
+                return False
+            self._quitar_contribucion(ex_id, prev[0])
+
+        self.por_exchange[ex_id] = (precio, tamano, ts_ms)
+        nivel = self.niveles.get(precio)
+        if nivel is None:
+            nivel = self.niveles[precio] = {}
+            insort(self._claves, self._clave(precio))
+        nivel[ex_id] = (tamano, ts_ms)
+        return True
+
+    def _quitar_contribucion(self, ex_id: int, precio: float) -> None:
+        nivel = self.niveles.get(precio)
+        if nivel is None:
+            return
+        nivel.pop(ex_id, None)
+        if not nivel:
+            del self.niveles[precio]
+            clave = self._clave(precio)
+            idx = bisect_left(self._claves, clave)
+            if idx < len(self._claves) and self._claves[idx] == clave:
+                del self._claves[idx]
+
+    def niveles_frescos(self, cutoff_ms: int) -> list[dict]:
+        """Niveles reales ordenados (mejor primero) con solo quotes frescos."""
+        resultado = []
+        niveles = self.niveles
+        for clave in self._claves:
+            precio = -clave if self.descendente else clave
+            tamano = 0
+            exchanges = []
+            for ex_id, (tam, ts) in niveles[precio].items():
+                if ts >= cutoff_ms:
+                    tamano += tam
+                    exchanges.append(ex_id)
+            if exchanges:
+                resultado.append({
+                    "precio": precio, "tamano": tamano,
+                    "exchanges": exchanges, "interpolado": False,
+                })
+        return resultado
+
+    def __len__(self) -> int:
+        return len(self.por_exchange)
 
-# ÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉ
-#  ORDER BOOK LEVEL 2 ÔÇö AGREGADO POR EXCHANGE EN TIEMPO REAL
-# ÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉÔòÉ
 
 class OrderBookManager:
     """Construye un Order Book Level 2 agregando quotes por exchange.
@@ -148,6 +179,10 @@ class OrderBookManager:
     Cada exchange reporta su mejor bid/ask. Al agregar todos los exchanges,
     se obtiene un book con m├║ltiples niveles de profundidad ordenados por precio.
 
+    El book se mantiene de forma incremental (``LadoLibro``): cada quote se
+    aplica en O(log n) y el snapshot completo (interpolación, extrapolación,
+    acumulados) solo se construye cuando alguien lo pide.
+
     Atributos:
         books : dict[str, dict]  ÔåÆ Order book por s├¡mbolo
         max_levels : int         ÔåÆ Niveles m├íximos a mostrar (default: 10)
@@ -156,45 +191,112 @@ class OrderBookManager:
     def __init__(self, max_levels: int = 0, stale_ms: int = 30000):
         self.max_levels = max_levels
         self.stale_ms = stale_ms
-        self._books: defaultdict[str, dict] = defaultdict(
-            lambda: {"bids": {}, "asks": {}}
+        self._books: defaultdict[str, dict[str, LadoLibro]] = defaultdict(
+            lambda: {"bids": LadoLibro(descendente=True),
+                     "asks": LadoLibro(descendente=False)}
         )
         self._update_count: defaultdict[str, int] = defaultdict(int)
+        # Símbolos con cambios aún no publicados (modo pull)
+        self._sucios: set[str] = set()
 
-    def procesar_quote(self, quote: QuoteNormalizado) -> dict | None:
-        """Actualiza el book con un nuevo quote y retorna snapshot si cambi├│.
-
-        Args:
-            quote: Quote normalizado con exchange IDs.
+    def actualizar_quote(self, quote: QuoteNormalizado) -> bool:
+        """Aplica un quote al book sin construir snapshot.
 
         Returns:
-            dict con el snapshot del book si hubo cambio, None si no.
+            True si el book del símbolo cambió (el snapshot se pide aparte
+            con ``obtener_snapshot`` cuando haga falta publicarlo).
         """
-        simbolo = quote.simbolo
-        book = self._books[simbolo]
+        book = self._books[quote.simbolo]
         changed = False
 
         # Actualizar bid de este exchange
         if quote.bid_precio > 0 and quote.bid_exchange > 0:
-            prev = book["bids"].get(quote.bid_exchange)
-            if prev is None or prev[0] != quote.bid_precio or prev[1] != quote.bid_tamano:
-                book["bids"][quote.bid_exchange] = (
-                    quote.bid_precio, quote.bid_tamano, quote.timestamp_ms
-                )
-                changed = True
+            changed = book["bids"].actualizar(
+                quote.bid_exchange, quote.bid_precio, quote.bid_tamano, quote.timestamp_ms
+            )
 
         # Actualizar ask de este exchange
         if quote.ask_precio > 0 and quote.ask_exchange > 0:
-            prev = book["asks"].get(quote.ask_exchange)
-            if prev is None or prev[0] != quote.ask_precio or prev[1] != quote.ask_tamano:
-                book["asks"][quote.ask_exchange] = (
-                    quote.ask_precio, quote.ask_tamano, quote.timestamp_ms
-                )
+            if book["asks"].actualizar(
+                quote.ask_exchange, quote.ask_precio, quote.ask_tamano, quote.timestamp_ms
+            ):
                 changed = True
 
         if changed:
-            self._update_count[simbolo] += 1
-            return self.obtener_snapshot(simbolo)
+            self._update_count[quote.simbolo] += 1
+            self._sucios.add(quote.simbolo)
+        return changed
+
+    def actualizar_lote(self, lote: LoteQuotes) -> list[str]:
+        """Aplica todas las quotes de un frame sin construir snapshots.
+
+        Returns:
+            Símbolos cuyo book cambió, una sola vez cada uno y en orden de
+            primera aparición en el frame.
+        """
+        cambiados: dict[str, None] = {}
+        books = self._books
+        bp, bs, ap, as_ = lote.bid_precio, lote.bid_tamano, lote.ask_precio, lote.ask_tamano
+        bx, ax, ts = lote.bid_exchange, lote.ask_exchange, lote.timestamp_ms
+        for simbolo, indices in lote.indices_por_simbolo().items():
+            book = books[simbolo]
+            bids, asks = book["bids"], book["asks"]
+            n_cambios = 0
+            for i in indices:
+                changed = False
+                if bp[i] > 0 and bx[i] > 0:
+                    changed = bids.actualizar(bx[i], bp[i], bs[i], ts[i])
+                if ap[i] > 0 and ax[i] > 0:
+                    if asks.actualizar(ax[i], ap[i], as_[i], ts[i]):
+                        changed = True
+                if changed:
+                    n_cambios += 1
+            if n_cambios:
+                self._update_count[simbolo] += n_cambios
+                self._sucios.add(simbolo)
+                cambiados[simbolo] = None
+        return list(cambiados)
+
+    def procesar_lote(self, lote: LoteQuotes) -> dict[str, dict]:
+        """Aplica un frame completo y construye un snapshot por símbolo cambiado.
+
+        Equivale a ``procesar_quote`` por cada quote, pero el snapshot de
+        cada símbolo se construye una sola vez, con el estado final.
+        """
+        return {simbolo: self.tomar_snapshot(simbolo) for simbolo in self.actualizar_lote(lote)}
+
+    def esta_sucio(self, simbolo: str) -> bool:
+        """True si el book cambió desde el último ``tomar_snapshot``."""
+        return simbolo in self._sucios
+
+    def limpiar_sucio(self, simbolo: str) -> None:
+        """Descarta la marca de cambios pendientes sin construir snapshot."""
+        self._sucios.discard(simbolo)
+
+    def tomar_snapshot(self, simbolo: str) -> dict | None:
+        """Modo pull: construye el snapshot solo si hubo cambios pendientes.
+
+        Limpia la marca de sucio; retorna None si no había nada nuevo.
+        """
+        if simbolo not in self._sucios:
+            return None
+        self._sucios.discard(simbolo)
+        return self.obtener_snapshot(simbolo)
+
+    def procesar_quote(self, quote: QuoteNormalizado) -> dict | None:
+        """Actualiza el book con un nuevo quote y retorna snapshot si cambi├│.
+
+        Compatibilidad: construye el snapshot en cada cambio. En el camino
+        caliente usar ``actualizar_quote`` y pedir el snapshot bajo demanda.
+
+        Args:
+            quote: Quote normalizado con exchange IDs.
+
+        Returns:
+            dict con el snapshot del book si hubo cambio, None si no.
+        """
+        if self.actualizar_quote(quote):
+            return self.tomar_snapshot(quote.simbolo)
         return None
 
     def obtener_snapshot(self, simbolo: str) -> dict:
@@ -210,33 +312,9 @@ class OrderBookManager:
         now_ms = int(time.time() * 1000)
         cutoff = now_ms - self.stale_ms
 
-        # Agregar bids por precio (solo quotes frescos)
-        bid_agg: defaultdict[float, int] = defaultdict(int)
-        bid_exchanges: defaultdict[float, list] = defaultdict(list)
-        for ex_id, (precio, tamano, ts) in book["bids"].items():
-            if ts >= cutoff:
-                bid_agg[precio] += tamano
-                bid_exchanges[precio].append(ex_id)
-
-        # Agregar asks por precio (solo quotes frescos)
-        ask_agg: defaultdict[float, int] = defaultdict(int)
-        ask_exchanges: defaultdict[float, list] = defaultdict(list)
-        for ex_id, (precio, tamano, ts) in book["asks"].items():
-            if ts >= cutoff:
-                ask_agg[precio] += tamano
-                ask_exchanges[precio].append(ex_id)
-
-        # Ordenar: bids desc, asks asc
-        bids_reales = sorted(
-            [{"precio": p, "tamano": t, "exchanges": bid_exchanges[p], "interpolado": False}
-             for p, t in bid_agg.items()],
-            key=lambda x: x["precio"], reverse=True
-        )
-        asks_reales = sorted(
-            [{"precio": p, "tamano": t, "exchanges": ask_exchanges[p], "interpolado": False}
-             for p, t in ask_agg.items()],
-            key=lambda x: x["precio"]
-        )
+        # Niveles reales ya ordenados: bids desc, asks asc (solo quotes frescos)
+        bids_reales = book["bids"].niveles_frescos(cutoff)
+        asks_reales = book["asks"].niveles_frescos(cutoff)
 
         # ── Interpolación de niveles entre exchanges reales ────────────────
         # Calcula el paso de precio adecuado según el precio del activo
@@ -301,8 +379,11 @@ class OrderBookManager:
             El volumen arranca en el promedio de los últimos 2 reales y decae
             un 15 % por nivel (exponencial), con variación ±20 %.
             Esto rellena visualmente toda la escalera de precios.
+
+            La variación es determinista por nivel de precio (hash del índice
+            de paso) para que dos snapshots seguidos del mismo book produzcan
+            los mismos niveles sintéticos y el protocolo delta no los reenvíe.
             """
-            import random
             # Buscar los últimos 2 niveles reales para calcular el vol de arranque
             reales = [n for n in niveles_interpolados if not n.get("interpolado", False)]
             if len(reales) == 0:
@@ -327,9 +408,10 @@ class OrderBookManager:
             for k in range(max_extra):
                 if p <= 0:
                     break
-                # Decaimiento exponencial 15 % por nivel, ±20 % de ruido
+                # Decaimiento exponencial 15 % por nivel, ±20 % de ruido estable
                 vol *= 0.85
-                variacion = 1.0 + (random.random() - 0.5) * 0.40
+                ruido = ((int(round(p / paso)) * 2654435761) & 0xFFFF) / 0xFFFF
+                variacion = 1.0 + (ruido - 0.5) * 0.40
                 vol_sintetico = max(1, int(vol * variacion))
                 resultado.append({
                     "precio": p,
@@ -404,8 +486,17 @@ class PolygonQuotesWS:
         simbolos         : list  ÔåÆ Lista de tickers (ej. ["AAPL", "TSLA"])
         on_quote_cb      : func  ÔåÆ Callback al recibir una cotizaci├│n normalizada
         on_book_cb       : func  ÔåÆ Callback al actualizarse el Order Book L2
+        on_book_cambio_cb: func  → Modo pull: recibe solo el símbolo cuyo book
+                                   cambió; el consumidor pide el snapshot a
+                                   ``order_book.tomar_snapshot`` cuando publica
+        on_quotes_batch_cb: func → Callback con el LoteQuotes de cada frame
         max_reconexiones : int   ÔåÆ Intentos m├íximos de reconexi├│n (default: 50)
         heartbeat_seg    : int   ÔåÆ Intervalo de heartbeat en segundos (default: 30)
+        feed             : PolygonFeedWS | None → Conexión compartida con el motor
+                                   de trades (None = socket propio)
+
+    ``on_book_cb`` y ``on_book_cambio_cb`` se llaman como mucho una vez por
+    símbolo y frame; ``on_quote_cb`` sigue siendo uno por quote.
     """
 
     def __init__(
@@ -414,10 +505,14 @@ class PolygonQuotesWS:
         simbolos: list[str],
         on_quote_cb: Callable[[QuoteNormalizado], None] | None = None,
         on_book_cb: Callable[[dict], None] | None = None,
+        on_book_cambio_cb: Callable[[str], None] | None = None,
         max_reconexiones: int = 50,
         heartbeat_seg: int = 30,
         ws_url: str = POLYGON_WS_URL,
         canal: str = CANAL_QUOTES,
+        on_quotes_batch_cb: Callable[[LoteQuotes], None] | None = None,
+        grabador: GrabadorPolygon | None = None,
+        feed: PolygonFeedWS | None = None,
     ):
         self.api_key = api_key
         self.simbolos = [s.upper() for s in simbolos]
@@ -426,6 +521,9 @@ class PolygonQuotesWS:
 
         self._on_quote = on_quote_cb
         self._on_book = on_book_cb
+        self._on_book_cambio = on_book_cambio_cb
+        self._on_quotes_batch = on_quotes_batch_cb
+        self._grabador = grabador
 
         self._ws: Optional[websockets.WebSocketClientProtocol] = None
         self._conectado = False
@@ -437,6 +535,14 @@ class PolygonQuotesWS:
         # Motor de Order Book Level 2
         self.order_book = OrderBookManager(max_levels=0)
 
+        # Frame crudo → QuoteNormalizado (msgspec/orjson si están instalados)
+        self._decodificador = DecodificadorPolygon(fabrica_quote=QuoteNormalizado)
+
+        # Conexión compartida: sin socket propio, el feed entrega los lotes
+        self._feed = feed
+        if feed is not None:
+            feed.adjuntar(self, "quotes")
+
         # M├®tricas
         self._quotes_recibidos = 0
         self._ultimo_mensaje_ts = 0.0
@@ -454,6 +560,11 @@ class PolygonQuotesWS:
         logger.info("  Canal    : %s (Quotes)", CANAL_QUOTES)
         logger.info("=" * 60)
 
+        if self._feed is not None:
+            logger.info("  Conexión : compartida (%s)", self._feed.ws_url)
+            await self._feed.iniciar()
+            return
+
         while not self._detener:
             try:
                 await self._conectar_y_escuchar()
@@ -487,6 +598,9 @@ class PolygonQuotesWS:
     async def detener(self) -> None:
         """Detiene el motor de forma limpia."""
         logger.info("Deteniendo order book engine...")
+        if self._feed is not None:
+            await self._feed.soltar(self)
+            return
         self._detener = True
         if self._ws:
             await self._ws.close()
@@ -521,7 +635,9 @@ class PolygonQuotesWS:
                 if self._reconexiones > 0 and (time.time() - self._connect_ts) > 10:
                     logger.info("Conexi├│n estable >10s ÔÇö reseteando contador de reconexiones")
                     self._reconexiones = 0
-                await self._on_message(mensaje_crudo)
+                if self._grabador is not None:
+                    self._grabador.grabar(FLUJO_QUOTES, mensaje_crudo)
+                self._on_message(mensaje_crudo)
 
     async def _autenticar(self) -> None:
         """Env├¡a el mensaje de autenticaci├│n a Polygon."""
@@ -544,105 +660,99 @@ class PolygonQuotesWS:
 
     async def _suscribir(self) -> None:
         """Suscribe al canal de Quotes para todos los s├¡mbolos."""
-        suscripciones = []
-        for s in self.simbolos:
-            if self._canal == CANAL_CRYPTO_QUOTES:
-                suscripciones.append(f"{self._canal}.X:{s}")
-            else:
-                suscripciones.append(f"{self._canal}.{s}")
-        params = ",".join(suscripciones)
+        params = ",".join(self._param(s) for s in self.simbolos)
         payload = json.dumps({"action": "subscribe", "params": params})
         await self._ws.send(payload)
         logger.info("Suscrito a: %s", params)
 
+    def _param(self, simbolo: str) -> str:
+        """Canal.símbolo tal como lo espera Polygon (cripto lleva prefijo X:)."""
+        if self._canal == CANAL_CRYPTO_QUOTES:
+            return f"{self._canal}.X:{simbolo}"
+        return f"{self._canal}.{simbolo}"
+
     # ÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇ
     #  SUSCRIPCI├ôN DIN├üMICA
     # ÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇ
 
+    async def aplicar_suscripciones(self, altas: list[str], bajas: list[str]) -> None:
+        """Aplica varias altas y bajas con un mensaje ``subscribe`` y otro ``unsubscribe``.
+
+        ``self.simbolos`` se actualiza antes de enviar: si la conexión se
+        cae a medias, la reconexión suscribe ya el conjunto nuevo.
+        """
+        altas = [s.upper() for s in altas if s.upper() not in self.simbolos]
+        bajas = [s.upper() for s in bajas if s.upper() in self.simbolos]
+        self.simbolos.extend(altas)
+        for simbolo in bajas:
+            self.simbolos.remove(simbolo)
+        if not (self._ws and self._conectado):
+            return
+        for accion, lista in (("subscribe", altas), ("unsubscribe", bajas)):
+            if lista:
+                params = ",".join(self._param(s) for s in lista)
+                await self._ws.send(json.dumps({"action": accion, "params": params}))
+                logger.info("%s dinámico: %s", accion, params)
+
     async def suscribir_simbolo(self, simbolo: str) -> None:
-        """A├▒ade un nuevo s├¡mbolo a la suscripci├│n en caliente."""
+        """Añade un nuevo símbolo a la suscripción en caliente."""
         simbolo = simbolo.upper()
         if simbolo in self.simbolos:
             logger.warning("'%s' ya esta suscrito.", simbolo)
             return
-
-        self.simbolos.append(simbolo)
-        if self._ws and self._conectado:
-            params = f"{CANAL_QUOTES}.{simbolo}"
-            payload = json.dumps({"action": "subscribe", "params": params})
-            await self._ws.send(payload)
-            logger.info("Suscripcion dinamica anadida: %s", params)
+        await self.aplicar_suscripciones([simbolo], [])
 
     async def desuscribir_simbolo(self, simbolo: str) -> None:
-        """Elimina un s├¡mbolo de la suscripci├│n en caliente."""
+        """Elimina un símbolo de la suscripción en caliente."""
         simbolo = simbolo.upper()
         if simbolo not in self.simbolos:
             logger.warning("'%s' no estaba suscrito.", simbolo)
             return
-
-        self.simbolos.remove(simbolo)
-        if self._ws and self._conectado:
-            params = f"{CANAL_QUOTES}.{simbolo}"
-            payload = json.dumps({"action": "unsubscribe", "params": params})
-            await self._ws.send(payload)
-            logger.info("Desuscrito de: %s", params)
+        await self.aplicar_suscripciones([], [simbolo])
 
     # ÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇ
     #  PROCESAMIENTO DE MENSAJES
     # ÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇ
 
-    async def _on_message(self, mensaje_crudo: str) -> None:
-        """Procesa cada mensaje del WebSocket (solo quotes)."""
+    def _on_message(self, mensaje_crudo: str | bytes) -> None:
+        """Procesa cada frame del WebSocket (solo quotes) como un lote."""
+        recibido_ns = time.perf_counter_ns()
         try:
-            mensajes = json.loads(mensaje_crudo)
-        except json.JSONDecodeError:
+            lotes = self._decodificador.decodificar_lotes(mensaje_crudo)
+        except ErrorDecodificacion:
             logger.error("JSON invalido recibido: %s", mensaje_crudo[:200])
             return
+        METRICAS.registrar_ns("decodificacion", self._canal, time.perf_counter_ns() - recibido_ns)
 
-        if not isinstance(mensajes, list):
-            mensajes = [mensajes]
-
-        for msg in mensajes:
-            tipo_evento = msg.get("ev")
-
-            if tipo_evento in ("Q", "XQ"):
-                await self._procesar_quote(msg)
-            elif tipo_evento == "status":
-                logger.debug("Status: %s", msg.get("message", ""))
+        if lotes.quotes:
+            METRICAS.registrar_frame(self._canal, lotes.quotes.simbolos, lotes.quotes.timestamp_ms,
+                                     recibido_ns, self._ultimo_mensaje_ts * 1000)
+            self._procesar_lote(lotes.quotes)
+        for estado in lotes.estados:
+            logger.debug("Status: %s", estado.get("message", ""))
 
-    async def _procesar_quote(self, raw: dict) -> None:
-        """Normaliza una cotizaci├│n cruda de Polygon y la despacha.
+    def _procesar_lote(self, lote: LoteQuotes) -> None:
+        """Aplica las quotes de un frame al Order Book y despacha callbacks.
 
-        Mapeo de campos crudos:
-            sym ÔåÆ simbolo, bp ÔåÆ bid_precio, bs ÔåÆ bid_tamano,
-            ap ÔåÆ ask_precio, as ÔåÆ ask_tamano, bx ÔåÆ bid_exchange,
-            ax ÔåÆ ask_exchange, t ÔåÆ timestamp_ms
+        El book de cada símbolo se notifica (y su snapshot se construye, si
+        hay ``on_book``) una sola vez por frame, con el estado final.
         """
-        # Normalizar s├¡mbolo (quitar prefijo X: de crypto)
-        sym_raw = raw.get("sym", "???")
-        sym_limpio = Mapeador.normalizar(sym_raw)
-
-        quote = QuoteNormalizado(
-            simbolo=sym_limpio,
-            bid_precio=raw.get("bp", 0.0),
-            bid_tamano=raw.get("bs", 0),
-            ask_precio=raw.get("ap", 0.0),
-            ask_tamano=raw.get("as", 0),
-            timestamp_ms=raw.get("t", 0),
-            bid_exchange=raw.get("bx", 0),
-            ask_exchange=raw.get("ax", 0),
-        )
-
-        self._quotes_recibidos += 1
-
-        # Alimentar el Order Book L2
-        book_snapshot = self.order_book.procesar_quote(quote)
-        if book_snapshot and self._on_book:
-            self._on_book(book_snapshot)
-
-        # Despachar al callback del usuario
+        self._quotes_recibidos += len(lote)
+
+        t0 = time.perf_counter_ns()
+        cambiados = self.order_book.actualizar_lote(lote)
+        METRICAS.registrar_ns("proceso", self._canal, time.perf_counter_ns() - t0)
+        for simbolo in cambiados:
+            if self._on_book_cambio:
+                self._on_book_cambio(simbolo)
+            if self._on_book:
+                self._on_book(self.order_book.obtener_snapshot(simbolo))
+
+        if self._on_quotes_batch:
+            self._on_quotes_batch(lote)
         if self._on_quote:
-            self._on_quote(quote)
+            for quote in lote:
+                self._on_quote(quote)
 
     # ÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇÔöÇ
     #  M├ëTRICAS
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║       REGISTROS DE MERCADO — Trades y quotes normalizados (compactos)       ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  TradeNormalizado / QuoteNormalizado : Un evento, dataclass con slots.     ║
+║  LoteTrades / LoteQuotes             : Los eventos de un frame en columnas ║
+║                                        paralelas (struct-of-arrays).       ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Sin __dict__ por evento, sin lista de condiciones por trade y con los     ║
+║  valores derivados (latencia, spread, mid) calculados solo al pedirlos.    ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    lote = LoteTrades()
+    lote.agregar("AAPL", 189.5, 100, 1718900000123, 4)
+    lote.columnas()["precio"]            # → np.ndarray float64
+    lote.ultimo_por_simbolo()            # → {"AAPL": 0}
+    lote[0]                              # → TradeNormalizado(...)
+
+chart.TradeNormalizado y orderbook.QuoteNormalizado siguen importándose
+desde sus módulos de siempre.
+"""
+
+from __future__ import annotations
+
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator
+
+import numpy as np
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  REGISTROS POR EVENTO
+# ══════════════════════════════════════════════════════════════════════════════
+
+@dataclass(slots=True)
+class TradeNormalizado:
+    """Representa un trade individual normalizado desde el flujo de Polygon.
+
+    Campos originales de Polygon → Campos legibles:
+        sym → simbolo       Símbolo del activo (ej. "AAPL")
+        p   → precio        Precio de ejecución
+        s   → tamano        Tamaño/volumen del trade
+        t   → timestamp_ms  Timestamp en milisegundos (epoch)
+        x   → exchange_id   ID del exchange donde se ejecutó
+        c   → condiciones   Códigos de condición del trade (tupla; vacía
+                            comparte la misma instancia)
+    """
+    simbolo: str
+    precio: float
+    tamano: int
+    timestamp_ms: int
+    exchange_id: int = 0
+    condiciones: tuple = ()
+
+    @property
+    def timestamp_dt(self) -> datetime:
+        """Convierte el timestamp de milisegundos a datetime UTC."""
+        return datetime.fromtimestamp(self.timestamp_ms / 1000, tz=timezone.utc)
+
+    @property
+    def latencia_ms(self) -> float:
+        """Latencia aproximada: ahora - timestamp del trade (se mide al pedirla)."""
+        return (time.time() * 1000) - self.timestamp_ms
+
+    def to_dict(self) -> dict:
+        """Serializa a diccionario para alimentar DataFrames o gráficas."""
+        return {
+            "simbolo": self.simbolo,
+            "precio": self.precio,
+            "tamano": self.tamano,
+            "timestamp_ms": self.timestamp_ms,
+            "datetime_utc": self.timestamp_dt.isoformat(),
+            "exchange_id": self.exchange_id,
+            "latencia_ms": round(self.latencia_ms, 2),
+        }
+
+
+@dataclass(slots=True)
+class QuoteNormalizado:
+    """Representa una cotización bid/ask normalizada.
+
+    Campos originales de Polygon → Campos legibles:
+        sym → simbolo       Símbolo del activo
+        bp  → bid_precio    Mejor precio de compra
+        bs  → bid_tamano    Tamaño en el bid
+        ap  → ask_precio    Mejor precio de venta
+        as  → ask_tamano    Tamaño en el ask
+        bx  → bid_exchange  ID del exchange del bid
+        ax  → ask_exchange  ID del exchange del ask
+        t   → timestamp_ms  Timestamp en milisegundos
+    """
+    simbolo: str
+    bid_precio: float
+    bid_tamano: int
+    ask_precio: float
+    ask_tamano: int
+    timestamp_ms: int
+    bid_exchange: int = 0
+    ask_exchange: int = 0
+
+    @property
+    def spread(self) -> float:
+        """Spread bid-ask (sin redondear; ``to_dict`` redondea a 6 decimales)."""
+        return self.ask_precio - self.bid_precio
+
+    @property
+    def mid_price(self) -> float:
+        """Precio medio entre bid y ask (sin redondear)."""
+        return (self.bid_precio + self.ask_precio) / 2
+
+    def to_dict(self) -> dict:
+        return {
+            "simbolo": self.simbolo,
+            "bid_precio": self.bid_precio,
+            "bid_tamano": self.bid_tamano,
+            "ask_precio": self.ask_precio,
+            "ask_tamano": self.ask_tamano,
+            "spread": round(self.spread, 6),
+            "mid_price": round(self.mid_price, 6),
+            "timestamp_ms": self.timestamp_ms,
+        }
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  LOTES POR FRAME (STRUCT-OF-ARRAYS)
+# ══════════════════════════════════════════════════════════════════════════════
+
+class _LoteBase(ABC):
+    """Parte común: columna de símbolos, agrupación y conversión a NumPy.
+
+    Cada columna es una lista de Python: ``list.append`` cuesta lo mismo que
+    crear un dataclass con slots, mientras que ``array.append`` convierte
+    el valor en cada llamada. La conversión a arrays tipados se hace una
+    sola vez por columna, en C, cuando un consumidor la pide.
+    """
+
+    __slots__ = ("simbolos",)
+    _NUMERICAS: dict[str, type] = {}
+
+    def __len__(self) -> int:
+        return len(self.simbolos)
+
+    def __iter__(self) -> Iterator:
+        for i in range(len(self.simbolos)):
+            yield self[i]
+
+    @abstractmethod
+    def __getitem__(self, i: int):
+        """El evento ``i`` reconstruido como registro."""
+
+    def columna(self, nombre: str) -> np.ndarray:
+        """Una columna numérica como array NumPy (copia)."""
+        return np.array(getattr(self, nombre), dtype=self._NUMERICAS[nombre])
+
+    def columnas(self) -> dict[str, np.ndarray]:
+        """Todas las columnas numéricas como arrays NumPy."""
+        return {nombre: self.columna(nombre) for nombre in self._NUMERICAS}
+
+    def indices_por_simbolo(self) -> dict[str, list[int]]:
+        """Posiciones de cada símbolo en el lote, en orden de llegada."""
+        grupos: dict[str, list[int]] = {}
+        for i, sym in enumerate(self.simbolos):
+            grupo = grupos.get(sym)
+            if grupo is None:
+                grupos[sym] = [i]
+            else:
+                grupo.append(i)
+        return grupos
+
+    def ultimo_por_simbolo(self) -> dict[str, int]:
+        """Posición del último evento de cada símbolo."""
+        return {sym: i for i, sym in enumerate(self.simbolos)}
+
+
+class LoteTrades(_LoteBase):
+    """Trades de un frame en columnas paralelas.
+
+    Columnas:
+        simbolos · precio · tamano · timestamp_ms · exchange_id ·
+        condiciones (solo esta no tiene versión NumPy)
+    """
+
+    __slots__ = ("precio", "tamano", "timestamp_ms", "exchange_id", "condiciones")
+    _NUMERICAS = {"precio": np.float64, "tamano": np.float64,
+                  "timestamp_ms": np.int64, "exchange_id": np.int64}
+
+    def __init__(self):
+        self.simbolos: list[str] = []
+        self.precio: list[float] = []
+        self.tamano: list[float] = []
+        self.timestamp_ms: list[int] = []
+        self.exchange_id: list[int] = []
+        self.condiciones: list[tuple] = []
+
+    def agregar(self, simbolo: str, precio: float, tamano: float, timestamp_ms: int,
+                exchange_id: int = 0, condiciones=()) -> None:
+        """Mismo orden de campos que ``TradeNormalizado``."""
+        self.simbolos.append(simbolo)
+        self.precio.append(precio)
+        self.tamano.append(tamano)
+        self.timestamp_ms.append(timestamp_ms)
+        self.exchange_id.append(exchange_id)
+        self.condiciones.append(condiciones)
+
+    def __getitem__(self, i: int) -> TradeNormalizado:
+        return TradeNormalizado(
+            self.simbolos[i], self.precio[i], self.tamano[i],
+            self.timestamp_ms[i], self.exchange_id[i], self.condiciones[i],
+        )
+
+
+class LoteQuotes(_LoteBase):
+    """Quotes de un frame en columnas paralelas.
+
+    Columnas:
+        simbolos · bid_precio · bid_tamano · ask_precio · ask_tamano ·
+        timestamp_ms · bid_exchange · ask_exchange
+    """
+
+    __slots__ = ("bid_precio", "bid_tamano", "ask_precio", "ask_tamano",
+                 "timestamp_ms", "bid_exchange", "ask_exchange")
+    _NUMERICAS = {"bid_precio": np.float64, "bid_tamano": np.float64,
+                  "ask_precio": np.float64, "ask_tamano": np.float64,
+                  "timestamp_ms": np.int64, "bid_exchange": np.int64,
+                  "ask_exchange": np.int64}
+
+    def __init__(self):
+        self.simbolos: list[str] = []
+        self.bid_precio: list[float] = []
+        self.bid_tamano: list[float] = []
+        self.ask_precio: list[float] = []
+        self.ask_tamano: list[float] = []
+        self.timestamp_ms: list[int] = []
+        self.bid_exchange: list[int] = []
+        self.ask_exchange: list[int] = []
+
+    def agregar(self, simbolo: str, bid_precio: float, bid_tamano: float,
+                ask_precio: float, ask_tamano: float, timestamp_ms: int,
+                bid_exchange: int = 0, ask_exchange: int = 0) -> None:
+        """Mismo orden de campos que ``QuoteNormalizado``."""
+        self.simbolos.append(simbolo)
+        self.bid_precio.append(bid_precio)
+        self.bid_tamano.append(bid_tamano)
+        self.ask_precio.append(ask_precio)
+        self.ask_tamano.append(ask_tamano)
+        self.timestamp_ms.append(timestamp_ms)
+        self.bid_exchange.append(bid_exchange)
+        self.ask_exchange.append(ask_exchange)
+
+    def __getitem__(self, i: int) -> QuoteNormalizado:
+        return QuoteNormalizado(
+            self.simbolos[i], self.bid_precio[i], self.bid_tamano[i],
+            self.ask_precio[i], self.ask_tamano[i], self.timestamp_ms[i],
+            self.bid_exchange[i], self.ask_exchange[i],
+        )
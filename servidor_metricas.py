@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║       SERVIDOR MÉTRICAS — Endpoint HTTP en formato texto de Prometheus      ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  EscritorPrometheus  : Acumula contadores, gauges e histogramas y los      ║
+║                        renderiza en el formato de exposición 0.0.4.        ║
+║  ExportadorPrometheus: Servidor HTTP mínimo (asyncio.start_server) en el   ║
+║                        mismo event loop; GET /metrics llama a los          ║
+║                        colectores registrados. Admite rutas de texto       ║
+║                        extra (p. ej. /perfil de monitor_loop).             ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Sin dependencias: ni aiohttp.web ni prometheus_client. Cada scrape lee    ║
+║  el estado actual; el camino caliente no hace nada extra por existir esto. ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    exportador = ExportadorPrometheus(port=CONFIG.METRICS_PORT)
+    exportador.agregar_colector(lambda e: e.gauge("conectado", 1, motor="trades"))
+    await exportador.iniciar()
+
+    curl http://127.0.0.1:9108/metrics
+
+Todas las métricas llevan el prefijo ``polygon_``. Los histogramas de
+``metricas.METRICAS`` se exponen en segundos por etapa y feed (sin la
+dimensión símbolo, para no multiplicar series); los eventos por símbolo
+salen como contador ``polygon_eventos_total`` → ``rate()`` da eventos/s.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from urllib.parse import parse_qsl
+
+from metricas import METRICAS, HistogramaLatencia
+
+logger = logging.getLogger("ServidorMetricas")
+
+PREFIJO = "polygon_"
+
+# Límites (µs) de los buckets exportados; el histograma interno es más fino
+LIMITES_US = (50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 50_000,
+              100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  FORMATO
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(etiquetas: dict) -> str:
+    if not etiquetas:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in etiquetas.items()) + "}"
+
+
+def _numero(valor) -> str:
+    if isinstance(valor, bool):
+        return "1" if valor else "0"
+    if isinstance(valor, int):
+        return str(valor)
+    return repr(float(valor))
+
+
+class EscritorPrometheus:
+    """Agrupa las muestras por familia y las escribe con su HELP/TYPE.
+
+    Las muestras de una familia pueden llegar de varios colectores y en
+    cualquier orden; el formato exige que salgan juntas, así que se
+    bufferizan hasta ``texto()``.
+    """
+
+    def __init__(self, prefijo: str = PREFIJO):
+        self._prefijo = prefijo
+        self._familias: dict[str, tuple[str, str, list[str]]] = {}
+
+    def _familia(self, nombre: str, tipo: str, ayuda: str) -> list[str]:
+        nombre = self._prefijo + nombre
+        familia = self._familias.get(nombre)
+        if familia is None:
+            familia = self._familias[nombre] = (tipo, ayuda, [])
+        return familia[2]
+
+    def contador(self, nombre: str, valor, ayuda: str = "", **etiquetas) -> None:
+        """Contador monótono; ``nombre`` debería terminar en ``_total``."""
+        self._familia(nombre, "counter", ayuda).append(
+            f"{self._prefijo}{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+
+    def gauge(self, nombre: str, valor, ayuda: str = "", **etiquetas) -> None:
+        self._familia(nombre, "gauge", ayuda).append(
+            f"{self._prefijo}{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+
+    def histograma(self, nombre: str, hist: HistogramaLatencia, ayuda: str = "",
+                   **etiquetas) -> None:
+        """Histograma de latencias (µs internos → segundos en la exposición)."""
+        lineas = self._familia(nombre, "histogram", ayuda)
+        base = f"{self._prefijo}{nombre}"
+        buckets = hist.buckets()
+        acumulado = 0
+        j = 0
+        for limite in LIMITES_US:
+            # Un bucket fino cuenta en "le" si todo su rango cae por debajo;
+            # como el error relativo es ~3% el corte es conservador.
+            while j < len(buckets) and buckets[j][0] <= limite:
+                acumulado += buckets[j][1]
+                j += 1
+            lineas.append(f"{base}_bucket{_etiquetas({**etiquetas, 'le': repr(limite / 1e6)})} {acumulado}")
+        lineas.append(f"{base}_bucket{_etiquetas({**etiquetas, 'le': '+Inf'})} {hist.n}")
+        lineas.append(f"{base}_sum{_etiquetas(etiquetas)} {_numero(hist.suma / 1e6)}")
+        lineas.append(f"{base}_count{_etiquetas(etiquetas)} {hist.n}")
+
+    def texto(self) -> str:
+        partes = []
+        for nombre, (tipo, ayuda, lineas) in self._familias.items():
+            if ayuda:
+                partes.append(f"# HELP {nombre} {ayuda}")
+            partes.append(f"# TYPE {nombre} {tipo}")
+            partes.extend(lineas)
+        return "\n".join(partes) + "\n"
+
+
+def colector_latencias(e: EscritorPrometheus) -> None:
+    """Histogramas y eventos por símbolo de ``metricas.METRICAS``."""
+    por_etapa: dict[tuple[str, str], HistogramaLatencia] = {}
+    for (etapa, feed, _simbolo), h in METRICAS.acumulado().items():
+        destino = por_etapa.get((etapa, feed))
+        if destino is None:
+            destino = por_etapa[(etapa, feed)] = HistogramaLatencia()
+        destino.fusionar(h)
+    for (etapa, feed), h in sorted(por_etapa.items()):
+        e.histograma("latencia_segundos", h,
+                     "Latencia por etapa del camino exchange → navegador",
+                     etapa=etapa, feed=feed)
+    for (feed, simbolo), n in sorted(METRICAS.eventos.items()):
+        e.contador("eventos_total", n, "Eventos recibidos de Polygon por feed y símbolo",
+                   feed=feed, simbolo=simbolo)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+#  SERVIDOR HTTP
+# ══════════════════════════════════════════════════════════════════════════════
+
+class ExportadorPrometheus:
+    """Endpoint ``GET /metrics`` servido por el event loop del proceso.
+
+    Cada colector es una función ``colector(escritor)`` que lee el estado
+    de un componente y escribe sus métricas; un colector que falla se
+    registra en el log y no impide el resto del scrape. ``colector_latencias``
+    viene registrado por defecto.
+
+    Parámetros:
+        host : str → Interfaz de escucha (default: 127.0.0.1)
+        port : int → Puerto HTTP (default: 9108)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9108):
+        self.host = host
+        self.port = port
+        self._colectores: list[Callable[[EscritorPrometheus], None]] = [colector_latencias]
+        self._rutas: dict[str, Callable[[dict], Awaitable[str]]] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self.scrapes = 0
+
+    def agregar_colector(self, colector: Callable[[EscritorPrometheus], None]) -> None:
+        self._colectores.append(colector)
+
+    def agregar_ruta(self, ruta: str, manejador: Callable[[dict], Awaitable[str]]) -> None:
+        """Ruta GET extra: ``await manejador(parametros_query)`` → texto plano."""
+        self._rutas[ruta] = manejador
+
+    def renderizar(self) -> str:
+        """Texto de exposición con el estado actual de todos los colectores."""
+        escritor = EscritorPrometheus()
+        for colector in self._colectores:
+            try:
+                colector(escritor)
+            except Exception as e:
+                logger.error("[METRICAS] Colector %s falló: %s", getattr(colector, "__name__", colector), e)
+        escritor.contador("scrapes_total", self.scrapes, "Scrapes atendidos por este endpoint")
+        return escritor.texto()
+
+    async def iniciar(self) -> None:
+        self._server = await asyncio.start_server(self._atender, self.host, self.port)
+        logger.info("Métricas Prometheus en http://%s:%d/metrics", self.host, self.port)
+
+    async def detener(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            linea = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Consumir cabeceras hasta la línea vacía
+            while True:
+                cabecera = await asyncio.wait_for(reader.readline(), timeout=5)
+                if cabecera in (b"\r\n", b"\n", b""):
+                    break
+            partes = linea.decode("latin-1").split()
+            metodo, ruta = (partes[0], partes[1]) if len(partes) >= 2 else ("", "")
+            ruta, _, query = ruta.partition("?")
+            if metodo == "GET" and ruta in ("/metrics", "/"):
+                self.scrapes += 1
+                cuerpo = self.renderizar().encode("utf-8")
+                estado, tipo = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+            elif metodo == "GET" and ruta in self._rutas:
+                try:
+                    cuerpo = (await self._rutas[ruta](dict(parse_qsl(query)))).encode("utf-8")
+                    estado = "200 OK"
+                except (RuntimeError, ValueError) as e:
+                    cuerpo, estado = f"{e}\n".encode("utf-8"), "409 Conflict"
+                tipo = "text/plain; charset=utf-8"
+            else:
+                cuerpo = b"not found\n"
+                estado, tipo = "404 Not Found", "text/plain; charset=utf-8"
+            writer.write(
+                f"HTTP/1.1 {estado}\r\nContent-Type: {tipo}\r\n"
+                f"Content-Length: {len(cuerpo)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + cuerpo
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -102,6 +102,7 @@ class GestorWidgets {
                 this._wsChart.send(JSON.stringify({
                     action: 'subscribe',
                     symbol: this._simboloActual,
+                    batch: true,
                 }));
             }
         };
@@ -159,6 +160,18 @@ class GestorWidgets {
                 });
                 break;
 
+            case 'ticks':
+                // Micro-lote (subscribe con batch): último precio por segundo de la ventana
+                for (const punto of datos.data || []) {
+                    this._contadorTicks++;
+                    busEventos.emitir(EVENTOS.DATOS_TICK, {
+                        simbolo: datos.symbol,
+                        time: punto.time,
+                        value: punto.value,
+                    });
+                }
+                break;
+
             case 'session':
                 busEventos.emitir(EVENTOS.SESION_MERCADO, {
                     session: datos.session,
@@ -209,7 +222,7 @@ class GestorWidgets {
         this._simboloActual = nuevo;
 
         if (this._wsChart && this._wsChart.readyState === WebSocket.OPEN) {
-            this._wsChart.send(JSON.stringify({ action: 'subscribe', symbol: nuevo }));
+            this._wsChart.send(JSON.stringify({ action: 'subscribe', symbol: nuevo, batch: true }));
         }
     }
 
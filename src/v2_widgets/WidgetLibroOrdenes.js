@@ -4,6 +4,7 @@
  * ╠══════════════════════════════════════════════════════════════════════════╣
  * ║  Arquitectura AUTÓNOMA (sin dependencias externas):                     ║
  * ║    · WebSocket propio → ws://host:puertoBook (orderbook.py)            ║
+ * ║      book completo + book_delta con seq (resync si hay hueco)           ║
  * ║    · _OBStore    — capa de datos (niveles de precio)                   ║
  * ║    · _OBRenderer — scroll virtual de filas DOM completamente desacoplado║
  * ║    · _OBCanvas   — canvas de barras de profundidad                     ║
@@ -959,6 +960,16 @@ class WidgetLibroOrdenes extends ClaseBaseWidget {
         // Estado
         this._primerDato = false;
         this._timerNoData = null;
+
+        // Protocolo delta: copia local del libro (precio → nivel) + último seq
+        this._obSeq = null;
+        // Book completo pedido (subscribe/resync) y aún no recibido: los deltas
+        // se ignoran sin pedir otro resync hasta que pase _RESYNC_TIMEOUT_MS
+        this._bookPendiente = false;
+        this._bookPedidoMs = 0;
+        this._RESYNC_TIMEOUT_MS = 3000;
+        this._obBids = new Map();
+        this._obAsks = new Map();
         this._rowH = 20;   // altura de fila propia (zoom visual — botones + / -)
         // Factor inicial = 4 → da ~20px con la fórmula lineal de _applyWheelZoom
         this._wheelZoomFactor = 4;   // zoom de paso: 1=0.04%, ..., 20=0.80%
@@ -1252,6 +1263,8 @@ class WidgetLibroOrdenes extends ClaseBaseWidget {
             // Resetear _primerDato para que el log de primer snapshot aparezca
             // correctamente también en reconexiones (sin cambio de activo)
             this._primerDato = false;
+            // El seq es por conexión: esperar el book completo del servidor
+            this._obSeq = null;
             this._setStatus('Conectado', true);
             busEventos.emitir(EVENTOS.CONEXION_ESTADO, { tipo: 'book', conectado: true, estado: 'conectado' });
             // Si ya hay símbolo seleccionado, suscribirse ahora
@@ -1290,18 +1303,73 @@ class WidgetLibroOrdenes extends ClaseBaseWidget {
     _enviarSubscribe(simbolo) {
         if (this._ws && this._ws.readyState === WebSocket.OPEN) {
             this._ws.send(JSON.stringify({ action: 'subscribe', symbol: simbolo }));
+            // El servidor responde al subscribe con el book completo
+            this._bookPendiente = true;
+            this._bookPedidoMs = Date.now();
             console.log(`[WidgetLibroOrdenes] 📡 Subscribe → ${simbolo}`);
         }
     }
 
+    _enviarResync() {
+        if (this._ws && this._ws.readyState === WebSocket.OPEN && this._simbolo) {
+            this._ws.send(JSON.stringify({ action: 'resync', symbol: this._simbolo }));
+            this._bookPendiente = true;
+            this._bookPedidoMs = Date.now();
+            console.log(`[WidgetLibroOrdenes] 🔁 Resync → ${this._simbolo} (seq local: ${this._obSeq})`);
+        }
+    }
+
+    /** Book completo: reemplaza la copia local y fija el seq base. */
+    _cargarLibroCompleto(datos) {
+        this._obBids.clear();
+        this._obAsks.clear();
+        for (const l of (datos.bids || [])) this._obBids.set(l.precio, l);
+        for (const l of (datos.asks || [])) this._obAsks.set(l.precio, l);
+        this._obSeq = datos.seq ?? null;
+        this._bookPendiente = false;
+    }
+
+    /**
+     * Delta: aplica niveles cambiados/eliminados sobre la copia local.
+     * Si falta la base o hay un hueco en la secuencia retorna false y pide
+     * resync, salvo que ya haya un book completo en camino: entonces el delta
+     * se descarta y solo se vuelve a pedir si el book tarda más del timeout.
+     */
+    _aplicarDelta(datos) {
+        const simbolo = datos.symbol || datos.simbolo;
+        if (simbolo && simbolo !== this._simbolo) return false;
+        if (this._obSeq === null || datos.seq !== this._obSeq + 1) {
+            this._obSeq = null;
+            if (!this._bookPendiente || Date.now() - this._bookPedidoMs > this._RESYNC_TIMEOUT_MS) {
+                this._enviarResync();
+            }
+            return false;
+        }
+        for (const [lado, mapa] of [[datos.bids, this._obBids], [datos.asks, this._obAsks]]) {
+            if (!lado) continue;
+            for (const p of (lado.del || [])) mapa.delete(p);
+            for (const l of (lado.upd || [])) mapa.set(l.precio, l);
+        }
+        this._obSeq = datos.seq;
+        return true;
+    }
+
     _procesarMensaje(crudo) {
         let datos;
         try { datos = JSON.parse(crudo); } catch { return; }
 
-        if (datos.type !== 'book') return;
-
-        const rawBids = datos.bids || [];
-        const rawAsks = datos.asks || [];
+        let rawBids, rawAsks;
+        if (datos.type === 'book') {
+            this._cargarLibroCompleto(datos);
+            rawBids = datos.bids || [];
+            rawAsks = datos.asks || [];
+        } else if (datos.type === 'book_delta') {
+            if (!this._aplicarDelta(datos)) return;
+            rawBids = [...this._obBids.values()].sort((a, b) => b.precio - a.precio);
+            rawAsks = [...this._obAsks.values()].sort((a, b) => a.precio - b.precio);
+        } else {
+            return;
+        }
 
         // Ignorar snapshots vacíos (solo limpiar si ya había datos)
         if (rawBids.length === 0 && rawAsks.length === 0) {
@@ -1365,6 +1433,7 @@ class WidgetLibroOrdenes extends ClaseBaseWidget {
             const cambioReal = nuevo !== this._simbolo;
             this._simbolo = nuevo;
             this._primerDato = false;
+            this._obSeq = null;
 
             if (this._store) this._store.reset();
 
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║      SUSCRIPCIONES — Conteo de interés por símbolo y canal de Polygon       ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  GestorSuscripciones : Cuenta cuántos navegadores (de ChartServer y de     ║
+║                        OrderBookServer) miran cada símbolo en cada canal.  ║
+║                        Suscribe al primer interesado y desuscribe cuando   ║
+║                        el último se va y pasa el tiempo de gracia.         ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  - Fijos    : los símbolos del .env no se desuscriben nunca.               ║
+║  - Gracia   : cambiar de símbolo y volver no cuesta un unsub + sub.        ║
+║  - Lotes    : los cambios de una ventana corta salen en un único mensaje   ║
+║               ``subscribe`` / ``unsubscribe`` con params separados por ,   ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    gestor = GestorSuscripciones(gracia_seg=120)
+    gestor.registrar_canal("trades", motor_trades, fijos=SIMBOLOS_STOCKS,
+                           acepta=lambda s: not Mapeador.es_crypto(s))
+    gestor.adquirir("trades", "NVDA")     # navegador abre NVDA
+    gestor.liberar("trades", "NVDA")      # navegador se va → unsub en 120 s
+
+Un canal es cualquier motor con ``simbolos`` y
+``async aplicar_suscripciones(altas, bajas)`` (PolygonTradesWS,
+PolygonQuotesWS).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable, Iterable, Protocol
+
+logger = logging.getLogger("Suscripciones")
+
+
+class MotorSuscribible(Protocol):
+    simbolos: list[str]
+
+    async def aplicar_suscripciones(self, altas: list[str], bajas: list[str]) -> None: ...
+
+
+class _Canal:
+    """Estado de un canal: motor, refcounts, fijos y cambios pendientes."""
+
+    __slots__ = ("motor", "acepta", "al_retirar", "fijos", "cuentas", "retiros", "altas", "bajas")
+
+    def __init__(self, motor: MotorSuscribible, acepta: Callable[[str], bool] | None,
+                 fijos: Iterable[str], al_retirar: Callable[[list[str]], None] | None = None):
+        self.motor = motor
+        self.acepta = acepta
+        self.al_retirar = al_retirar
+        self.fijos = {s.upper() for s in fijos}
+        self.cuentas: dict[str, int] = {}
+        self.retiros: dict[str, asyncio.TimerHandle] = {}   # símbolo → desuscripción agendada
+        self.altas: set[str] = set()
+        self.bajas: set[str] = set()
+
+
+class GestorSuscripciones:
+    """Suscripciones de Polygon guiadas por el interés de los navegadores.
+
+    ``adquirir``/``liberar`` son síncronos y O(1); el envío real a Polygon
+    se agrupa y se hace desde una tarea tras ``ventana_lote_seg``. Un
+    símbolo sin interesados sigue suscrito ``gracia_seg`` por si alguien
+    vuelve; los símbolos fijos o ya suscritos por el motor al arrancar no
+    se tocan nunca.
+
+    Parámetros:
+        gracia_seg       : float → Tiempo sin interesados antes de desuscribir
+        ventana_lote_seg : float → Ventana para agrupar cambios en un mensaje
+    """
+
+    def __init__(self, gracia_seg: float = 120.0, ventana_lote_seg: float = 0.05):
+        self.gracia_seg = gracia_seg
+        self.ventana_lote_seg = ventana_lote_seg
+        self._canales: dict[str, _Canal] = {}
+        self._vaciado: asyncio.TimerHandle | None = None
+        self.mensajes_enviados = 0
+
+    def registrar_canal(self, nombre: str, motor: MotorSuscribible,
+                        fijos: Iterable[str] = (),
+                        acepta: Callable[[str], bool] | None = None,
+                        al_retirar: Callable[[list[str]], None] | None = None) -> None:
+        """Añade un canal. ``fijos`` se suman a lo que el motor ya tenga.
+
+        ``al_retirar(simbolos)`` se llama tras desuscribirlos en Polygon, para
+        que quien guarde estado alimentado por el canal lo descarte.
+        """
+        self._canales[nombre] = _Canal(motor, acepta, [*fijos, *motor.simbolos], al_retirar)
+
+    # ── Interés de los navegadores ──
+
+    def adquirir(self, canal: str, simbolo: str) -> None:
+        """Un navegador más mira ``simbolo`` en ``canal``."""
+        c = self._canales.get(canal)
+        simbolo = simbolo.upper()
+        if c is None or not simbolo or (c.acepta is not None and not c.acepta(simbolo)):
+            return
+        n = c.cuentas.get(simbolo, 0)
+        c.cuentas[simbolo] = n + 1
+        if n:
+            return
+        retiro = c.retiros.pop(simbolo, None)
+        if retiro is not None:
+            retiro.cancel()            # volvió dentro del tiempo de gracia
+            return
+        if simbolo in c.bajas:
+            c.bajas.discard(simbolo)   # la baja aún no había salido
+        elif simbolo not in c.motor.simbolos:
+            c.altas.add(simbolo)
+            self._agendar_vaciado()
+
+    def liberar(self, canal: str, simbolo: str) -> None:
+        """Un navegador deja de mirar ``simbolo`` en ``canal``."""
+        c = self._canales.get(canal)
+        simbolo = simbolo.upper()
+        if c is None or simbolo not in c.cuentas:
+            return
+        n = c.cuentas[simbolo] - 1
+        if n > 0:
+            c.cuentas[simbolo] = n
+            return
+        del c.cuentas[simbolo]
+        if simbolo in c.fijos:
+            return
+        c.retiros[simbolo] = asyncio.get_running_loop().call_later(
+            self.gracia_seg, self._retirar, canal, simbolo
+        )
+
+    def cambiar(self, canales: Iterable[str], anterior: str | None, nuevo: str | None) -> None:
+        """Atajo para un navegador que pasa de ``anterior`` a ``nuevo``.
+
+        Adquiere antes de liberar: volver al mismo símbolo no agenda nada.
+        """
+        if anterior == nuevo:
+            return
+        for canal in canales:
+            if nuevo:
+                self.adquirir(canal, nuevo)
+            if anterior:
+                self.liberar(canal, anterior)
+
+    # ── Envío agrupado ──
+
+    def _retirar(self, canal: str, simbolo: str) -> None:
+        c = self._canales[canal]
+        c.retiros.pop(simbolo, None)
+        if simbolo in c.altas:
+            c.altas.discard(simbolo)
+        elif simbolo in c.motor.simbolos:
+            c.bajas.add(simbolo)
+            self._agendar_vaciado()
+
+    def _agendar_vaciado(self) -> None:
+        if self._vaciado is None:
+            self._vaciado = asyncio.get_running_loop().call_later(
+                self.ventana_lote_seg, self._lanzar_vaciado
+            )
+
+    def _lanzar_vaciado(self) -> None:
+        self._vaciado = None
+        asyncio.get_running_loop().create_task(self._vaciar())
+
+    async def _vaciar(self) -> None:
+        for nombre, c in self._canales.items():
+            if not c.altas and not c.bajas:
+                continue
+            altas, bajas = sorted(c.altas), sorted(c.bajas)
+            c.altas.clear()
+            c.bajas.clear()
+            try:
+                await c.motor.aplicar_suscripciones(altas, bajas)
+                self.mensajes_enviados += bool(altas) + bool(bajas)
+                logger.info("[SUSCRIPCIONES] %s: +%s -%s", nombre,
+                            ",".join(altas) or "∅", ",".join(bajas) or "∅")
+            except Exception as e:
+                logger.error("[SUSCRIPCIONES] %s: no se pudo aplicar (+%s -%s): %s",
+                             nombre, altas, bajas, e)
+                continue
+            if bajas and c.al_retirar is not None:
+                c.al_retirar(bajas)
+
+    # ── Métricas ──
+
+    def obtener_metricas(self) -> dict:
+        return {
+            "canales": {
+                nombre: {
+                    "suscritos": len(c.motor.simbolos),
+                    "con_interes": len(c.cuentas),
+                    "en_gracia": len(c.retiros),
+                    "fijos": len(c.fijos),
+                }
+                for nombre, c in self._canales.items()
+            },
+            "mensajes_enviados": self.mensajes_enviados,
+        }
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+╔══════════════════════════════════════════════════════════════════════════════╗
+║          VUELO ÚNICO — Una sola carga en curso por clave (single-flight)    ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  VueloUnico : Las peticiones concurrentes con la misma clave esperan la    ║
+║               misma tarea en vez de lanzar cada una su propia carga.       ║
+╠══════════════════════════════════════════════════════════════════════════════╣
+║  Pensado para tormentas de reconexión: N navegadores que piden el mismo    ║
+║  símbolo/timeframe a la vez generan una sola petición a Polygon.           ║
+╚══════════════════════════════════════════════════════════════════════════════╝
+
+Uso:
+    vuelos = VueloUnico()
+    payload = await vuelos.ejecutar(("AAPL", 60), lambda: construir("AAPL", 60))
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class VueloUnico:
+    """Agrupa llamadas concurrentes con la misma clave en una única tarea.
+
+    La carga corre en su propia tarea: si el primer solicitante se cancela
+    (p. ej. el navegador se desconectó), los demás siguen esperando el
+    resultado. En cuanto la tarea termina la clave se libera, así que no
+    se cachean resultados: solo se comparten mientras están en vuelo.
+
+    Atributos:
+        compartidas : int → Llamadas que se ahorraron al unirse a un vuelo
+    """
+
+    def __init__(self):
+        self._en_vuelo: dict[Hashable, asyncio.Task] = {}
+        self.compartidas = 0
+
+    async def ejecutar(self, clave: Hashable, fabrica: Callable[[], Awaitable[T]]) -> T:
+        """Devuelve el resultado de ``fabrica()``, compartido entre llamadas con ``clave``."""
+        tarea = self._en_vuelo.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(fabrica())
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda t, c=clave: self._aterrizar(c, t))
+        else:
+            self.compartidas += 1
+        return await asyncio.shield(tarea)
+
+    def _aterrizar(self, clave: Hashable, tarea: asyncio.Task) -> None:
+        if self._en_vuelo.get(clave) is tarea:
+            del self._en_vuelo[clave]
+        # Marca la excepción como leída aunque todos los que esperaban se hayan ido
+        if not tarea.cancelled():
+            tarea.exception()
+
+    def __len__(self) -> int:
+        return len(self._en_vuelo)